@@ -0,0 +1,102 @@
+"""Exporter throughput benchmark against the bundled local OTLP sink.
+
+Drives TracingListener with synthetic suites, tests and keywords (real
+Robot Framework model objects, no test execution) and exports to an
+in-process ``rf-tracer sink``. Reports generated spans/sec, the time spent
+in close() and the end-to-end drop rate (spans generated vs. received).
+
+Examples:
+    python benchmarks/exporter_throughput.py --tests 200 --keywords 50
+    python benchmarks/exporter_throughput.py --protocol grpc --latency-ms 50
+    python benchmarks/exporter_throughput.py --latency-ms 100 --max-in-flight 8
+    python benchmarks/exporter_throughput.py --error-rate 0.2 --spill
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+
+from robot import result, running
+
+from robotframework_tracer.listener import TracingListener
+from robotframework_tracer.sink import OtlpSink
+
+
+def _run_load(listener, tests, keywords):
+    """Feed one suite with ``tests`` tests of ``keywords`` keywords. Returns spans created."""
+    data = running.TestSuite(name="Benchmark", source="benchmark.robot")
+    res = result.TestSuite(name="Benchmark")
+    listener.start_suite(data, res)
+    for t in range(tests):
+        test_data = data.tests.create(name=f"Test {t}")
+        test_res = res.tests.create(name=f"Test {t}", status="PASS")
+        listener.start_test(test_data, test_res)
+        for k in range(keywords):
+            kw_data = running.Keyword(name="Log", args=(f"message {k}",))
+            kw_res = result.Keyword(name="Log", args=(f"message {k}",), status="PASS")
+            listener.start_keyword(kw_data, kw_res)
+            listener.end_keyword(kw_data, kw_res)
+        listener.end_test(test_data, test_res)
+    listener.end_suite(data, res)
+    return 1 + tests * (1 + keywords)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--protocol", choices=("http", "grpc"), default="http")
+    parser.add_argument("--tests", type=int, default=100)
+    parser.add_argument("--keywords", type=int, default=50, help="Keywords per test")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Sink latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Sink error rate (0-1)")
+    parser.add_argument("--batch-max-export-size", type=int, default=0)
+    parser.add_argument("--batch-max-queue-size", type=int, default=0)
+    parser.add_argument("--max-in-flight", type=int, default=1)
+    parser.add_argument("--spill", action="store_true", help="Enable the disk spill queue")
+    parser.add_argument("--shutdown-timeout-sec", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    grpc_port = 0 if args.protocol == "grpc" else None
+    with OtlpSink(
+        http_port=0, grpc_port=grpc_port, latency_ms=args.latency_ms, error_rate=args.error_rate
+    ) as sink, tempfile.TemporaryDirectory() as spill_dir:
+        endpoint = sink.grpc_endpoint if args.protocol == "grpc" else sink.http_endpoint
+        options = [
+            f"endpoint={endpoint}",
+            f"protocol={args.protocol}",
+            "service_name=benchmark",
+            f"max_in_flight={args.max_in_flight}",
+            f"shutdown_timeout_sec={args.shutdown_timeout_sec}",
+            f"spill={args.spill}",
+            f"spill_dir={spill_dir}",
+        ]
+        if args.batch_max_export_size:
+            options.append(f"batch_max_export_size={args.batch_max_export_size}")
+        if args.batch_max_queue_size:
+            options.append(f"batch_max_queue_size={args.batch_max_queue_size}")
+        listener = TracingListener(*options)
+
+        start = time.monotonic()
+        generated = _run_load(listener, args.tests, args.keywords)
+        generate_sec = time.monotonic() - start
+        close_start = time.monotonic()
+        listener.close()
+        close_sec = time.monotonic() - close_start
+        total_sec = time.monotonic() - start
+        received = sink.stats.snapshot()
+
+    dropped = max(0, generated - received["spans"])
+    print(f"protocol:          {args.protocol}")
+    print(f"spans generated:   {generated}")
+    print(f"spans received:    {received['spans']} in {received['requests']} requests")
+    print(f"bytes received:    {received['bytes']}")
+    print(f"generate:          {generated / generate_sec:.0f} spans/s ({generate_sec:.2f}s)")
+    print(f"close():           {close_sec:.2f}s")
+    print(f"end-to-end:        {received['spans'] / total_sec:.0f} spans/s")
+    print(f"drop rate:         {dropped / generated:.2%}")
+    print(f"injected errors:   {received['errors_injected']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
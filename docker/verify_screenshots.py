@@ -13,57 +13,45 @@ Usage:
 
     # Expect at least one path_fallback (oversized file)
     python3 verify_screenshots.py trace_embedded.json --expect-fallback
+
+Requires robotframework-tracer to be installed (uses its streaming reader).
 """
 
 import argparse
-import json
 import sys
 
+from robotframework_tracer.reader import iter_spans
+
 
-def find_screenshot_events(trace_data):
-    """Extract all rf.screenshot events from OTLP trace JSON."""
+def find_screenshot_events(spans):
+    """Extract all rf.screenshot events from OTLP span dicts."""
     events = []
-    for rs in trace_data.get("resource_spans", []):
-        for ss in rs.get("scope_spans", []):
-            for span in ss.get("spans", []):
-                span_name = span.get("name", "")
-                for event in span.get("events", []):
-                    if event.get("name") == "rf.screenshot":
-                        attrs = {}
-                        for a in event.get("attributes", []):
-                            key = a.get("key", "")
-                            val = a.get("value", {})
-                            for vtype in ("stringValue", "string_value",
-                                        "intValue", "int_value",
-                                        "boolValue", "bool_value"):
-                                if vtype in val:
-                                    attrs[key] = val[vtype]
-                                    break
-                        events.append({"span": span_name, "attrs": attrs})
+    for span in spans:
+        span_name = span.get("name", "")
+        for event in span.get("events", []):
+            if event.get("name") == "rf.screenshot":
+                attrs = {}
+                for a in event.get("attributes", []):
+                    key = a.get("key", "")
+                    val = a.get("value", {})
+                    for vtype in ("stringValue", "string_value",
+                                "intValue", "int_value",
+                                "boolValue", "bool_value"):
+                        if vtype in val:
+                            attrs[key] = val[vtype]
+                            break
+                events.append({"span": span_name, "attrs": attrs})
     return events
 
 
 def load_trace_file(path):
-    """Load a trace file that may contain multiple concatenated JSON objects."""
-    all_events = []
-    with open(path) as f:
-        content = f.read().strip()
-    if not content:
-        return all_events
-    decoder = json.JSONDecoder()
-    pos = 0
-    while pos < len(content):
-        while pos < len(content) and content[pos] in " \t\n\r":
-            pos += 1
-        if pos >= len(content):
-            break
-        try:
-            obj, end = decoder.raw_decode(content, pos)
-            all_events.extend(find_screenshot_events(obj))
-            pos = end
-        except json.JSONDecodeError:
-            break
-    return all_events
+    """Stream screenshot events from a trace file (.json or .json.gz).
+
+    Spans are read batch by batch; batches without screenshot events are
+    skipped before they are decoded.
+    """
+    spans = iter_spans(path, contains="rf.screenshot", fields=("name", "events"))
+    return find_screenshot_events(spans)
 
 
 def print_events(events):
@@ -119,7 +107,7 @@ def validate_common(events):
 
 def main():
     parser = argparse.ArgumentParser(description="Verify screenshot trace events")
-    parser.add_argument("trace_file", help="Path to trace JSON file")
+    parser.add_argument("trace_file", help="Path to trace file (.json or .json.gz)")
     parser.add_argument("--expect-none", action="store_true",
                         help="Expect zero screenshot events (none mode)")
     parser.add_argument("--expect-path-only", action="store_true",
@@ -0,0 +1,596 @@
+"""Command-line tools for trace output files.
+
+Usage:
+    rf-tracer transform INPUT OUTPUT [--filter minimal] [--format gz] [--workers N]
+    rf-tracer merge INPUT... OUTPUT [--reparent] [--format gz]
+    rf-tracer index FILE... [--rebuild]
+    rf-tracer stats FILE... [--by keyword,test,library] [--top 20] [--sort self] [--json OUT]
+    rf-tracer compare BASELINE CANDIDATE [--threshold-pct 20] [--min-delta-ms 100] [--json OUT]
+    rf-tracer critical-path FILE [--top 20] [--json OUT] [--output ANNOTATED]
+    rf-tracer relay [--endpoint URL]... [--protocol grpc] [--socket PATH]
+    rf-tracer sink [--port 4318] [--grpc-port 4317] [--latency-ms N] [--error-rate F]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from .merge import (
+    DEFAULT_BATCH_SPANS,
+    DEFAULT_CHUNK_SPANS,
+    DEFAULT_FAN_IN,
+    DEFAULT_ROOT_NAME,
+    merge_files,
+)
+from .transform import DEFAULT_BATCH_LINES, OUTPUT_FORMATS, transform_file
+from .version import __version__
+
+
+def _cmd_transform(args):
+    try:
+        stats = transform_file(
+            args.input,
+            args.output,
+            output_filter=args.filter,
+            output_format=args.format,
+            workers=args.workers,
+            batch_lines=args.batch_lines,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    print(
+        f"{args.input} -> {args.output}: "
+        f"{stats['lines_in']} -> {stats['lines_out']} batches, "
+        f"{stats['spans_in']} -> {stats['spans_out']} spans"
+    )
+    return 0
+
+
+def _cmd_merge(args):
+    try:
+        stats = merge_files(
+            args.inputs,
+            args.output,
+            output_format=args.format,
+            reparent=args.reparent,
+            root_name=args.root_name,
+            chunk_spans=args.chunk_spans,
+            batch_spans=args.batch_spans,
+            tmp_dir=args.tmp_dir,
+            fan_in=args.fan_in,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    summary = (
+        f"{stats['files']} files -> {args.output}: {stats['spans_out']} spans "
+        f"({stats['runs']} sorted runs, {stats['merge_passes']} intermediate merge passes)"
+    )
+    if args.reparent:
+        summary += f", {stats['reparented']} top-level suites re-parented"
+    print(summary)
+    return 0
+
+
+def _format_ns(ns):
+    if not ns:
+        return "-"
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ns / 1e9))
+
+
+def _cmd_index(args):
+    from .index import build_index, index_path, load_index
+
+    status = 0
+    for path in args.files:
+        try:
+            index = None if args.rebuild else load_index(path)
+            action = "up to date"
+            if index is None:
+                index = build_index(path)
+                action = "built"
+        except (OSError, ValueError) as e:
+            print(f"Error: {path}: {e}", file=sys.stderr)
+            status = 2
+            continue
+        s = index["summary"]
+        print(
+            f"{index_path(path)} ({action}): {s['members']} members, {s['spans']} spans, "
+            f"{s['tests']} tests ({s['failed_tests']} failed), {len(s['trace_ids'])} traces, "
+            f"{_format_ns(s['start'])} - {_format_ns(s['end'])} UTC"
+        )
+    return status
+
+
+def _print_rows(title, rows):
+    print(f"\n{title}")
+    if not rows:
+        print("  (none)")
+        return
+    width = min(60, max(len(row["name"]) for row in rows))
+    print(
+        f"  {'name':<{width}} {'count':>7} {'total s':>9} {'self s':>9} "
+        f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'fail %':>6}"
+    )
+    for row in rows:
+        name = row["name"] if len(row["name"]) <= width else row["name"][: width - 3] + "..."
+        print(
+            f"  {name:<{width}} {row['count']:>7} {row['total_ms'] / 1000:>9.2f} "
+            f"{row['self_ms'] / 1000:>9.2f} {row['p50_ms']:>9.1f} {row['p90_ms']:>9.1f} "
+            f"{row['p99_ms']:>9.1f} {row['failure_rate'] * 100:>6.1f}"
+        )
+
+
+def _cmd_stats(args):
+    from .stats import GROUPS, compute_stats
+
+    groups = [g.strip() for g in args.by.split(",") if g.strip()]
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        print(f"Error: unknown group(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    try:
+        report = compute_stats(args.files, workers=args.workers, sort=args.sort, top=args.top)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    for group in GROUPS:
+        if group not in groups:
+            del report[group]
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(text)
+            return 0
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(
+        f"{report['files']} files, {report['spans']} spans "
+        f"({report['units']} work units{', numpy' if report['numpy'] else ''})"
+    )
+    for group in groups:
+        shown = f"top {args.top}" if args.top else "all"
+        _print_rows(f"By {group} ({shown}, sorted by {args.sort})", report[group])
+    return 0
+
+
+def _cmd_compare(args):
+    from .compare import KINDS, compare_files
+
+    kinds = tuple(k.strip() for k in args.kinds.split(",") if k.strip())
+    unknown = [k for k in kinds if k not in KINDS]
+    if unknown:
+        print(f"Error: unknown kind(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    try:
+        report = compare_files(
+            args.baseline,
+            args.candidate,
+            threshold_pct=args.threshold_pct,
+            min_delta_ms=args.min_delta_ms,
+            z_threshold=args.z_threshold,
+            min_samples=args.min_samples,
+            kinds=kinds,
+            workers=args.workers,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    status = 1 if report["regressions"] and not args.report_only else 0
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(text)
+            return status
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    summary = report["summary"]
+    print(
+        f"{summary['compared']} compared: {summary['regressions']} regressions, "
+        f"{summary['improvements']} improvements, {summary['new']} new, "
+        f"{summary['missing']} missing"
+    )
+    for title, rows in (
+        ("Regressions", report["regressions"]),
+        ("Improvements", report["improvements"]),
+    ):
+        if not rows:
+            continue
+        print(f"\n{title}")
+        for row in rows[: args.top or None]:
+            ratio = f"x{row['ratio']:.2f}" if row["ratio"] is not None else "new time"
+            print(
+                f"  {row['id']}: {row['baseline_median_ms']:.1f} -> "
+                f"{row['candidate_median_ms']:.1f} ms ({row['delta_ms']:+.1f} ms, {ratio})"
+            )
+    return status
+
+
+def _cmd_critical_path(args):
+    from .critical_path import analyze_file
+
+    try:
+        report = analyze_file(
+            args.file, top=args.top, output=args.output, output_format=args.format
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(text)
+            return 0
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(f"{report['spans']} spans, {len(report['roots'])} roots")
+    for root in report["roots"]:
+        print(
+            f"  {root['kind']} {root['name']}: wall {root['wall_ms'] / 1000:.2f} s, "
+            f"setup/teardown on path {root['setup_teardown_ms'] / 1000:.2f} s"
+        )
+    shown = f"top {args.top}" if args.top else "all"
+    print(f"\nKeywords by critical time ({shown})")
+    for row in report["keywords"]:
+        print(
+            f"  {row['critical_ms'] / 1000:>9.2f} s {row['critical_share'] * 100:>5.1f}%  "
+            f"self {row['self_ms'] / 1000:>9.2f} s  x{row['count']:<6} {row['name']}"
+        )
+    print(f"\nTests by critical time ({shown})")
+    for row in report["tests"]:
+        name = f"{row['name']} [{row['id']}]" if row["id"] else row["name"]
+        print(
+            f"  {row['critical_ms'] / 1000:>9.2f} s  of {row['duration_ms'] / 1000:>9.2f} s  {name}"
+        )
+    if args.output:
+        print(f"\nAnnotated trace written to {args.output}")
+    return 0
+
+
+def _relay_export_config(args):
+    """Export config of ``rf-tracer relay``; unset options keep the ExportConfig defaults."""
+    from .exporters import ExportConfig
+
+    options = {
+        "spill": args.spill,
+        "spill_dir": args.spill_dir,
+        "spill_max_mb": args.spill_max_mb,
+        "queue_high_water": args.queue_high_water,
+        "max_in_flight": args.max_in_flight,
+        "timeout_sec": args.timeout,
+        "retry_attempts": args.retry_attempts,
+        "retry_backoff_max_sec": args.retry_backoff_max,
+        "compression": args.compression,
+    }
+    return ExportConfig(**{key: value for key, value in options.items() if value is not None})
+
+
+def _cmd_relay(args):
+    from .exporters import create_fanout_exporter
+    from .relay import RELAY_AVAILABLE, RelayServer, default_socket_path
+
+    if not RELAY_AVAILABLE:
+        print("Error: the span relay requires Unix domain sockets", file=sys.stderr)
+        return 2
+    endpoints = args.endpoint or [
+        os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    ]
+    socket_path = args.socket or default_socket_path(endpoints, args.protocol)
+    config = _relay_export_config(args)
+    server = RelayServer(
+        socket_path,
+        create_fanout_exporter(endpoints, args.protocol, config),
+        output=args.output,
+        batch_delay_ms=args.batch_delay_ms,
+        idle_timeout_sec=args.idle_timeout,
+    )
+    try:
+        server.start()
+    except OSError as e:
+        server.exporter.shutdown()
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    print(f"Span relay listening on {socket_path} -> {', '.join(endpoints)}", flush=True)
+    server.serve()
+    stats = server.stats
+    print(
+        f"Relayed {stats['requests']} requests ({stats['bytes']} bytes) from "
+        f"{stats['connections']} connections in {stats['batches']} batches"
+    )
+    return 0
+
+
+def _cmd_sink(args):
+    from .sink import OtlpSink
+
+    try:
+        sink = OtlpSink(
+            host=args.host,
+            http_port=args.port,
+            grpc_port=args.grpc_port,
+            latency_ms=args.latency_ms,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            output=args.output,
+        )
+    except (OSError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    sink.start()
+    print(f"OTLP/HTTP sink listening on {sink.http_endpoint}")
+    if sink.grpc_port:
+        print(f"OTLP/gRPC sink listening on {sink.grpc_endpoint}")
+    deadline = time.monotonic() + args.duration if args.duration else None
+    interval = args.report_interval if args.report_interval > 0 else 1.0
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            remaining = deadline - time.monotonic() if deadline else interval
+            time.sleep(max(0.0, min(interval, remaining)))
+            if args.report_interval > 0 and (deadline is None or time.monotonic() < deadline):
+                print(sink.stats.summary(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.stop()
+    print(f"Received {sink.stats.summary()}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="rf-tracer", description="Tools for robotframework-tracer trace output files"
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    subparsers = parser.add_subparsers(dest="command")
+
+    p = subparsers.add_parser(
+        "transform", help="Re-filter, compact and convert an existing trace file"
+    )
+    p.add_argument("input", help="Input trace file (.json or .json.gz)")
+    p.add_argument("output", help="Output trace file")
+    p.add_argument(
+        "--filter",
+        default="",
+        help="Output filter preset (minimal, full) or path to a filter .json file",
+    )
+    p.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="Output format (default: inferred from the output file extension)",
+    )
+    p.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPU count)"
+    )
+    p.add_argument(
+        "--batch-lines",
+        type=int,
+        default=DEFAULT_BATCH_LINES,
+        help=f"Input lines per work unit (default: {DEFAULT_BATCH_LINES})",
+    )
+    p.set_defaults(func=_cmd_transform)
+
+    p = subparsers.add_parser(
+        "merge", help="Merge trace files (e.g. pabot workers) into one file ordered by start time"
+    )
+    p.add_argument("inputs", nargs="+", help="Input trace files (.json or .json.gz)")
+    p.add_argument("output", help="Output trace file")
+    p.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="Output format (default: inferred from the output file extension)",
+    )
+    p.add_argument(
+        "--reparent",
+        action="store_true",
+        help="Put top-level suite spans under one synthetic run root span (one trace)",
+    )
+    p.add_argument("--root-name", default=DEFAULT_ROOT_NAME, help="Name of the synthetic root span")
+    p.add_argument(
+        "--chunk-spans",
+        type=int,
+        default=DEFAULT_CHUNK_SPANS,
+        help=f"Spans sorted in memory at a time (default: {DEFAULT_CHUNK_SPANS})",
+    )
+    p.add_argument(
+        "--batch-spans",
+        type=int,
+        default=DEFAULT_BATCH_SPANS,
+        help=f"Spans per output line (default: {DEFAULT_BATCH_SPANS})",
+    )
+    p.add_argument("--tmp-dir", default=None, help="Directory for temporary sort runs")
+    p.add_argument(
+        "--fan-in",
+        type=int,
+        default=DEFAULT_FAN_IN,
+        help=f"Sorted runs merged (and open) at a time (default: {DEFAULT_FAN_IN})",
+    )
+    p.set_defaults(func=_cmd_merge)
+
+    p = subparsers.add_parser("index", help="Build or show the sidecar member index of trace files")
+    p.add_argument("files", nargs="+", help="Trace files (.json or .json.gz)")
+    p.add_argument("--rebuild", action="store_true", help="Rebuild even if a valid index exists")
+    p.set_defaults(func=_cmd_index)
+
+    p = subparsers.add_parser("stats", help="Duration statistics per keyword, test and library")
+    p.add_argument("files", nargs="+", help="Trace files (.json or .json.gz)")
+    p.add_argument(
+        "--by",
+        default="keyword,test,library",
+        help="Comma-separated groups to report (default: keyword,test,library)",
+    )
+    p.add_argument(
+        "--sort",
+        choices=("total", "self", "count", "p50", "p90", "p99", "failure_rate"),
+        default="total",
+        help="Order rows by this column, descending (default: total)",
+    )
+    p.add_argument("--top", type=int, default=20, help="Rows per group (default: 20, 0 = all)")
+    p.add_argument("--json", default="", help="Write the full report as JSON ('-' for stdout)")
+    p.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPU count)"
+    )
+    p.set_defaults(func=_cmd_stats)
+
+    p = subparsers.add_parser(
+        "compare", help="Compare test and keyword durations of two runs (exit 1 on regressions)"
+    )
+    p.add_argument("baseline", help="Baseline trace file (.json or .json.gz)")
+    p.add_argument("candidate", help="Candidate trace file (.json or .json.gz)")
+    p.add_argument(
+        "--threshold-pct",
+        type=float,
+        default=20.0,
+        help="Minimum median slowdown in percent (default: 20)",
+    )
+    p.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=100.0,
+        help="Minimum median slowdown in milliseconds (default: 100)",
+    )
+    p.add_argument(
+        "--z-threshold",
+        type=float,
+        default=3.0,
+        help="Minimum MAD-scaled z-score of the shift, when both sides have "
+        "--min-samples samples (default: 3)",
+    )
+    p.add_argument(
+        "--min-samples",
+        type=int,
+        default=3,
+        help="Samples per side needed to apply the z-score (default: 3)",
+    )
+    p.add_argument(
+        "--kinds", default="test,keyword", help="Comma-separated kinds to compare (default: all)"
+    )
+    p.add_argument("--top", type=int, default=20, help="Rows shown per list (default: 20, 0 = all)")
+    p.add_argument("--json", default="", help="Write the full report as JSON ('-' for stdout)")
+    p.add_argument(
+        "--report-only", action="store_true", help="Exit 0 even when regressions are found"
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Read both files in parallel (default: 2, 1 = inline)",
+    )
+    p.set_defaults(func=_cmd_compare)
+
+    p = subparsers.add_parser(
+        "critical-path", help="Self time, critical path and keywords dominating wall time"
+    )
+    p.add_argument("file", help="Trace file (.json or .json.gz)")
+    p.add_argument("--top", type=int, default=20, help="Rows per list (default: 20, 0 = all)")
+    p.add_argument("--json", default="", help="Write the report as JSON ('-' for stdout)")
+    p.add_argument(
+        "--output",
+        default=None,
+        help="Write a copy of the trace with rf.self_time_ms, rf.critical_time_ms and "
+        "rf.critical_path span attributes",
+    )
+    p.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="Format of --output (default: from its extension)",
+    )
+    p.set_defaults(func=_cmd_critical_path)
+
+    p = subparsers.add_parser(
+        "relay", help="Run the per-host span relay shared by pabot workers (relay=true)"
+    )
+    p.add_argument(
+        "--endpoint",
+        action="append",
+        default=[],
+        help="Collector endpoint; repeat for several (default: OTEL_EXPORTER_OTLP_ENDPOINT)",
+    )
+    p.add_argument("--protocol", choices=("http", "grpc"), default="http")
+    p.add_argument(
+        "--socket", default="", help="Unix socket path (default: derived from the endpoints)"
+    )
+    p.add_argument("--output", default="", help="Also append all spans to this JSON file")
+    p.add_argument(
+        "--batch-delay-ms",
+        type=float,
+        default=200,
+        help="Coalesce worker batches for this long (default: 200)",
+    )
+    p.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=0,
+        help="Exit after this many seconds without workers (default: run until Ctrl-C)",
+    )
+    p.add_argument("--max-in-flight", type=int, default=1, help="Concurrent requests per endpoint")
+    p.add_argument("--spill", action="store_true", help="Spill unsendable batches to disk")
+    p.add_argument("--spill-dir", default="", help="Spill directory (default: .rf-tracer-spill)")
+    p.add_argument("--spill-max-mb", type=float, default=None, help="Spill directory size cap")
+    p.add_argument("--queue-high-water", type=int, default=None, help="Queued batches per endpoint")
+    p.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Export request timeout in seconds (default: OTEL_EXPORTER_OTLP_TIMEOUT)",
+    )
+    p.add_argument("--retry-attempts", type=int, default=None, help="Attempts per export request")
+    p.add_argument(
+        "--retry-backoff-max", type=float, default=None, help="Maximum retry backoff in seconds"
+    )
+    p.add_argument(
+        "--compression",
+        choices=("gzip", "none"),
+        default=None,
+        help="Export compression (default: OTEL_EXPORTER_OTLP_COMPRESSION)",
+    )
+    p.set_defaults(func=_cmd_relay)
+
+    p = subparsers.add_parser(
+        "sink", help="Run a local OTLP receiver that counts (and optionally stores) spans"
+    )
+    p.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    p.add_argument("--port", type=int, default=4318, help="OTLP/HTTP port (default: 4318)")
+    p.add_argument("--grpc-port", type=int, default=None, help="Also serve OTLP/gRPC on this port")
+    p.add_argument(
+        "--latency-ms", type=float, default=0, help="Delay every request by this many ms"
+    )
+    p.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of requests to fail (0-1)"
+    )
+    p.add_argument("--error-status", type=int, default=503, help="HTTP status for injected errors")
+    p.add_argument("--output", default="", help="Append received spans to this JSON file")
+    p.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between stats lines (default: 5, 0 disables)",
+    )
+    p.add_argument(
+        "--duration",
+        type=float,
+        default=0,
+        help="Stop after this many seconds (default: run until Ctrl-C)",
+    )
+    p.set_defaults(func=_cmd_sink)
+
+    return parser
+
+
+def main(argv=None):
+    """Entry point for the ``rf-tracer`` console script."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, "func", None):
+        parser.print_help()
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Run-to-run duration comparison of two trace files.
+
+Tests are matched by their name plus ``rf.test.id``, e.g. ``Login [s1-t2]``
+(ids alone repeat across pabot workers, which all number their suites from
+``s1``), and keywords by the test they run in plus their keyword-name path
+from the test, e.g. ``Login [s1-t2] :: Log In/Open Browser``. Keywords of
+suite setups and teardowns are rooted at the suite, identified the same way. Repeated calls of the same keyword at
+the same path (loops, retries) are samples of one identity.
+
+Both files are streamed. Spans are exported when they end, so keyword
+spans arrive before their test; a keyword's path is resolved as soon as
+its parent's is known, and until then it waits with its siblings under the
+parent span id. Only unresolved subtrees of running tests are held, so
+memory does not grow with the file (apart from the duration samples).
+
+Durations are compared with robust statistics: the median of each side,
+and a z-score of the median shift scaled by the median absolute deviation
+(MAD) of both sides when each side has at least ``min_samples`` samples.
+An identity is a regression when its median grew by at least
+``threshold_pct`` percent and ``min_delta_ms`` milliseconds and, if the
+z-score applies, by at least ``z_threshold``; improvements mirror this.
+"""
+
+import array
+import math
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .reader import iter_batches, span_attributes
+
+KINDS = ("test", "keyword")
+DEFAULT_THRESHOLD_PCT = 20.0
+DEFAULT_MIN_DELTA_MS = 100.0
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_MIN_SAMPLES = 3
+
+_ATTR_KEYS = (
+    "rf.type",
+    "rf.test.id",
+    "rf.test.name",
+    "rf.suite.id",
+    "rf.suite.name",
+    "rf.keyword.name",
+)
+# Resolved spans remembered for files where parents come before children
+_RESOLVED_CAP = 200_000
+_MAD_SCALE = 1.4826  # MAD to standard deviation for normally distributed data
+
+
+def _label(name, item_id):
+    """Test or suite identity: name plus id, as in ``rf-tracer stats`` rows."""
+    return f"{name} [{item_id}]" if item_id else str(name)
+
+
+class _Collector:
+    """Collect duration samples per test/keyword identity from a span stream."""
+
+    def __init__(self):
+        self.samples = {}
+        self.spans = 0
+        self._resolved = OrderedDict()  # Span id -> (root, path)
+        self._pending = {}  # Parent span id -> [node]
+
+    def add(self, span):
+        self.spans += 1
+        attrs = span_attributes(span, _ATTR_KEYS)
+        kind = str(attrs.get("rf.type", "")).upper()
+        span_id = span.get("span_id", "")
+        start = int(span.get("start_time_unix_nano", 0) or 0)
+        end = int(span.get("end_time_unix_nano", 0) or 0)
+        name = attrs.get("rf.keyword.name") or span.get("name", "")
+        # node: (span_id, kind, name, duration_ms, children)
+        node = (span_id, kind, name, max(0, end - start) / 1e6, self._pending.pop(span_id, []))
+        if kind == "TEST" or (not kind and "rf.test.name" in attrs):
+            root = _label(
+                attrs.get("rf.test.name") or span.get("name", ""), attrs.get("rf.test.id")
+            )
+            self._resolve(node, (root, ""))
+        elif kind == "SUITE" or (not kind and "rf.suite.name" in attrs):
+            root = _label(
+                attrs.get("rf.suite.name") or span.get("name", ""), attrs.get("rf.suite.id")
+            )
+            self._resolve(node, (f"suite:{root}", ""))
+        else:
+            parent = span.get("parent_span_id", "")
+            location = self._resolved.get(parent)
+            if location is not None:
+                self._resolve(node, self._child_location(location, name))
+            else:
+                self._pending.setdefault(parent, []).append(node)
+
+    @staticmethod
+    def _child_location(location, name):
+        root, path = location
+        return root, f"{path}/{name}" if path else name
+
+    def _resolve(self, node, location):
+        """Record a span and its waiting descendants (iteratively)."""
+        stack = [(node, location)]
+        while stack:
+            (span_id, kind, name, duration, children), location = stack.pop()
+            root, path = location
+            if path:
+                self._sample(("keyword", root, path), duration)
+            elif kind != "SUITE":
+                self._sample(("test", root, ""), duration)
+            self._resolved[span_id] = location
+            if len(self._resolved) > _RESOLVED_CAP:
+                self._resolved.popitem(last=False)
+            for child in children:
+                stack.append((child, self._child_location(location, child[2])))
+
+    def _sample(self, key, duration):
+        values = self.samples.get(key)
+        if values is None:
+            values = self.samples[key] = array.array("d")
+        values.append(duration)
+
+
+def collect_samples(path):
+    """Return ({(kind, root, path): array of durations in ms}, span count) for a trace file."""
+    collector = _Collector()
+    for batch in iter_batches(path):
+        for rs in batch.get("resource_spans", ()):
+            for ss in rs.get("scope_spans", ()):
+                for span in ss.get("spans", ()):
+                    collector.add(span)
+    return collector.samples, collector.spans
+
+
+def _median(values):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2.0
+
+
+def _mad(values, median):
+    return _median([abs(v - median) for v in values])
+
+
+def _identity(key):
+    kind, root, path = key
+    return root if kind == "test" else f"{root} :: {path}"
+
+
+def compare_samples(
+    baseline,
+    candidate,
+    threshold_pct=DEFAULT_THRESHOLD_PCT,
+    min_delta_ms=DEFAULT_MIN_DELTA_MS,
+    z_threshold=DEFAULT_Z_THRESHOLD,
+    min_samples=DEFAULT_MIN_SAMPLES,
+    kinds=KINDS,
+):
+    """Compare two sample sets; return (regressions, improvements, compared, new, missing)."""
+    ratio_limit = 1.0 + threshold_pct / 100.0
+    regressions, improvements = [], []
+    compared = 0
+    for key in baseline.keys() & candidate.keys():
+        if key[0] not in kinds:
+            continue
+        compared += 1
+        base, cand = baseline[key], candidate[key]
+        mb, mc = _median(base), _median(cand)
+        delta = mc - mb
+        z = None
+        if len(base) >= min_samples and len(cand) >= min_samples:
+            scale = _MAD_SCALE * math.sqrt((_mad(base, mb) ** 2 + _mad(cand, mc) ** 2) / 2.0)
+            if scale:
+                z = delta / scale
+            else:  # Identical samples on both sides: any shift is significant
+                z = math.copysign(math.inf, delta) if delta else 0.0
+        row = {
+            "kind": key[0],
+            "id": _identity(key),
+            "baseline_median_ms": mb,
+            "candidate_median_ms": mc,
+            "delta_ms": delta,
+            "ratio": mc / mb if mb else None,
+            "baseline_samples": len(base),
+            "candidate_samples": len(cand),
+            # None when there are too few samples or no spread (JSON has no Infinity)
+            "z": z if z is not None and math.isfinite(z) else None,
+        }
+        if delta >= min_delta_ms and mc >= mb * ratio_limit:
+            if z is None or z >= z_threshold:
+                regressions.append(row)
+        elif -delta >= min_delta_ms and mb >= mc * ratio_limit:
+            if z is None or -z >= z_threshold:
+                improvements.append(row)
+    regressions.sort(key=lambda row: (-row["delta_ms"], row["id"]))
+    improvements.sort(key=lambda row: (row["delta_ms"], row["id"]))
+
+    def identities(keys):
+        return sorted(_identity(key) for key in keys if key[0] in kinds)
+
+    new = identities(candidate.keys() - baseline.keys())
+    missing = identities(baseline.keys() - candidate.keys())
+    return regressions, improvements, compared, new, missing
+
+
+def compare_files(
+    baseline,
+    candidate,
+    threshold_pct=DEFAULT_THRESHOLD_PCT,
+    min_delta_ms=DEFAULT_MIN_DELTA_MS,
+    z_threshold=DEFAULT_Z_THRESHOLD,
+    min_samples=DEFAULT_MIN_SAMPLES,
+    kinds=KINDS,
+    workers=2,
+):
+    """Compare test and keyword durations of two trace files.
+
+    The two files are read in parallel processes unless ``workers`` is 1.
+
+    Returns:
+        Report dict with files, thresholds, summary counts, regressions,
+        improvements, and the new and missing identities.
+    """
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            (base, base_spans), (cand, cand_spans) = pool.map(
+                collect_samples, [baseline, candidate]
+            )
+    else:
+        base, base_spans = collect_samples(baseline)
+        cand, cand_spans = collect_samples(candidate)
+    regressions, improvements, compared, new, missing = compare_samples(
+        base, cand, threshold_pct, min_delta_ms, z_threshold, min_samples, kinds
+    )
+    return {
+        "baseline": {"file": baseline, "spans": base_spans},
+        "candidate": {"file": candidate, "spans": cand_spans},
+        "thresholds": {
+            "threshold_pct": threshold_pct,
+            "min_delta_ms": min_delta_ms,
+            "z_threshold": z_threshold,
+            "min_samples": min_samples,
+        },
+        "summary": {
+            "compared": compared,
+            "regressions": len(regressions),
+            "improvements": len(improvements),
+            "new": len(new),
+            "missing": len(missing),
+        },
+        "regressions": regressions,
+        "improvements": improvements,
+        "new": new,
+        "missing": missing,
+    }
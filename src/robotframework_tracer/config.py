@@ -2,6 +2,12 @@ import json
 import os
 from pathlib import Path
 
+from .exporters import ExportConfig
+from .log_capture import (
+    DEFAULT_LOG_DEDUP_MAX_DISTINCT,
+    DEFAULT_LOG_RATE_BURST,
+    parse_rate_limits,
+)
 from .screenshot import ScreenshotConfig
 
 # Config file search names (checked in order)
@@ -80,8 +86,12 @@ def _flatten_config_file(data):
       output.file   -> trace_output_file
       output.format -> trace_output_format
       output.filter -> trace_output_filter
+      output.index  -> trace_output_index
+      output.logs.file   -> log_output_file
+      output.logs.format -> log_output_format
 
-    The 'screenshots' section is preserved as-is (dict) for ScreenshotConfig.
+    The 'screenshots' and 'export' sections are preserved as-is (dict) for
+    ScreenshotConfig and ExportConfig.
     """
     flat = {}
     for key, value in data.items():
@@ -94,9 +104,19 @@ def _flatten_config_file(data):
                 flat["trace_output_format"] = value["format"]
             if "filter" in value:
                 flat["trace_output_filter"] = value["filter"]
+            if "index" in value:
+                flat["trace_output_index"] = value["index"]
+            logs = value.get("logs")
+            if isinstance(logs, dict):
+                if "file" in logs:
+                    flat["log_output_file"] = logs["file"]
+                if "format" in logs:
+                    flat["log_output_format"] = logs["format"]
         elif key == "screenshots" and isinstance(value, dict):
             # Keep as dict — ScreenshotConfig.from_dict() handles it
             flat["screenshots"] = value
+        elif key == "export" and isinstance(value, dict):
+            flat["export"] = value
         else:
             flat[key] = value
     return flat
@@ -144,6 +164,55 @@ class TracerConfig:
         self.max_log_length = int(
             self._get_config("max_log_length", kwargs, "RF_TRACER_MAX_LOG_LENGTH", "500")
         )
+        self.log_dedup = self._get_bool_config("log_dedup", kwargs, "RF_TRACER_LOG_DEDUP", False)
+        self.log_dedup_max_distinct = int(
+            self._get_config(
+                "log_dedup_max_distinct",
+                kwargs,
+                "RF_TRACER_LOG_DEDUP_MAX_DISTINCT",
+                str(DEFAULT_LOG_DEDUP_MAX_DISTINCT),
+            )
+        )
+        # Where captured logs go: "logs" (OTLP Logs API) or "events" (span events)
+        self.log_destination = self._get_config(
+            "log_destination", kwargs, "RF_TRACER_LOG_DESTINATION", "logs"
+        ).lower()
+        self.log_max_events_per_span = int(
+            self._get_config(
+                "log_max_events_per_span", kwargs, "RF_TRACER_LOG_MAX_EVENTS_PER_SPAN", "100"
+            )
+        )
+        # Token-bucket log rate limits per test: a number, "LEVEL=rate,..." or a dict
+        rate_limit = kwargs.get("log_rate_limit", os.environ.get("RF_TRACER_LOG_RATE_LIMIT"))
+        if rate_limit is None:
+            rate_limit = self._file_config.get("log_rate_limit", "")
+        self.log_rate_limits = parse_rate_limits(rate_limit)
+        self.log_rate_burst = int(
+            self._get_config(
+                "log_rate_burst", kwargs, "RF_TRACER_LOG_RATE_BURST", str(DEFAULT_LOG_RATE_BURST)
+            )
+        )
+        # Batch processor tuning shared by span and log export (0 = SDK default)
+        self.batch_max_queue_size = int(
+            self._get_config("batch_max_queue_size", kwargs, "RF_TRACER_BATCH_MAX_QUEUE_SIZE", "0")
+        )
+        self.batch_max_export_size = int(
+            self._get_config(
+                "batch_max_export_size", kwargs, "RF_TRACER_BATCH_MAX_EXPORT_SIZE", "0"
+            )
+        )
+        self.batch_schedule_delay_ms = int(
+            self._get_config(
+                "batch_schedule_delay_ms", kwargs, "RF_TRACER_BATCH_SCHEDULE_DELAY_MS", "0"
+            )
+        )
+        # Hand spans to a per-host relay process shared by pabot workers
+        self.relay = self._get_bool_config("relay", kwargs, "RF_TRACER_RELAY", False)
+        self.relay_socket = self._get_config("relay_socket", kwargs, "RF_TRACER_RELAY_SOCKET", "")
+        # One deadline for flushing all exporters in close()
+        self.shutdown_timeout_sec = float(
+            self._get_config("shutdown_timeout_sec", kwargs, "RF_TRACER_SHUTDOWN_TIMEOUT_SEC", "10")
+        )
         self.sample_rate = float(
             self._get_config("sample_rate", kwargs, "RF_TRACER_SAMPLE_RATE", "1.0")
         )
@@ -159,6 +228,17 @@ class TracerConfig:
         self.trace_output_filter = self._get_config(
             "trace_output_filter", kwargs, "RF_TRACER_OUTPUT_FILTER", ""
         )
+        # Sidecar member index for gz trace files (see index.py)
+        self.trace_output_index = self._get_bool_config(
+            "trace_output_index", kwargs, "RF_TRACER_OUTPUT_INDEX", False
+        )
+        # Log output file (requires capture_logs); format defaults to the trace format
+        self.log_output_file = self._get_config(
+            "log_output_file", kwargs, "RF_TRACER_LOG_OUTPUT_FILE", ""
+        )
+        self.log_output_format = self._get_config(
+            "log_output_format", kwargs, "RF_TRACER_LOG_OUTPUT_FORMAT", self.trace_output_format
+        ).lower()
 
         # Screenshot capture config (from 'screenshots' section in config file)
         screenshots_dict = self._file_config.get("screenshots", {})
@@ -173,6 +253,21 @@ class TracerConfig:
             screenshots_dict["mode"] = kwargs["screenshot_mode"]
         self.screenshots = ScreenshotConfig.from_dict(screenshots_dict)
 
+        # OTLP export queue config (from 'export' section in config file)
+        export_dict = dict(self._file_config.get("export", {}))
+        env_spill = os.environ.get("RF_TRACER_SPILL")
+        if env_spill is not None:
+            export_dict["spill"] = env_spill.lower() in ("true", "1", "yes")
+        if "spill" in kwargs:
+            export_dict["spill"] = str(kwargs["spill"]).lower() in ("true", "1", "yes")
+        max_in_flight = kwargs.get("max_in_flight", os.environ.get("RF_TRACER_MAX_IN_FLIGHT"))
+        if max_in_flight:
+            export_dict["max_in_flight"] = int(max_in_flight)
+        spill_dir = kwargs.get("spill_dir", os.environ.get("RF_TRACER_SPILL_DIR"))
+        if spill_dir:
+            export_dict["spill_dir"] = spill_dir
+        self.export = ExportConfig.from_dict(export_dict)
+
     def _get_config(self, key, kwargs, env_var, default):
         """Get config value. Precedence: kwargs > env > config file > default."""
         if key in kwargs:
@@ -0,0 +1,324 @@
+"""Critical-path and self-time analysis of trace files.
+
+The span tree of a trace file is rebuilt in compact parallel arrays (one
+entry per span, children linked by index) and walked with explicit stacks,
+so trees of millions of spans never hit Python's recursion limit.
+
+Self time is a span's duration minus the durations of its direct children.
+
+The critical path of a root span (a top-level suite, or the run root added
+by ``rf-tracer merge --reparent``) is the chain of spans that determines
+its end time. It is found backwards from the root's end: the child that
+finished last is on the path, then the child that finished last before that
+child started, and so on; time not covered by such a child is the parent's
+own critical time. For sequential Robot Framework execution the path holds
+every keyword, while for parallel pabot suites it only follows the suites
+that kept the run going. The critical times of a root's path add up to its
+wall time, so ranking keywords by critical time shows where wall time goes
+and which keywords are worth optimising.
+
+Results can be written back to a copy of the trace file as span attributes
+(``rf.self_time_ms``, ``rf.critical_time_ms``, ``rf.critical_path``) for
+visual inspection in a trace viewer.
+"""
+
+import array
+import gzip
+import json
+
+from .fileutil import atomic_path
+from .reader import iter_batches, span_attributes
+from .transform import OUTPUT_FORMATS, guess_format
+
+_ATTR_KEYS = (
+    "rf.type",
+    "rf.keyword.name",
+    "rf.keyword.library",
+    "rf.keyword.type",
+    "rf.test.id",
+    "rf.test.name",
+    "rf.suite.name",
+)
+# Span kinds listed in a root's path summary
+_PATH_KINDS = ("SUITE", "TEST", "SETUP", "TEARDOWN")
+_FIXTURE_KINDS = ("SETUP", "TEARDOWN")
+_GZIP_LEVEL = 6
+
+
+class SpanTree:
+    """Span tree of a trace file in parallel per-span arrays."""
+
+    def __init__(self):
+        self.index = {}  # Span id -> position
+        self.span_ids = []
+        self.parent_ids = []
+        self.starts = array.array("q")
+        self.ends = array.array("q")
+        self.kinds = []  # SUITE, TEST or the keyword type (KEYWORD, SETUP, ...)
+        self.labels = []
+        self.test_ids = []
+        self.children = []
+        self.roots = []
+
+    def __len__(self):
+        return len(self.span_ids)
+
+    def add(self, span):
+        span_id = span.get("span_id", "")
+        if span_id in self.index:
+            return
+        attrs = span_attributes(span, _ATTR_KEYS)
+        kind = str(attrs.get("rf.type", "")).upper()
+        if kind == "TEST" or (not kind and "rf.test.name" in attrs):
+            kind, label = "TEST", attrs.get("rf.test.name") or span.get("name", "")
+        elif kind == "SUITE" or (not kind and "rf.suite.name" in attrs):
+            kind, label = "SUITE", attrs.get("rf.suite.name") or span.get("name", "")
+        else:
+            name = attrs.get("rf.keyword.name") or span.get("name", "")
+            library = attrs.get("rf.keyword.library", "")
+            kind = str(attrs.get("rf.keyword.type") or "KEYWORD").upper()
+            label = f"{library}.{name}" if library else name
+        self.index[span_id] = len(self.span_ids)
+        self.span_ids.append(span_id)
+        self.parent_ids.append(span.get("parent_span_id", ""))
+        self.starts.append(int(span.get("start_time_unix_nano", 0) or 0))
+        self.ends.append(int(span.get("end_time_unix_nano", 0) or 0))
+        self.kinds.append(kind)
+        self.labels.append(label)
+        self.test_ids.append(str(attrs.get("rf.test.id", "")) if kind == "TEST" else "")
+
+    def link(self):
+        """Resolve parent ids into child lists; spans without a parent in the file are roots."""
+        self.children = [None] * len(self)
+        self.roots = []
+        for i, parent_id in enumerate(self.parent_ids):
+            parent = self.index.get(parent_id) if parent_id else None
+            if parent is None or parent == i:
+                self.roots.append(i)
+            elif self.children[parent] is None:
+                self.children[parent] = [i]
+            else:
+                self.children[parent].append(i)
+        self.parent_ids = None  # Only needed for linking
+        self.roots.sort(key=self.starts.__getitem__)
+
+    def duration(self, i):
+        return max(0, self.ends[i] - self.starts[i])
+
+
+def load_tree(path):
+    """Read a trace file into a linked ``SpanTree``."""
+    tree = SpanTree()
+    for batch in iter_batches(path):
+        for rs in batch.get("resource_spans", ()):
+            for ss in rs.get("scope_spans", ()):
+                for span in ss.get("spans", ()):
+                    tree.add(span)
+    tree.link()
+    return tree
+
+
+def self_times(tree):
+    """Return per-span self time in ns (duration minus direct children, not below 0)."""
+    result = array.array("q", (tree.duration(i) for i in range(len(tree))))
+    for i, kids in enumerate(tree.children):
+        if kids:
+            result[i] = max(0, result[i] - sum(tree.duration(c) for c in kids))
+    return result
+
+
+def critical_times(tree):
+    """Walk the critical path of every root.
+
+    Returns:
+        (critical, on_path, tests, roots): per-span critical time in ns,
+        per-span path flags, critical ns per test position, and one dict per
+        root with its setup/teardown critical time and the suites, tests,
+        setups and teardowns on its path in start order.
+    """
+    starts, ends, kinds = tree.starts, tree.ends, tree.kinds
+    critical = array.array("q", bytes(8 * len(tree)))
+    on_path = bytearray(len(tree))
+    tests = {}
+    roots = []
+    for root in tree.roots:
+        fixture_ns = 0
+        path = []
+        # (span, latest end still on the path, enclosing test, inside setup/teardown)
+        stack = [(root, ends[root], -1, False)]
+        while stack:
+            i, limit, test, fixture = stack.pop()
+            kind = kinds[i]
+            if kind == "TEST":
+                test = i
+            fixture = fixture or kind in _FIXTURE_KINDS
+            lo = starts[i]
+            cursor = min(ends[i], limit)
+            own = 0
+            kids = tree.children[i]
+            if kids:
+                for child in sorted(kids, key=ends.__getitem__, reverse=True):
+                    if cursor <= lo:
+                        break
+                    if starts[child] >= cursor:
+                        continue  # Overlapped by a later-finishing sibling
+                    child_end = min(ends[child], cursor)
+                    own += cursor - child_end
+                    stack.append((child, child_end, test, fixture))
+                    cursor = max(starts[child], lo)
+            own += max(0, cursor - lo)
+            critical[i] = own
+            on_path[i] = 1
+            if test >= 0:
+                tests[test] = tests.get(test, 0) + own
+            if fixture:
+                fixture_ns += own
+            if kind in _PATH_KINDS:
+                path.append(i)
+        path.sort(key=starts.__getitem__)
+        roots.append({"span": root, "fixture_ns": fixture_ns, "path": path})
+    return critical, on_path, tests, roots
+
+
+def _ms(ns):
+    return ns / 1e6
+
+
+def analyze(tree, top=None):
+    """Compute self time, critical path and keyword ranking for a linked tree.
+
+    Returns:
+        (report, self_ns, critical_ns, on_path): the report dict and the
+        per-span arrays used for writing attributes back.
+    """
+    self_ns = self_times(tree)
+    critical, on_path, test_critical, root_paths = critical_times(tree)
+    wall_ns = sum(tree.duration(r["span"]) for r in root_paths)
+
+    keywords = {}
+    for i, kind in enumerate(tree.kinds):
+        if kind in ("SUITE", "TEST"):
+            continue
+        record = keywords.get(tree.labels[i])
+        if record is None:
+            record = keywords[tree.labels[i]] = [0, 0, 0, 0]
+        record[0] += 1
+        record[1] += tree.duration(i)
+        record[2] += self_ns[i]
+        record[3] += critical[i]
+    keyword_rows = [
+        {
+            "name": name,
+            "count": count,
+            "total_ms": _ms(total),
+            "self_ms": _ms(own),
+            "critical_ms": _ms(crit),
+            "critical_share": crit / wall_ns if wall_ns else 0.0,
+        }
+        for name, (count, total, own, crit) in keywords.items()
+    ]
+    keyword_rows.sort(key=lambda row: (-row["critical_ms"], -row["self_ms"], row["name"]))
+
+    test_rows = [
+        {
+            "name": tree.labels[i],
+            "id": tree.test_ids[i],
+            "duration_ms": _ms(tree.duration(i)),
+            "self_ms": _ms(self_ns[i]),
+            "critical_ms": _ms(test_critical.get(i, 0)),
+        }
+        for i, kind in enumerate(tree.kinds)
+        if kind == "TEST"
+    ]
+    test_rows.sort(key=lambda row: (-row["critical_ms"], -row["duration_ms"], row["name"]))
+
+    roots = []
+    for info in root_paths:
+        root = info["span"]
+        path = info["path"]
+        roots.append(
+            {
+                "name": tree.labels[root],
+                "kind": tree.kinds[root],
+                "span_id": tree.span_ids[root],
+                "wall_ms": _ms(tree.duration(root)),
+                "setup_teardown_ms": _ms(info["fixture_ns"]),
+                "path": [
+                    {
+                        "name": tree.labels[i],
+                        "kind": tree.kinds[i],
+                        "span_id": tree.span_ids[i],
+                        "duration_ms": _ms(tree.duration(i)),
+                        "critical_ms": _ms(critical[i]),
+                    }
+                    for i in (path[:top] if top else path)
+                ],
+            }
+        )
+    report = {
+        "spans": len(tree),
+        "wall_ms": _ms(wall_ns),
+        "roots": roots,
+        "keywords": keyword_rows[:top] if top else keyword_rows,
+        "tests": test_rows[:top] if top else test_rows,
+    }
+    return report, self_ns, critical, on_path
+
+
+def write_annotated(src, dst, tree, self_ns, critical, on_path, output_format=None):
+    """Copy a trace file adding rf.self_time_ms, rf.critical_time_ms and rf.critical_path."""
+    output_format = output_format or guess_format(dst)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    with atomic_path(dst) as tmp_path:
+        opener = (
+            gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=_GZIP_LEVEL)
+            if output_format == "gz"
+            else open(tmp_path, "w", encoding="utf-8")
+        )
+        with opener as out:
+            for d in iter_batches(src):
+                for rs in d.get("resource_spans", ()):
+                    for ss in rs.get("scope_spans", ()):
+                        for span in ss.get("spans", ()):
+                            i = tree.index.get(span.get("span_id", ""))
+                            if i is None:
+                                continue
+                            span.setdefault("attributes", []).extend(
+                                (
+                                    {
+                                        "key": "rf.self_time_ms",
+                                        "value": {"double_value": _ms(self_ns[i])},
+                                    },
+                                    {
+                                        "key": "rf.critical_time_ms",
+                                        "value": {"double_value": _ms(critical[i])},
+                                    },
+                                    {
+                                        "key": "rf.critical_path",
+                                        "value": {"bool_value": bool(on_path[i])},
+                                    },
+                                )
+                            )
+                out.write(json.dumps(d, separators=(",", ":")) + "\n")
+
+
+def analyze_file(path, top=None, output=None, output_format=None):
+    """Run the critical-path analysis on a trace file.
+
+    Args:
+        path: Trace file (.json or .json.gz).
+        top: Keep only this many keyword, test and path rows.
+        output: Also write a copy of the trace file with the results as
+            span attributes.
+        output_format: "json" or "gz" for ``output`` (default: from its name).
+
+    Returns:
+        Report dict with span count, wall time, per-root critical paths and
+        keyword and test rows ranked by critical time.
+    """
+    tree = load_tree(path)
+    report, self_ns, critical, on_path = analyze(tree, top=top)
+    if output:
+        write_annotated(path, output, tree, self_ns, critical, on_path, output_format)
+    return report
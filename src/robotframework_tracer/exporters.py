@@ -0,0 +1,632 @@
+"""OTLP span export with a disk-backed spill and retry queue.
+
+The SDK's batch processor hands span batches to OtlpSpanExporter (one
+endpoint) or FanoutSpanExporter (several endpoints), which encode each
+batch once and queue the same encoded request for every endpoint. An
+EndpointQueue per collector endpoint sends queued requests from
+``max_in_flight`` background threads with retries, so several requests can
+be in flight over a high-latency link:
+
+  - when more than ``queue_high_water`` requests are waiting in memory, or
+    a request still fails after its retries, it is appended to a SpillStore
+    (segment files in the spill directory) instead of being dropped;
+  - a replay thread sends spilled requests back to the endpoint with
+    exponential backoff, including requests left behind by earlier runs;
+  - requests still queued at shutdown are spilled for the next run.
+
+Without a spill store, a full queue blocks the exporter for up to
+``timeout_sec`` (back-pressure into the batch processor) before the request
+is dropped.
+
+The senders honour the same environment settings as the SDK's OTLP span
+exporters (``OTEL_EXPORTER_OTLP_TRACES_*``, falling back to
+``OTEL_EXPORTER_OTLP_*``): headers, CA certificate, client certificate and
+key, and, unless set in the ``export`` config, timeout and compression.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import unquote, urlparse
+
+import requests
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from requests.adapters import HTTPAdapter
+
+from .spill import DEFAULT_SPILL_MAX_MB, SpillStore
+
+try:
+    import grpc
+
+    GRPC_AVAILABLE = True
+except ImportError:
+    GRPC_AVAILABLE = False
+
+DEFAULT_SPILL_DIR = ".rf-tracer-spill"
+DEFAULT_QUEUE_HIGH_WATER = 64
+DEFAULT_MAX_IN_FLIGHT = 1
+DEFAULT_TIMEOUT_SEC = 10.0
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF_MAX_SEC = 30.0
+DEFAULT_COMPRESSION = "gzip"
+COMPRESSIONS = ("gzip", "none")
+
+_RETRY_BACKOFF_START_SEC = 0.5
+_REPLAY_IDLE_SEC = 5.0
+_RETRYABLE_STATUS = (429, 502, 503, 504)
+_GRPC_TRACE_METHOD = "/opentelemetry.proto.collector.trace.v1.TraceService/Export"
+
+# One-byte payload prefix recording how the body is encoded (kept in spill files)
+_RAW = b"r"
+_GZIP = b"g"
+
+
+class ExportConfig:
+    """OTLP export queue configuration.
+
+    Integrated into TracerConfig via the 'export' section of
+    .rf-tracer.json or listener kwargs.
+    """
+
+    def __init__(
+        self,
+        spill: bool = False,
+        spill_dir: str = "",
+        spill_max_mb: float = DEFAULT_SPILL_MAX_MB,
+        queue_high_water: int = DEFAULT_QUEUE_HIGH_WATER,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        timeout_sec: float = None,
+        retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        retry_backoff_max_sec: float = DEFAULT_RETRY_BACKOFF_MAX_SEC,
+        compression: str = None,
+    ):
+        # Unset values follow the SDK exporter environment, then the defaults
+        if timeout_sec is None:
+            timeout_sec = otlp_env("TIMEOUT", DEFAULT_TIMEOUT_SEC)
+        if compression is None:
+            compression = otlp_env("COMPRESSION", DEFAULT_COMPRESSION)
+        self.spill = bool(spill)
+        self.spill_dir = str(spill_dir or DEFAULT_SPILL_DIR)
+        self.spill_max_mb = max(1.0, float(spill_max_mb))
+        self.queue_high_water = max(1, int(queue_high_water))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.timeout_sec = max(0.1, float(timeout_sec))
+        self.retry_attempts = max(1, int(retry_attempts))
+        self.retry_backoff_max_sec = max(0.0, float(retry_backoff_max_sec))
+        compression = str(compression).lower()
+        self.compression = compression if compression in COMPRESSIONS else DEFAULT_COMPRESSION
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExportConfig":
+        """Create from a config dict (e.g. from .rf-tracer.json export section)."""
+        if not data or not isinstance(data, dict):
+            return cls()
+        return cls(
+            spill=data.get("spill", False),
+            spill_dir=data.get("spill_dir", ""),
+            spill_max_mb=data.get("spill_max_mb", DEFAULT_SPILL_MAX_MB),
+            queue_high_water=data.get("queue_high_water", DEFAULT_QUEUE_HIGH_WATER),
+            max_in_flight=data.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT),
+            timeout_sec=data.get("timeout_sec"),
+            retry_attempts=data.get("retry_attempts", DEFAULT_RETRY_ATTEMPTS),
+            retry_backoff_max_sec=data.get("retry_backoff_max_sec", DEFAULT_RETRY_BACKOFF_MAX_SEC),
+            compression=data.get("compression"),
+        )
+
+
+def otlp_env(name: str, default=None):
+    """Read an SDK OTLP exporter setting: OTEL_EXPORTER_OTLP_TRACES_<name>, then OTEL_EXPORTER_OTLP_<name>."""
+    return (
+        os.environ.get(f"OTEL_EXPORTER_OTLP_TRACES_{name}")
+        or os.environ.get(f"OTEL_EXPORTER_OTLP_{name}")
+        or default
+    )
+
+
+def parse_headers(value: str) -> dict:
+    """Parse OTEL_EXPORTER_OTLP_HEADERS style "k1=v1,k2=v2" into a dict."""
+    headers = {}
+    for part in (value or "").split(","):
+        key, sep, val = part.partition("=")
+        if sep and key.strip():
+            headers[unquote(key.strip()).lower()] = unquote(val.strip())
+    return headers
+
+
+def endpoint_key(endpoint: str) -> str:
+    """Filesystem-safe, stable directory name for an endpoint's spill store."""
+    safe = re.sub(r"[^\w]+", "_", endpoint).strip("_")[:48]
+    digest = hashlib.sha1(endpoint.encode("utf-8")).hexdigest()[:8]
+    return f"{safe}_{digest}"
+
+
+class HttpSender:
+    """POST encoded OTLP requests to an OTLP/HTTP endpoint over a keep-alive session.
+
+    The session's connection pool holds ``pool_size`` connections, one per
+    concurrent request of the owning EndpointQueue.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+        headers=None,
+        pool_size: int = DEFAULT_MAX_IN_FLIGHT,
+    ):
+        self.endpoint = endpoint
+        self.timeout_sec = timeout_sec
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(parse_headers(otlp_env("HEADERS", "")))
+        self._session.headers.update(headers or {})
+        certificate = otlp_env("CERTIFICATE")
+        if certificate:
+            self._session.verify = certificate
+        client_certificate = otlp_env("CLIENT_CERTIFICATE")
+        if client_certificate:
+            client_key = otlp_env("CLIENT_KEY")
+            self._session.cert = (
+                (client_certificate, client_key) if client_key else client_certificate
+            )
+        self._session.headers["Content-Type"] = "application/x-protobuf"
+
+    def send(self, payload: bytes):
+        """Send one payload. Returns (ok, retryable)."""
+        encoding, body = payload[:1], payload[1:]
+        headers = {"Content-Encoding": "gzip"} if encoding == _GZIP else None
+        try:
+            response = self._session.post(
+                self.endpoint, data=body, headers=headers, timeout=self.timeout_sec
+            )
+        except requests.RequestException:
+            return False, True
+        if response.ok:
+            return True, False
+        return False, response.status_code in _RETRYABLE_STATUS
+
+    def close(self):
+        self._session.close()
+
+
+class GrpcSender:
+    """Send encoded OTLP trace requests over one gRPC channel, without re-encoding.
+
+    Concurrent requests are multiplexed over the channel's HTTP/2 connection.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+        compression: str = DEFAULT_COMPRESSION,
+    ):
+        self.endpoint = endpoint
+        self.timeout_sec = timeout_sec
+        self.compression = (
+            grpc.Compression.Gzip if compression == "gzip" else grpc.Compression.NoCompression
+        )
+        parsed = urlparse(endpoint if "://" in endpoint else f"http://{endpoint}")
+        target = parsed.netloc or endpoint
+        certificate = otlp_env("CERTIFICATE")
+        insecure = str(otlp_env("INSECURE", "")).lower() == "true"
+        # Like the SDK: https is secure, a bare host:port is secure given a certificate
+        if parsed.scheme == "https" or ("://" not in endpoint and certificate and not insecure):
+            self._channel = grpc.secure_channel(target, _grpc_credentials(certificate))
+        else:
+            self._channel = grpc.insecure_channel(target)
+        # No serializers: the request is already protobuf-encoded bytes
+        self._export = self._channel.unary_unary(_GRPC_TRACE_METHOD)
+        self._metadata = tuple(parse_headers(otlp_env("HEADERS", "")).items())
+
+    def send(self, payload: bytes):
+        """Send one payload. Returns (ok, retryable)."""
+        encoding, body = payload[:1], payload[1:]
+        if encoding == _GZIP:
+            try:
+                body = gzip.decompress(body)
+            except Exception:
+                return False, False  # Corrupt payload: retrying cannot help
+        try:
+            self._export(
+                body,
+                timeout=self.timeout_sec,
+                metadata=self._metadata or None,
+                compression=self.compression,
+            )
+        except grpc.RpcError as e:
+            code = e.code() if hasattr(e, "code") else None
+            return False, code in (
+                grpc.StatusCode.UNAVAILABLE,
+                grpc.StatusCode.DEADLINE_EXCEEDED,
+                grpc.StatusCode.RESOURCE_EXHAUSTED,
+                grpc.StatusCode.ABORTED,
+            )
+        return True, False
+
+    def close(self):
+        self._channel.close()
+
+
+def _read_file(path):
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _grpc_credentials(certificate):
+    return grpc.ssl_channel_credentials(
+        root_certificates=_read_file(certificate),
+        private_key=_read_file(otlp_env("CLIENT_KEY")),
+        certificate_chain=_read_file(otlp_env("CLIENT_CERTIFICATE")),
+    )
+
+
+def create_sender(
+    endpoint: str,
+    protocol: str,
+    timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+    pool_size: int = DEFAULT_MAX_IN_FLIGHT,
+    compression: str = DEFAULT_COMPRESSION,
+):
+    """Create the sender for an endpoint; gRPC falls back to HTTP when unavailable."""
+    if protocol == "grpc" and GRPC_AVAILABLE:
+        return GrpcSender(endpoint, timeout_sec, compression)
+    return HttpSender(endpoint, timeout_sec, pool_size=pool_size)
+
+
+class EndpointQueue:
+    """Deliver encoded requests to one endpoint with retries and optional spilling.
+
+    ``max_in_flight`` worker threads send concurrently over the sender's
+    shared connection pool. A request that fails with a retryable error goes
+    back to the end of the queue with a not-before time instead of holding
+    its worker through the backoff, so retries never stall the pipeline and
+    requests may be delivered out of order (OTLP does not require ordering).
+    """
+
+    def __init__(self, sender, config: ExportConfig, store: SpillStore = None):
+        self.sender = sender
+        self.config = config
+        self.store = store
+        self.stats = {
+            "sent": 0,
+            "spans_sent": 0,  # Spans in sent requests, when submit() was told the count
+            "failed": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "retried": 0,
+            "max_in_flight": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+        }
+        # Entries: [payload, attempt, not_before (monotonic seconds)]
+        self._queue = deque()
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._stop_event = threading.Event()
+        self._replay_wakeup = threading.Event()
+        # Whether the last send succeeded; the open spill segment is only
+        # sealed for replay while the endpoint is reachable
+        self._endpoint_ok = False
+        self._workers = [
+            threading.Thread(target=self._run, name=f"rf-tracer-export-{i}", daemon=True)
+            for i in range(config.max_in_flight)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._replayer = None
+        if store is not None:
+            self._replayer = threading.Thread(
+                target=self._replay, name="rf-tracer-replay", daemon=True
+            )
+            self._replayer.start()
+
+    @property
+    def in_flight(self) -> int:
+        """Requests currently being sent."""
+        return self._busy
+
+    def submit(self, payload: bytes, spans: int = 0):
+        """Queue one encoded request (of ``spans`` spans, if known) for delivery."""
+        with self._cond:
+            if len(self._queue) >= self.config.queue_high_water:
+                if self.store is None:
+                    # Back-pressure into the batch processor, bounded by the timeout
+                    self._cond.wait_for(
+                        lambda: len(self._queue) < self.config.queue_high_water or self._stopped,
+                        timeout=self.config.timeout_sec,
+                    )
+                    if len(self._queue) >= self.config.queue_high_water or self._stopped:
+                        self.stats["dropped"] += 1
+                        return
+                else:
+                    self._spill(payload)
+                    return
+            self._queue.append([payload, 0, 0.0, spans])
+            self._cond.notify_all()
+
+    def _spill(self, payload: bytes):
+        if self.store is None:
+            self.stats["dropped"] += 1
+            return
+        try:
+            self.store.append(payload)
+            self.stats["spilled"] += 1
+        except OSError:
+            self.stats["dropped"] += 1
+
+    def _send(self, payload: bytes):
+        """Send once, recording the request latency. Returns (ok, retryable)."""
+        start = time.monotonic()
+        try:
+            return self.sender.send(payload)
+        finally:
+            latency_ms = (time.monotonic() - start) * 1000.0
+            with self._cond:
+                self.stats["latency_ms_total"] += latency_ms
+                if latency_ms > self.stats["latency_ms_max"]:
+                    self.stats["latency_ms_max"] = latency_ms
+
+    def _next_backoff(self, delay: float) -> float:
+        return min(delay * 2, max(self.config.retry_backoff_max_sec, _RETRY_BACKOFF_START_SEC))
+
+    def _take(self):
+        """Pop the first entry that is due, waiting for one. Call with the lock held."""
+        while True:
+            if self._stopped and not self._queue:
+                return None
+            now = time.monotonic()
+            for entry in self._queue:
+                if entry[2] <= now:
+                    self._queue.remove(entry)
+                    return entry
+            if self._stopped:
+                return None  # Only backing-off retries left; shutdown spills them
+            wait = min(entry[2] for entry in self._queue) - now if self._queue else None
+            self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                entry = self._take()
+                if entry is None:
+                    return
+                self._busy += 1
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._busy)
+                self._cond.notify_all()
+            payload, attempt, _, spans = entry
+            try:
+                ok, retryable = self._send(payload)
+            except Exception:
+                ok, retryable = False, False
+            failed = False
+            if ok and not self._endpoint_ok and self.store is not None:
+                self._replay_wakeup.set()  # Recovered: replay what was spilled meanwhile
+            self._endpoint_ok = ok
+            with self._cond:
+                if ok:
+                    self.stats["sent"] += 1
+                    self.stats["spans_sent"] += spans
+                elif retryable and attempt + 1 < self.config.retry_attempts and not self._stopped:
+                    delay = _RETRY_BACKOFF_START_SEC
+                    for _ in range(attempt):
+                        delay = self._next_backoff(delay)
+                    self._queue.append([payload, attempt + 1, time.monotonic() + delay, spans])
+                    self.stats["retried"] += 1
+                else:
+                    self.stats["failed"] += 1
+                    failed = True
+            if failed:
+                self._spill(payload)
+            # Still counted as busy until spilled, so flush() covers the spill
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify_all()
+
+    def _replay(self):
+        backoff = _RETRY_BACKOFF_START_SEC
+        while not self._stopped:
+            claimed = None
+            try:
+                claimed = self.store.claim(seal_open=self._endpoint_ok)
+            except OSError:
+                pass
+            if claimed is None:
+                self._replay_wakeup.wait(_REPLAY_IDLE_SEC)
+                self._replay_wakeup.clear()
+                continue
+            path, records = claimed
+            sent = 0
+            try:
+                for payload in records:
+                    if self._stopped:
+                        break
+                    try:
+                        ok, retryable = self._send(payload)
+                    except Exception:
+                        ok, retryable = False, False
+                    if ok or retryable:
+                        self._endpoint_ok = ok
+                    if not ok and retryable:
+                        break
+                    sent += 1  # Non-retryable payloads are dropped, not replayed forever
+                    if ok:
+                        self.stats["replayed"] += 1
+            finally:
+                # Never leave the segment claimed: what was not sent goes back
+                try:
+                    self.store.restore(path, records[sent:])
+                except OSError:
+                    pass
+            if sent < len(records):
+                # Endpoint still down: back off before touching the spill again
+                self._stop_event.wait(backoff)
+                backoff = self._next_backoff(backoff)
+            else:
+                backoff = _RETRY_BACKOFF_START_SEC
+
+    def pending(self) -> int:
+        """Requests queued in memory or being sent."""
+        with self._cond:
+            return len(self._queue) + self._busy
+
+    def summary(self) -> str:
+        """One-line delivery report for this endpoint."""
+        stats = self.stats
+        requests_made = stats["sent"] + stats["failed"] + stats["retried"] + stats["replayed"]
+        avg_ms = stats["latency_ms_total"] / requests_made if requests_made else 0.0
+        return (
+            f"{getattr(self.sender, 'endpoint', '?')}: sent {stats['sent']}, "
+            f"replayed {stats['replayed']}, retried {stats['retried']}, "
+            f"failed {stats['failed']}, spilled {stats['spilled']}, "
+            f"dropped {stats['dropped']}; in-flight max {stats['max_in_flight']}"
+            f"/{self.config.max_in_flight}, latency avg {avg_ms:.0f} ms, "
+            f"max {stats['latency_ms_max']:.0f} ms"
+        )
+
+    def flush(self, timeout_sec: float = None) -> bool:
+        """Wait until all queued requests were sent, spilled or dropped."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._queue and not self._busy, timeout=timeout_sec
+            )
+
+    def shutdown(self, timeout_sec: float = None):
+        """Flush within ``timeout_sec``, then spill whatever is left and stop."""
+        if timeout_sec is None:
+            timeout_sec = self.config.timeout_sec
+        self.flush(timeout_sec)
+        with self._cond:
+            self._stopped = True
+            leftovers = [entry[0] for entry in self._queue]
+            self._queue.clear()
+            self._cond.notify_all()
+        self._stop_event.set()
+        for payload in leftovers:
+            self._spill(payload)
+        self._replay_wakeup.set()
+        for worker in self._workers:
+            worker.join(timeout=1.0)
+        if self._replayer is not None:
+            self._replayer.join(timeout=1.0)
+        if self.store is not None:
+            self.store.close()
+        try:
+            self.sender.close()
+        except Exception:
+            pass
+
+
+class FanoutSpanExporter(SpanExporter):
+    """Encode span batches once and queue the same bytes for every endpoint.
+
+    Each batch is protobuf-serialized once and gzip-compressed at most once;
+    every EndpointQueue then delivers it from its own thread, so endpoints
+    are sent to concurrently, each with its own retries and timeout. A slow
+    endpoint only delays the others once its queue is full.
+    """
+
+    def __init__(self, queues, compression: str = DEFAULT_COMPRESSION):
+        self.queues = list(queues)
+        self.compression = compression
+
+    def _payloads(self, body: bytes):
+        """Return (raw_payload, gzip_payload or None) for one encoded request."""
+        gzipped = None
+        if self.compression == "gzip" and any(
+            isinstance(q.sender, HttpSender) for q in self.queues
+        ):
+            # gRPC senders apply gRPC message compression themselves
+            gzipped = _GZIP + gzip.compress(body, compresslevel=6)
+        return _RAW + body, gzipped
+
+    def submit(self, body: bytes, spans: int = 0):
+        """Queue an already encoded ExportTraceServiceRequest for every endpoint."""
+        raw, gzipped = self._payloads(body)
+        for queue in self.queues:
+            use_gzip = gzipped is not None and isinstance(queue.sender, HttpSender)
+            queue.submit(gzipped if use_gzip else raw, spans)
+
+    @property
+    def delivered_spans(self) -> int:
+        """Spans of this exporter that reached every endpoint so far."""
+        return min((queue.stats["spans_sent"] for queue in self.queues), default=0)
+
+    def spill(self, spans) -> bool:
+        """Write spans straight to the spill stores, for replay by the next run.
+
+        Returns False when no endpoint has a spill store.
+        """
+        stores = [queue.store for queue in self.queues if queue.store is not None]
+        if not stores:
+            return False
+        payload = _RAW + encode_spans(spans).SerializeToString()
+        for store in stores:
+            store.append(payload)
+        return True
+
+    def export(self, spans):
+        try:
+            body = encode_spans(spans).SerializeToString()
+        except Exception:
+            return SpanExportResult.FAILURE
+        self.submit(body, len(spans))
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        deadline = time.monotonic() + timeout_millis / 1000.0
+        flushed = True
+        for queue in self.queues:
+            remaining = max(0.0, deadline - time.monotonic())
+            flushed = queue.flush(remaining) and flushed
+        return flushed
+
+    def shutdown(self):
+        threads = [threading.Thread(target=queue.shutdown) for queue in self.queues]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+class OtlpSpanExporter(FanoutSpanExporter):
+    """Encode span batches once and queue them for delivery by one EndpointQueue."""
+
+    def __init__(self, queue: EndpointQueue, compression: str = DEFAULT_COMPRESSION):
+        super().__init__([queue], compression)
+        self.queue = queue
+
+
+def _create_queue(endpoint: str, protocol: str, config: ExportConfig) -> EndpointQueue:
+    store = None
+    if config.spill:
+        store = SpillStore(
+            os.path.join(config.spill_dir, endpoint_key(endpoint)),
+            max_bytes=int(config.spill_max_mb * 1024 * 1024),
+        )
+    sender = create_sender(
+        endpoint, protocol, config.timeout_sec, config.max_in_flight, config.compression
+    )
+    return EndpointQueue(sender, config, store)
+
+
+def create_span_exporter(endpoint: str, protocol: str, config: ExportConfig) -> OtlpSpanExporter:
+    """Create a queued span exporter for one endpoint, spilling under ``config.spill_dir``."""
+    return OtlpSpanExporter(_create_queue(endpoint, protocol, config), config.compression)
+
+
+def create_fanout_exporter(endpoints, protocol: str, config: ExportConfig) -> FanoutSpanExporter:
+    """Create one exporter that delivers every batch to all ``endpoints``."""
+    queues = [_create_queue(endpoint, protocol, config) for endpoint in endpoints]
+    return FanoutSpanExporter(queues, config.compression)
@@ -0,0 +1,19 @@
+"""File helpers shared by the trace file tools."""
+
+import contextlib
+import os
+
+
+@contextlib.contextmanager
+def atomic_path(dst):
+    """Yield a temporary path that replaces ``dst`` when the block succeeds.
+
+    The temporary file (``<dst>.<pid>.tmp``) is removed if the block fails.
+    """
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, dst)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,385 @@
+"""Random-access index for trace output files.
+
+A ``.json.gz`` trace file is a sequence of gzip members (RFC 1952). The
+listener writes every worker's spans as members of bounded size and records
+one entry per member in a sidecar file ``<trace file>.idx.json``:
+
+    {"version": 1, "size": <trace file size>, "summary": {...},
+     "members": [{"offset": 0, "length": 5123, "spans": 812, "tests": 3,
+                  "failed_tests": 0, "start": <ns>, "end": <ns>,
+                  "trace_ids": [...], "test_ids": [...]}, ...]}
+
+``offset``/``length`` locate the member's compressed bytes, so a reader can
+seek to it and decompress only that member. ``test_ids`` lists every test
+that has spans in the member, including keyword spans exported before the
+test span itself. The ``summary`` aggregates all members (span and test
+counts, time range, trace ids), so tools can skip whole files by reading
+only the sidecar.
+
+Tests are identified by ``rf.test.id`` or, when an output filter dropped
+it, by ``rf.test.name``. An index whose recorded size does not match the
+trace file is stale and ignored; ``build_index`` (``rf-tracer index``)
+creates one after the fact from the members already in a file. Plain
+``.json`` files can be indexed too, using blocks of lines instead of
+members.
+"""
+
+import gzip
+import json
+import os
+import zlib
+
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 1
+DEFAULT_MEMBER_BYTES = 1024 * 1024
+_READ_CHUNK = 1024 * 1024
+_GZIP_LEVEL = 6
+
+_LINE = "line"
+_MEMBER_END = "member_end"
+
+
+def index_path(path):
+    """Return the sidecar index path for a trace file."""
+    return path + INDEX_SUFFIX
+
+
+def _attributes(span):
+    values = {}
+    for attr in span.get("attributes", ()):
+        value = attr.get("value", {})
+        if value:
+            values[attr.get("key")] = next(iter(value.values()))
+    return values
+
+
+class IndexBuilder:
+    """Collect per-member statistics from the lines of a trace file.
+
+    Lines are added in file order with ``add_line``; ``end`` closes the
+    current member at a file offset. Spans are exported when they end, so a
+    test span follows its keyword spans; finished subtrees are tracked per
+    parent span id until their test span arrives, which then records the
+    test id in every member holding part of it.
+    """
+
+    def __init__(self, members=None):
+        self.members = list(members or [])
+        self._current = None
+        self._subtrees = {}
+
+    def add_line(self, line, offset):
+        """Add one JSON line; ``offset`` is where the current member starts."""
+        if not line.strip():
+            return
+        if self._current is None:
+            self._current = {
+                "offset": offset,
+                "length": 0,
+                "spans": 0,
+                "tests": 0,
+                "failed_tests": 0,
+                "start": 0,
+                "end": 0,
+                "trace_ids": set(),
+                "test_ids": set(),
+            }
+            self.members.append(self._current)
+        number = len(self.members) - 1
+        for rs in json.loads(line).get("resource_spans", ()):
+            for ss in rs.get("scope_spans", ()):
+                for span in ss.get("spans", ()):
+                    self._add_span(span, number)
+
+    def _add_span(self, span, number):
+        entry = self._current
+        entry["spans"] += 1
+        start = int(span.get("start_time_unix_nano", 0) or 0)
+        end = int(span.get("end_time_unix_nano", 0) or 0)
+        if start and (not entry["start"] or start < entry["start"]):
+            entry["start"] = start
+        entry["end"] = max(entry["end"], end)
+        if span.get("trace_id"):
+            entry["trace_ids"].add(span["trace_id"])
+
+        members = self._subtrees.pop(span.get("span_id"), set())
+        members.add(number)
+        attrs = _attributes(span)
+        if attrs.get("rf.type") == "TEST" or "rf.test.name" in attrs:
+            test_id = attrs.get("rf.test.id") or attrs.get("rf.test.name", "")
+            for member in members:
+                self.members[member]["test_ids"].add(test_id)
+            entry["tests"] += 1
+            status = span.get("status", {}).get("code", "")
+            if attrs.get("rf.status") == "FAIL" or status in ("STATUS_CODE_ERROR", 2):
+                entry["failed_tests"] += 1
+        elif span.get("parent_span_id"):
+            self._subtrees.setdefault(span["parent_span_id"], set()).update(members)
+
+    def end(self, end_offset):
+        """Close the current member (if any) at ``end_offset``."""
+        if self._current is not None:
+            self._current["length"] = end_offset - self._current["offset"]
+            self._current = None
+
+    def index(self, size):
+        """Return the index document for a trace file of ``size`` bytes."""
+        members = [
+            dict(
+                m,
+                trace_ids=sorted(m["trace_ids"]),
+                test_ids=sorted(m["test_ids"]),
+            )
+            for m in self.members
+        ]
+        starts = [m["start"] for m in members if m["start"]]
+        trace_ids = set()
+        for m in members:
+            trace_ids.update(m["trace_ids"])
+        summary = {
+            "members": len(members),
+            "spans": sum(m["spans"] for m in members),
+            "tests": sum(m["tests"] for m in members),
+            "failed_tests": sum(m["failed_tests"] for m in members),
+            "start": min(starts) if starts else 0,
+            "end": max((m["end"] for m in members), default=0),
+            "trace_ids": sorted(trace_ids),
+        }
+        return {"version": INDEX_VERSION, "size": size, "summary": summary, "members": members}
+
+
+def _gzip_events(f, offset=0, length=None):
+    """Decompress gzip members from ``f``, yielding lines and member boundaries.
+
+    Yields ``(_LINE, bytes)`` for every line and ``(_MEMBER_END, (pos,
+    clean))`` after every member, where ``pos`` is the file offset just
+    past the member and ``clean`` tells whether it ended on a line boundary.
+    """
+    f.seek(offset)
+    remaining = length
+    pos = offset
+    decomp = None
+    partial = b""
+    while remaining is None or remaining > 0:
+        data = f.read(_READ_CHUNK if remaining is None else min(_READ_CHUNK, remaining))
+        if not data:
+            break
+        if remaining is not None:
+            remaining -= len(data)
+        while data:
+            fresh = decomp is None
+            if fresh:
+                decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                out = decomp.decompress(data)
+            except zlib.error as e:
+                if fresh and not data.strip(b"\0"):
+                    return  # Trailing NUL padding, as tolerated by gzip
+                raise ValueError(f"Corrupt gzip data after offset {pos}: {e}") from e
+            if b"\n" in out:
+                lines = (partial + out).split(b"\n")
+                partial = lines.pop()
+                for line in lines:
+                    yield _LINE, line
+            else:
+                partial += out
+            if decomp.eof:
+                used = len(data) - len(decomp.unused_data)
+                pos += used
+                data = decomp.unused_data
+                decomp = None
+                yield _MEMBER_END, (pos, not partial)
+            else:
+                pos += len(data)
+                data = b""
+    if partial:
+        yield _LINE, partial
+
+
+def _scan(path, builder, member_bytes):
+    with open(path, "rb") as f:
+        if path.endswith(".gz"):
+            block_start = 0
+            for kind, value in _gzip_events(f):
+                if kind == _LINE:
+                    builder.add_line(value, block_start)
+                else:
+                    pos, clean = value
+                    if clean:  # A line split across members stays in one entry
+                        builder.end(pos)
+                        block_start = pos
+        else:
+            pos = block_start = 0
+            for line in f:
+                builder.add_line(line, block_start)
+                pos += len(line)
+                if pos - block_start >= member_bytes:
+                    builder.end(pos)
+                    block_start = pos
+        builder.end(f.seek(0, os.SEEK_END))
+
+
+def write_index(path, index):
+    """Write the sidecar index for ``path`` atomically."""
+    dst = index_path(path)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp, dst)
+
+
+def build_index(path, write=True, member_bytes=DEFAULT_MEMBER_BYTES):
+    """Index an existing trace file and (by default) write its sidecar.
+
+    Gzip files are indexed by their existing members; a file written as a
+    single member gets a single entry. Plain JSON files are indexed in
+    blocks of about ``member_bytes`` bytes.
+    """
+    builder = IndexBuilder()
+    _scan(path, builder, member_bytes)
+    index = builder.index(os.path.getsize(path))
+    if write:
+        write_index(path, index)
+    return index
+
+
+def load_index(path):
+    """Return the sidecar index of ``path``, or None if missing or stale."""
+    try:
+        with open(index_path(path), encoding="utf-8") as f:
+            index = json.load(f)
+        size = os.path.getsize(path)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return None
+    if index.get("size") != size:
+        return None
+    return index
+
+
+def append_indexed(src_path, dst_path, member_bytes=DEFAULT_MEMBER_BYTES):
+    """Append a plain JSON lines file to a gzip trace file and update its index.
+
+    ``src_path`` is compressed into members of about ``member_bytes``
+    uncompressed bytes, cut at line boundaries. The caller must hold the
+    lock serializing appends to ``dst_path``. If ``dst_path`` already has
+    data but no valid index, it is appended without one (the stale sidecar
+    is removed; ``build_index`` can recreate it).
+    """
+    offset = os.path.getsize(dst_path) if os.path.exists(dst_path) else 0
+    index = load_index(dst_path) if offset else None
+    indexed = not offset or index is not None
+    builder = IndexBuilder(index["members"] if index else None)
+
+    with open(src_path, "rb") as f_in, open(dst_path, "ab") as f_out:
+        lines = []
+        size = 0
+        for line in _terminated_lines(f_in):
+            lines.append(line)
+            size += len(line)
+            if size >= member_bytes:
+                offset = _write_member(f_out, lines, offset, builder if indexed else None)
+                lines, size = [], 0
+        if lines:
+            offset = _write_member(f_out, lines, offset, builder if indexed else None)
+
+    if indexed:
+        write_index(dst_path, builder.index(offset))
+    elif os.path.exists(index_path(dst_path)):
+        os.remove(index_path(dst_path))
+
+
+def _terminated_lines(f):
+    for line in f:
+        if not line.endswith(b"\n"):
+            line += b"\n"  # Keep every member on a line boundary
+        yield line
+
+
+def _write_member(f_out, lines, offset, builder):
+    data = gzip.compress(b"".join(lines), compresslevel=_GZIP_LEVEL)
+    f_out.write(data)
+    if builder is not None:
+        for line in lines:
+            builder.add_line(line, offset)
+        builder.end(offset + len(data))
+    return offset + len(data)
+
+
+def select_members(index, trace_id=None, test_id=None, start_ns=None, end_ns=None):
+    """Return the index entries that may hold matching spans.
+
+    ``start_ns``/``end_ns`` select members whose spans overlap that range.
+    """
+    selected = []
+    for member in index["members"]:
+        if trace_id is not None and trace_id not in member["trace_ids"]:
+            continue
+        if test_id is not None and test_id not in member["test_ids"]:
+            continue
+        if start_ns is not None and member["end"] and member["end"] < start_ns:
+            continue
+        if end_ns is not None and member["start"] and member["start"] > end_ns:
+            continue
+        selected.append(member)
+    return selected
+
+
+def read_member_lines(path, members):
+    """Yield the JSON lines of the given index entries, decompressing only those."""
+    gz = path.endswith(".gz")
+    with open(path, "rb") as f:
+        for member in members:
+            if gz:
+                for kind, value in _gzip_events(f, member["offset"], member["length"]):
+                    if kind == _LINE and value.strip():
+                        yield value
+            else:
+                f.seek(member["offset"])
+                for line in f.read(member["length"]).splitlines():
+                    if line.strip():
+                        yield line
+
+
+def iter_lines(path, trace_id=None, test_id=None, start_ns=None, end_ns=None):
+    """Yield JSON lines of ``path`` that may hold matching spans.
+
+    Uses the sidecar index to read only the relevant members; without a
+    valid index every line of the file is yielded.
+    """
+    index = load_index(path)
+    if index is not None:
+        members = select_members(index, trace_id, test_id, start_ns, end_ns)
+        yield from read_member_lines(path, members)
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def read_test_spans(path, test_id):
+    """Return the spans (dicts) of one test: the test span and all its descendants."""
+    spans = []
+    for line in iter_lines(path, test_id=test_id):
+        for rs in json.loads(line).get("resource_spans", ()):
+            for ss in rs.get("scope_spans", ()):
+                spans.extend(ss.get("spans", ()))
+    roots = set()
+    for span in spans:
+        attrs = _attributes(span)
+        if test_id in (attrs.get("rf.test.id"), attrs.get("rf.test.name")):
+            roots.add(span.get("span_id"))
+    children = {}
+    for span in spans:
+        children.setdefault(span.get("parent_span_id"), []).append(span)
+    result = []
+    stack = [span for span in spans if span.get("span_id") in roots]
+    while stack:
+        span = stack.pop()
+        result.append(span)
+        stack.extend(children.get(span.get("span_id"), ()))
+    result.sort(key=lambda s: int(s.get("start_time_unix_nano", 0) or 0))
+    return result
@@ -1,10 +1,13 @@
 import base64
+import collections
 import gzip
 import json
 import os
 import platform
 import re
 import sys
+import threading
+import time
 
 # Platform-specific file locking (Unix only, Windows skips locking)
 if sys.platform != "win32":
@@ -29,6 +32,7 @@ import robot
 from google.protobuf.json_format import MessageToDict
 from opentelemetry import trace
 from opentelemetry.context import attach, detach
+from opentelemetry.exporter.otlp.proto.common._log_encoder import encode_logs
 from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
 from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter as HTTPExporter
@@ -36,14 +40,29 @@ from opentelemetry.propagate import extract, inject
 from opentelemetry.sdk._logs import LoggerProvider
 from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
 from opentelemetry.sdk.resources import SERVICE_NAME, Resource
-from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace import SpanProcessor, SynchronousMultiSpanProcessor, TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
 from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.semconv.resource import ResourceAttributes
 
 from .config import TracerConfig
+from .exporters import FanoutSpanExporter, create_fanout_exporter, create_span_exporter
+from .index import append_indexed
+from .log_capture import LogAggregator, LogRateLimiter
 from .output_filter import apply_filter, load_filter
-from .screenshot import process_log_message
+from .relay import (
+    DEFAULT_IDLE_TIMEOUT_SEC,
+    RELAY_AVAILABLE,
+    RelaySpanExporter,
+    default_socket_path,
+)
+from .screenshot import (
+    PIL_AVAILABLE,
+    FailureScreenshots,
+    ScreenshotCache,
+    ScreenshotWorker,
+    process_log_message,
+)
 from .span_builder import SpanBuilder
 from .version import __version__
 
@@ -55,8 +74,17 @@ try:
 except ImportError:
     BUILTIN_AVAILABLE = False
 
+try:
+    from opentelemetry.sdk._logs.export import LogRecordExporter, LogRecordExportResult
+except ImportError:  # older opentelemetry-sdk
+    from opentelemetry.sdk._logs.export import LogExporter as LogRecordExporter
+    from opentelemetry.sdk._logs.export import LogExportResult as LogRecordExportResult
+
 # Try to import gRPC exporters (optional dependency)
 try:
+    from opentelemetry.exporter.otlp.proto.grpc._log_exporter import (
+        OTLPLogExporter as GRPCLogExporter,
+    )
     from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
         OTLPSpanExporter as GRPCExporter,
     )
@@ -66,6 +94,37 @@ except ImportError:
     GRPC_AVAILABLE = False
 
 
+class _SharedSpanPipeline(SpanProcessor):
+    """Span processors shared by the listener's tracer providers.
+
+    With service_name=auto every top-level suite gets its own TracerProvider
+    (and so its own resource and service.name), while the batch processors
+    and exporters are created once and shared through this pipeline.
+    Shutting down several providers shuts the shared processors down once.
+    """
+
+    def __init__(self):
+        self._processors = SynchronousMultiSpanProcessor()
+        self._shutdown = False
+
+    def add_span_processor(self, processor):
+        self._processors.add_span_processor(processor)
+
+    def on_start(self, span, parent_context=None):
+        self._processors.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span):
+        self._processors.on_end(span)
+
+    def shutdown(self):
+        if not self._shutdown:
+            self._shutdown = True
+            self._processors.shutdown()
+
+    def force_flush(self, timeout_millis=30000):
+        return self._processors.force_flush(timeout_millis)
+
+
 class _OtlpJsonFileExporter(SpanExporter):
     """Write spans as OTLP-compatible JSON — one ExportTraceServiceRequest per batch."""
 
@@ -103,6 +162,187 @@ class _OtlpJsonFileExporter(SpanExporter):
         pass
 
 
+class _OtlpJsonLogFileExporter(LogRecordExporter):
+    """Write log records as OTLP-compatible JSON — one ExportLogsServiceRequest per batch.
+
+    Each process writes to its own file, so no locking is needed per batch;
+    the listener appends the file to the shared output file in close().
+    """
+
+    def __init__(self, out):
+        self._out = out
+
+    @staticmethod
+    def _fix_byte_ids(d):
+        """Convert base64-encoded trace/span IDs to hex strings."""
+        for rl in d.get("resource_logs", []):
+            for sl in rl.get("scope_logs", []):
+                for record in sl.get("log_records", []):
+                    for field in ("trace_id", "span_id"):
+                        if field in record and isinstance(record[field], str):
+                            record[field] = base64.b64decode(record[field]).hex()
+        return d
+
+    def export(self, batch):
+        pb = encode_logs(batch)
+        d = MessageToDict(pb, preserving_proto_field_name=True)
+        d = self._fix_byte_ids(d)
+        self._out.write(json.dumps(d, separators=(",", ":")) + "\n")
+        self._out.flush()
+        return LogRecordExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+    def shutdown(self):
+        pass
+
+
+def _append_locked(src_path, dst_path, compress=False, index=False):
+    """Append a process-local file to a shared output file.
+
+    A lock file serializes appends across pabot workers. With ``compress``
+    the data is written as a new gzip member; concatenated members form a
+    valid multi-member gzip file (RFC 1952). With ``index`` as well, the data
+    is split into bounded members recorded in the sidecar index (index.py).
+    """
+    if os.path.getsize(src_path):
+        lock_path = dst_path + ".lock"
+        lock_fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT)
+        try:
+            _lock_file(lock_fd)
+            if compress and index:
+                append_indexed(src_path, dst_path)
+            else:
+                with open(src_path, "rb") as f_in:
+                    data = f_in.read()
+                opener = gzip.open if compress else open
+                with opener(dst_path, "ab") as f_out:
+                    f_out.write(data)
+        finally:
+            _unlock_file(lock_fd)
+            os.close(lock_fd)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass  # Another process may still need it
+    os.remove(src_path)
+
+
+def _run_until(tasks, deadline):
+    """Run (name, callable) tasks in parallel daemon threads until ``deadline``.
+
+    Returns the names of the tasks that had not finished by then; their
+    threads keep running in the background but no longer delay the caller.
+    """
+    threads = []
+    for name, func in tasks:
+        thread = threading.Thread(target=func, name=f"rf-tracer-close-{name}", daemon=True)
+        thread.start()
+        threads.append((name, thread))
+    pending = []
+    for name, thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            pending.append(name)
+    return pending
+
+
+class _SpanLedger(SpanProcessor):
+    """Ended spans that one exporter has not taken yet, saved locally at shutdown.
+
+    Holds at most ``limit`` spans, dropping the oldest first like a full
+    batch queue does.
+    """
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self._spans = collections.OrderedDict()  # id(span) -> span
+        self._lock = threading.Lock()
+
+    def on_start(self, span, parent_context=None):
+        pass
+
+    def on_end(self, span):
+        with self._lock:
+            self._spans[id(span)] = span
+            if len(self._spans) > self.limit:
+                self._spans.popitem(last=False)
+
+    def discard(self, spans):
+        with self._lock:
+            for span in spans:
+                self._spans.pop(id(span), None)
+
+    def take(self):
+        """Remove and return the spans still waiting, oldest first."""
+        with self._lock:
+            spans = list(self._spans.values())
+            self._spans.clear()
+        return spans
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
+class _TallySpanExporter(SpanExporter):
+    """Wrap an exporter and count the spans it delivered.
+
+    Spans it accepted are cleared from its ``ledger``. A queued exporter
+    (FanoutSpanExporter) accepts spans when it queues them, so for those the
+    delivered count comes from the endpoint queues instead.
+    """
+
+    def __init__(self, exporter, ledger=None):
+        self.exporter = exporter
+        self.ledger = ledger
+        self._delivered = 0
+        self._lock = threading.Lock()
+
+    @property
+    def delivered(self):
+        if isinstance(self.exporter, FanoutSpanExporter):
+            return self.exporter.delivered_spans
+        return self._delivered
+
+    def export(self, spans):
+        result = self.exporter.export(spans)
+        if result == SpanExportResult.SUCCESS:
+            if self.ledger is not None:
+                self.ledger.discard(spans)
+            with self._lock:
+                self._delivered += len(spans)
+        return result
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis=30000):
+        return self.exporter.force_flush(timeout_millis)
+
+
+class _SpanCounter(SpanProcessor):
+    """Count ended spans for the shutdown summary."""
+
+    def __init__(self):
+        self.ended = 0
+
+    def on_start(self, span, parent_context=None):
+        pass
+
+    def on_end(self, span):
+        self.ended += 1
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
 class TracingListener:
     """Robot Framework Listener v3 for distributed tracing."""
 
@@ -136,10 +376,50 @@ class TracingListener:
         self.suite_span = None
         self._trace_file = None
         self._file_processor = None
+        self._file_exporter = None
+        self._span_counter = None
         self._gz_final_path = None
+        self._log_file = None
+        self._log_file_processor = None
+        self._log_final_path = None
         self._in_log_message = False  # Prevent recursion
         self._rf_output_dir = ""  # RF output directory for screenshot path resolution
+        if self.config.screenshots.recompress and not PIL_AVAILABLE:
+            print(
+                "Warning: screenshots.recompress requires Pillow. Install with: pip install robotframework-tracer[images]"
+            )
+        self._screenshot_cache = None
+        if self.config.screenshots.dedup:
+            self._screenshot_cache = ScreenshotCache(self.config.screenshots.dedup_cache_size)
+        # Blob mode stores images next to the trace file unless blob_dir is set
+        self._screenshot_blob_dir = self.config.screenshots.blob_dir
+        self._screenshot_worker = None
+        if (
+            self.config.screenshots.mode in ("embedded", "blob")
+            and self.config.screenshots.workers > 0
+        ):
+            self._screenshot_worker = ScreenshotWorker(
+                self.config.screenshots, self._screenshot_cache
+            )
+        self._failure_screenshots = None
+        if self.config.screenshots.mode == "on_failure":
+            self._failure_screenshots = FailureScreenshots(
+                self.config.screenshots, self._screenshot_cache
+            )
+        self._log_aggregator = None
+        if self.config.capture_logs and self.config.log_dedup:
+            self._log_aggregator = LogAggregator(self.config.log_dedup_max_distinct)
+        # log_destination=events: logs travel as span events, no LoggerProvider
+        self._log_events = self.config.capture_logs and self.config.log_destination == "events"
+        self._log_event_counts = {}  # span -> events added (dropped beyond the cap)
+        self._log_rate_limiter = None
+        if self.config.capture_logs and self.config.log_rate_limits:
+            self._log_rate_limiter = LogRateLimiter(
+                self.config.log_rate_limits, self.config.log_rate_burst
+            )
         self._auto_service = self.config.service_name == "auto"
+        self._providers = {}  # service name -> TracerProvider
+        self._span_pipeline = None
         self._suite_depth = 0
 
         # Defer provider init when service_name=auto (resolved in start_suite)
@@ -153,59 +433,62 @@ class TracingListener:
     def _init_providers(self, service_name):
         """Initialize OpenTelemetry tracer and logs providers.
 
-        When service_name=auto, this may be called multiple times (once per suite).
-        The exporter, processor, and logger provider are created once and reused.
-        Only the TracerProvider changes per suite (for the service name resource).
+        When service_name=auto, this is called once per top-level suite. The
+        exporters, processors and logger provider are created on the first
+        call only; every service gets its own TracerProvider (cached, so a
+        service seen again reuses it) that feeds the shared span pipeline,
+        without flushing or rebuilding anything.
         """
-        # Flush spans from previous suite before switching provider
-        if self._provider:
-            try:
-                self._provider.force_flush()
-            except Exception:
-                pass
-
-        resource_attrs = {
-            SERVICE_NAME: service_name,
-            ResourceAttributes.TELEMETRY_SDK_NAME: "robotframework-tracer",
-            ResourceAttributes.TELEMETRY_SDK_LANGUAGE: "python",
-            ResourceAttributes.TELEMETRY_SDK_VERSION: __version__,
-            "rf.version": robot.version.get_version(),
-            "python.version": f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
-            ResourceAttributes.HOST_NAME: platform.node(),
-            ResourceAttributes.OS_TYPE: platform.system(),
-            ResourceAttributes.OS_VERSION: platform.release(),
-        }
-        resource = Resource.create(resource_attrs)
-
-        # Configure sampling only if sample_rate < 1.0
-        if self.config.sample_rate < 1.0:
-            sampler = ParentBased(root=TraceIdRatioBased(self.config.sample_rate))
-            provider = TracerProvider(resource=resource, sampler=sampler)
-        else:
-            provider = TracerProvider(resource=resource)
-
-        # Create exporter and processor once, reuse across all suites.
-        # This avoids gRPC channel churn and thread leaks from creating
-        # new BatchSpanProcessors per suite.
-        if not hasattr(self, "_trace_processors"):
-            self._trace_processors = []
-            endpoints = self.config.endpoints if self.config.endpoints else [self.config.endpoint]
-            for ep in endpoints:
-                if self.config.protocol == "grpc":
-                    if not GRPC_AVAILABLE:
-                        print(
-                            "Warning: gRPC exporters not available. Install with: pip install robotframework-tracer[grpc]"
-                        )
-                        print("Falling back to HTTP exporters")
-                        exporter = HTTPExporter(endpoint=ep)
-                    else:
-                        exporter = GRPCExporter(endpoint=ep)
-                else:
-                    exporter = HTTPExporter(endpoint=ep)
-                self._trace_processors.append(BatchSpanProcessor(exporter))
-
-        for proc in self._trace_processors:
-            provider.add_span_processor(proc)
+        if self._span_pipeline is None:
+            # Host and runtime attributes are computed once per run
+            resource_attrs = {
+                SERVICE_NAME: service_name,
+                ResourceAttributes.TELEMETRY_SDK_NAME: "robotframework-tracer",
+                ResourceAttributes.TELEMETRY_SDK_LANGUAGE: "python",
+                ResourceAttributes.TELEMETRY_SDK_VERSION: __version__,
+                "rf.version": robot.version.get_version(),
+                "python.version": f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
+                ResourceAttributes.HOST_NAME: platform.node(),
+                ResourceAttributes.OS_TYPE: platform.system(),
+                ResourceAttributes.OS_VERSION: platform.release(),
+            }
+            self._base_resource = Resource.create(resource_attrs)
+
+            # Create exporters and processors once, shared by all providers.
+            # This avoids gRPC channel churn and thread leaks from creating
+            # new BatchSpanProcessors per suite.
+            # Ledgers hold what a batch queue holds: queue plus one export batch
+            # (SDK defaults when not configured)
+            ledger_limit = (self.config.batch_max_queue_size or 2048) + (
+                self.config.batch_max_export_size or 512
+            )
+            self._trace_exporters = [
+                _TallySpanExporter(exporter, _SpanLedger(ledger_limit))
+                for exporter in self._create_exporters("traces")
+            ]
+            self._trace_processors = [
+                BatchSpanProcessor(exporter, **self._batch_kwargs())
+                for exporter in self._trace_exporters
+            ]
+            self._span_counter = _SpanCounter()
+            self._span_pipeline = _SharedSpanPipeline()
+            self._span_pipeline.add_span_processor(self._span_counter)
+            for exporter, proc in zip(self._trace_exporters, self._trace_processors):
+                self._span_pipeline.add_span_processor(exporter.ledger)
+                self._span_pipeline.add_span_processor(proc)
+
+        provider = self._providers.get(service_name)
+        if provider is None:
+            resource = self._base_resource.merge(Resource({SERVICE_NAME: service_name}))
+            # No atexit hook per provider: close() shuts them all down
+            # against the shutdown deadline.
+            kwargs = {"resource": resource, "shutdown_on_exit": False}
+            # Configure sampling only if sample_rate < 1.0
+            if self.config.sample_rate < 1.0:
+                kwargs["sampler"] = ParentBased(root=TraceIdRatioBased(self.config.sample_rate))
+            provider = TracerProvider(**kwargs)
+            provider.add_span_processor(self._span_pipeline)
+            self._providers[service_name] = provider
         self._provider = provider
 
         # Only set global provider once; subsequent calls use instance provider directly
@@ -219,21 +502,126 @@ class TracingListener:
         # Reinitializing per suite adds flush/shutdown overhead that causes
         # gRPC trace exports to be dropped in rapid auto-mode cycling.
         # Logs are correlated via trace_id/span_id, not service.name.
-        if self.config.capture_logs and self.logger_provider is None:
-            http_base = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", self.config.endpoint)
-            logs_endpoint = http_base.replace("/v1/traces", "/v1/logs")
-            if logs_endpoint == http_base:
-                logs_endpoint = f"{http_base.rstrip('/')}/v1/logs"
-            log_exporter = OTLPLogExporter(endpoint=logs_endpoint)
-
-            self.logger_provider = LoggerProvider(resource=resource)
-            self.logger_provider.add_log_record_processor(BatchLogRecordProcessor(log_exporter))
+        if self.config.capture_logs and not self._log_events and self.logger_provider is None:
+            # Shut down in close() against the shutdown deadline, not at exit
+            self.logger_provider = LoggerProvider(
+                resource=self._base_resource, shutdown_on_exit=False
+            )
+            for log_exporter in self._create_exporters("logs"):
+                self.logger_provider.add_log_record_processor(
+                    BatchLogRecordProcessor(log_exporter, **self._batch_kwargs())
+                )
 
             from opentelemetry._logs import set_logger_provider
 
             set_logger_provider(self.logger_provider)
             self.logger = self.logger_provider.get_logger(__name__)
 
+            if self.config.log_output_file and self.config.log_output_file != "auto":
+                self._open_log_file(self.config.log_output_file)
+
+    def _batch_kwargs(self):
+        """Batch processor tuning shared by spans and logs; unset values keep SDK defaults."""
+        kwargs = {}
+        if self.config.batch_max_queue_size > 0:
+            kwargs["max_queue_size"] = self.config.batch_max_queue_size
+        if self.config.batch_max_export_size > 0:
+            kwargs["max_export_batch_size"] = self.config.batch_max_export_size
+        if self.config.batch_schedule_delay_ms > 0:
+            kwargs["schedule_delay_millis"] = self.config.batch_schedule_delay_ms
+        return kwargs
+
+    @staticmethod
+    def _logs_endpoint(endpoint):
+        """Derive the OTLP/HTTP logs URL from a traces URL."""
+        logs_endpoint = endpoint.replace("/v1/traces", "/v1/logs")
+        if logs_endpoint == endpoint:
+            logs_endpoint = f"{endpoint.rstrip('/')}/v1/logs"
+        return logs_endpoint
+
+    def _create_exporters(self, signal):
+        """Create one OTLP exporter per configured endpoint.
+
+        Traces and logs ("traces" / "logs" signal) use the same endpoint list
+        and protocol. gRPC exporters for the same endpoint share the
+        underlying connection through gRPC's global subchannel pool.
+
+        With several endpoints, traces get a single fan-out exporter instead,
+        so every span batch is queued and encoded once for all endpoints.
+        """
+        endpoints = self.config.endpoints if self.config.endpoints else [self.config.endpoint]
+        use_grpc = self.config.protocol == "grpc"
+        if use_grpc and not GRPC_AVAILABLE:
+            print(
+                "Warning: gRPC exporters not available. Install with: pip install robotframework-tracer[grpc]"
+            )
+            print("Falling back to HTTP exporters")
+            use_grpc = False
+
+        protocol = "grpc" if use_grpc else "http"
+        if signal == "traces" and self.config.relay:
+            if RELAY_AVAILABLE:
+                return [self._create_relay_exporter(endpoints, protocol)]
+            print("Warning: span relay requires Unix domain sockets; exporting directly")
+
+        if signal == "traces" and len(endpoints) > 1:
+            return [create_fanout_exporter(endpoints, protocol, self.config.export)]
+
+        exporters = []
+        for ep in endpoints:
+            if signal == "logs":
+                if use_grpc:
+                    exporters.append(GRPCLogExporter(endpoint=ep))
+                else:
+                    exporters.append(OTLPLogExporter(endpoint=self._logs_endpoint(ep)))
+            elif self.config.export.spill or self.config.export.max_in_flight > 1:
+                # Queued export: disk-backed spill and/or pipelined requests
+                exporters.append(create_span_exporter(ep, protocol, self.config.export))
+            elif use_grpc:
+                exporters.append(GRPCExporter(endpoint=ep))
+            else:
+                exporters.append(HTTPExporter(endpoint=ep))
+        return exporters
+
+    def _create_relay_exporter(self, endpoints, protocol):
+        """Hand span batches to the per-host relay, spawning it if needed."""
+        export = self.config.export
+        # The relay owns the exporters, so it gets the full export config
+        options = [
+            "--idle-timeout",
+            str(DEFAULT_IDLE_TIMEOUT_SEC),
+            "--max-in-flight",
+            str(export.max_in_flight),
+            "--queue-high-water",
+            str(export.queue_high_water),
+            "--timeout",
+            str(export.timeout_sec),
+            "--retry-attempts",
+            str(export.retry_attempts),
+            "--retry-backoff-max",
+            str(export.retry_backoff_max_sec),
+            "--compression",
+            export.compression,
+        ]
+        if export.spill:
+            options += [
+                "--spill",
+                "--spill-dir",
+                os.path.abspath(export.spill_dir),
+                "--spill-max-mb",
+                str(export.spill_max_mb),
+            ]
+        socket_path = self.config.relay_socket or default_socket_path(endpoints, protocol, options)
+        # Endpoints are part of the socket key already (sorted)
+        spawn_args = ["--protocol", protocol]
+        for ep in endpoints:
+            spawn_args += ["--endpoint", ep]
+        return RelaySpanExporter(
+            socket_path,
+            spawn_args=spawn_args + options,
+            fallback=lambda: create_fanout_exporter(endpoints, protocol, export),
+        )
+
     @staticmethod
     def _parse_listener_args(args):
         """Parse Robot Framework listener arguments.
@@ -319,15 +707,42 @@ class TracingListener:
                 self._trace_file = open(filepath, "a")
             output_filter = load_filter(self.config.trace_output_filter)
             file_exporter = _OtlpJsonFileExporter(out=self._trace_file, output_filter=output_filter)
-            self._file_processor = BatchSpanProcessor(file_exporter)
-            self._provider.add_span_processor(self._file_processor)
+            self._file_exporter = _TallySpanExporter(file_exporter)
+            self._file_processor = BatchSpanProcessor(self._file_exporter)
+            self._span_pipeline.add_span_processor(self._file_processor)
             print(f"Trace output file: {filepath}")
+            if self.config.screenshots.mode == "blob" and not self._screenshot_blob_dir:
+                self._screenshot_blob_dir = f"{filepath}.blobs"
             if output_filter:
                 print(f"Trace output filter: {self.config.trace_output_filter}")
         except Exception as e:
             print(f"Warning: Failed to open trace output file '{filepath}': {e}")
             self._trace_file = None
 
+    def _open_log_file(self, filepath):
+        """Open a log output file and attach a JSON log exporter to the logger provider.
+
+        Each process writes its records to its own temporary file without
+        locking; close() appends it to the final file (as a gzip member for
+        gz format).
+        """
+        try:
+            if self.config.log_output_format == "gz" and not filepath.endswith(".gz"):
+                filepath = filepath + ".gz"
+            self._log_final_path = filepath
+            self._cleanup_stale_tmp_files(filepath)
+            base = filepath[: -len(".gz")] if filepath.endswith(".gz") else filepath
+            self._log_file = open(f"{base}.{os.getpid()}.tmp", "w")
+            self._log_file_processor = BatchLogRecordProcessor(
+                _OtlpJsonLogFileExporter(out=self._log_file)
+            )
+            self.logger_provider.add_log_record_processor(self._log_file_processor)
+            print(f"Log output file: {filepath}")
+        except Exception as e:
+            print(f"Warning: Failed to open log output file '{filepath}': {e}")
+            self._log_file = None
+            self._log_final_path = None
+
     @staticmethod
     def _cleanup_stale_tmp_files(gz_path):
         """Remove .tmp files left behind by crashed processes.
@@ -337,7 +752,8 @@ class TracingListener:
         """
         import glob
 
-        pattern = gz_path[: -len(".gz")] + ".*.tmp"
+        base = gz_path[: -len(".gz")] if gz_path.endswith(".gz") else gz_path
+        pattern = base + ".*.tmp"
         for tmp_file in glob.glob(pattern):
             try:
                 # Extract PID from filename: ....<pid>.tmp
@@ -403,13 +819,119 @@ class TracingListener:
             # Silently ignore errors to avoid breaking tests
             pass
 
+    def _attach_screenshots(self, span, depth=0, status="PASS", keep_pending=False):
+        """Attach screenshot events before the span ends.
+
+        Background-processed screenshots are attached as they are. In
+        on_failure mode, screenshots logged inside the span (``depth`` =
+        span stack length while it was open) are embedded only when the span
+        failed; ``keep_pending`` keeps them for the enclosing test otherwise.
+        """
+        try:
+            if self._screenshot_worker:
+                self._screenshot_worker.attach(span)
+            if self._failure_screenshots is not None:
+                self._failure_screenshots.resolve(span, depth, status == "FAIL", keep=keep_pending)
+        except Exception:
+            pass  # Never break the trace
+
+    def _flush_logs(self, span):
+        """Emit the log records aggregated for ``span`` before it ends.
+
+        In events mode also records how many log events the per-span cap dropped.
+        """
+        try:
+            if self._log_aggregator is not None:
+                for level, text, count, first_ns, last_ns in self._log_aggregator.pop(span):
+                    self._emit_log(
+                        span,
+                        level,
+                        text,
+                        timestamp_ns=first_ns,
+                        attributes={
+                            "rf.log.count": count,
+                            "rf.log.first_timestamp": first_ns // 1_000_000,
+                            "rf.log.last_timestamp": last_ns // 1_000_000,
+                        },
+                    )
+            if self._log_events:
+                count = self._log_event_counts.pop(span, 0)
+                dropped = count - self.config.log_max_events_per_span
+                if dropped > 0:
+                    span.set_attribute("rf.log.events_dropped", dropped)
+        except Exception:
+            pass  # Never break the trace
+
+    def _report_suppressed_logs(self, span):
+        """Emit one summary record for logs dropped by the rate limiter, then refill buckets."""
+        if self._log_rate_limiter is None:
+            return
+        try:
+            suppressed = self._log_rate_limiter.reset()
+            if not suppressed or not (self.logger or self._log_events):
+                return
+            total = sum(suppressed.values())
+            details = ", ".join(f"{level}: {count}" for level, count in sorted(suppressed.items()))
+            attributes = {"rf.log.suppressed": total}
+            for level, count in suppressed.items():
+                attributes[f"rf.log.suppressed.{level}"] = count
+            self._emit_log(
+                span,
+                "WARN",
+                f"Log rate limit: suppressed {total} records ({details})",
+                attributes=attributes,
+            )
+        except Exception:
+            pass  # Never break the trace
+
+    def _emit_log(self, span, level, text, timestamp_ns=None, attributes=None):
+        """Emit one log record correlated with ``span``.
+
+        With ``log_destination=events`` the record becomes an ``rf.log`` event
+        on the span instead, up to ``log_max_events_per_span`` per span.
+        """
+        if self._log_events:
+            if span is None:
+                return
+            count = self._log_event_counts.get(span, 0) + 1
+            self._log_event_counts[span] = count
+            if count > self.config.log_max_events_per_span:
+                return
+            event_attributes = {"rf.log.level": level, "rf.log.message": text}
+            if attributes:
+                event_attributes.update(attributes)
+            span.add_event("rf.log", event_attributes, timestamp=timestamp_ns)
+            return
+        # Map RF log levels to OTel severity
+        severity_map = {
+            "TRACE": 1,
+            "DEBUG": 5,
+            "INFO": 9,
+            "WARN": 13,
+            "ERROR": 17,
+            "FAIL": 21,
+        }
+        # Use the span's context for trace correlation
+        log_context = trace.set_span_in_context(span) if span is not None else None
+        log_attributes = {"rf.log.level": level}
+        if attributes:
+            log_attributes.update(attributes)
+        self.logger.emit(
+            timestamp=timestamp_ns,
+            body=text,
+            severity_number=severity_map.get(level, 9),
+            severity_text=level,
+            context=log_context,
+            attributes=log_attributes,
+        )
+
     def start_suite(self, data, result):
         """Create root span for suite."""
         try:
             self._suite_depth += 1
 
-            # In auto mode, reinitialize provider per child suite so each
-            # becomes its own service in the backend (e.g. SigNoz).
+            # In auto mode, each child suite becomes its own service in the
+            # backend (e.g. SigNoz); the provider itself is created only once.
             # Depth 1 = root suite (directory), depth 2+ = actual test suites.
             if self._auto_service:
                 if self._suite_depth == 1:
@@ -463,6 +985,17 @@ class TracingListener:
                 filename = f"{suite_name}_{trace_id[:8]}_traces.{ext}"
                 self._open_trace_file(filename)
 
+            # Log output file named like the trace file, e.g. suite_4bf92f35_logs.json
+            if (
+                self.config.log_output_file == "auto"
+                and self._log_file is None
+                and self.logger_provider
+            ):
+                trace_id = format(span.get_span_context().trace_id, "032x")
+                suite_name = self._sanitize_filename(data.name)
+                ext = "json.gz" if self.config.log_output_format == "gz" else "json"
+                self._open_log_file(f"{suite_name}_{trace_id[:8]}_logs.{ext}")
+
             # Resolve RF output directory for screenshot path resolution
             if not self._rf_output_dir and BUILTIN_AVAILABLE:
                 try:
@@ -481,7 +1014,12 @@ class TracingListener:
                 return
 
             if self.span_stack:
+                depth = len(self.span_stack)
                 span = self.span_stack.pop()
+                self._attach_screenshots(span, depth, result.status)
+                # The summary goes first so _flush_logs clears its event count too
+                self._report_suppressed_logs(span)
+                self._flush_logs(span)
                 SpanBuilder.set_span_status(span, result)
                 span.end()
 
@@ -535,7 +1073,12 @@ class TracingListener:
         """Close test span with verdict."""
         try:
             if self.span_stack:
+                depth = len(self.span_stack)
                 span = self.span_stack.pop()
+                self._attach_screenshots(span, depth, result.status)
+                # The summary goes first so _flush_logs clears its event count too
+                self._report_suppressed_logs(span)
+                self._flush_logs(span)
                 SpanBuilder.set_span_status(span, result)
                 if result.status == "FAIL":
                     SpanBuilder.add_error_event(span, result)
@@ -586,7 +1129,10 @@ class TracingListener:
                 return
 
             if self.span_stack:
+                depth = len(self.span_stack)
                 span = self.span_stack.pop()
+                self._attach_screenshots(span, depth, result.status, keep_pending=True)
+                self._flush_logs(span)
 
                 # Add event for setup/teardown end
                 if data.type in ("SETUP", "TEARDOWN"):
@@ -606,11 +1152,81 @@ class TracingListener:
         except Exception as e:
             print(f"TracingListener error in end_keyword: {e}")
 
+    @staticmethod
+    def _flusher(target, timeout_sec, label):
+        """Build a close task: force_flush within ``timeout_sec``."""
+
+        def flush_target():
+            try:
+                target.force_flush(int(timeout_sec * 1000))
+            except Exception as e:
+                print(f"TracingListener error flushing {label}: {e}")
+
+        return flush_target
+
+    def _shutdown_providers(self):
+        """Shut down every tracer provider; the shared span pipeline shuts down once."""
+        try:
+            for provider in self._providers.values():
+                provider.shutdown()
+        except Exception as e:
+            print(f"TracingListener error shutting down tracer: {e}")
+
+    def _shutdown_logger_provider(self):
+        try:
+            self.logger_provider.shutdown()
+        except Exception as e:
+            print(f"TracingListener error shutting down logs: {e}")
+
+    def _save_unsent_spans(self, trace_exporters):
+        """Save the spans the exporters did not take before the deadline.
+
+        Each queued exporter spills its own spans to its spill stores, which
+        the next run replays; the rest go to one OTLP JSON file in the output
+        directory. Returns the tail of the shutdown summary line.
+        """
+        leftover = {}
+        spilled = 0
+        try:
+            for exporter in trace_exporters:
+                spans = exporter.ledger.take() if exporter.ledger is not None else []
+                if not spans:
+                    continue
+                fanout = exporter.exporter
+                if isinstance(fanout, FanoutSpanExporter) and fanout.spill(spans):
+                    spilled += len(spans)
+                else:
+                    leftover.update((id(span), span) for span in spans)
+            saved = ""
+            if spilled:
+                saved = f"{spilled} saved to {self.config.export.spill_dir}"
+            if leftover:
+                path = os.path.join(
+                    self._rf_output_dir or ".", f"rf-tracer-unsent-{os.getpid()}.json"
+                )
+                with open(path, "a") as f:
+                    _OtlpJsonFileExporter(out=f).export(list(leftover.values()))
+                saved += f"{', ' if saved else ''}{len(leftover)} saved to {path}"
+        except Exception as e:
+            print(f"TracingListener error saving unsent spans: {e}")
+            return " lost"
+        return f" ({saved})" if saved else ""
+
+    def _trace_file_complete(self, ended):
+        """Whether the trace output file received every ended span (unfiltered)."""
+        return (
+            self._file_exporter is not None
+            and not self.config.trace_output_filter
+            and self._file_exporter.delivered >= ended
+        )
+
     def close(self):
         """Cleanup on listener close."""
         try:
             while self.span_stack:
                 span = self.span_stack.pop()
+                self._attach_screenshots(span)
+                self._flush_logs(span)
                 span.end()
             # Detach any remaining context tokens
             while self._context_tokens:
@@ -618,21 +1234,76 @@ class TracingListener:
         except Exception as e:
             print(f"TracingListener error ending spans in close: {e}")
 
-        try:
-            if self._provider:
-                self._provider.force_flush()
-                self._provider.shutdown()
-        except Exception as e:
-            print(f"TracingListener error flushing tracer: {e}")
-
-        # Shut down the file processor before closing the file to ensure
-        # all buffered spans are written and the background thread stops.
-        if self._file_processor:
+        if self._screenshot_worker:
             try:
-                self._file_processor.force_flush()
-                self._file_processor.shutdown()
+                discarded = self._screenshot_worker.shutdown()
+                if discarded:
+                    print(
+                        f"TracingListener: {discarded} screenshot(s) discarded, "
+                        "their spans ended before processing finished"
+                    )
             except Exception as e:
-                print(f"TracingListener error shutting down file processor: {e}")
+                print(f"TracingListener error stopping screenshot worker: {e}")
+            self._screenshot_worker = None
+
+        # The local file processors get no deadline: they finish writing
+        # before their files are closed below.
+        for proc, label in (
+            (self._file_processor, "file processor"),
+            (self._log_file_processor, "log file processor"),
+        ):
+            if proc:
+                try:
+                    proc.shutdown()
+                except Exception as e:
+                    print(f"TracingListener error shutting down {label}: {e}")
+
+        # Flush every remote processor in parallel against a single deadline,
+        # so a slow collector cannot keep the process alive, then shut the
+        # providers down under what is left of it.
+        start = time.monotonic()
+        timeout_sec = self.config.shutdown_timeout_sec
+        deadline = start + timeout_sec
+        trace_processors = list(getattr(self, "_trace_processors", []))
+        tasks = [
+            (f"traces-{i}", self._flusher(proc, timeout_sec, "tracer"))
+            for i, proc in enumerate(trace_processors)
+        ]
+        if self.logger_provider:
+            tasks.append(("logs", self._flusher(self.logger_provider, timeout_sec, "logs")))
+        pending = _run_until(tasks, deadline)
+        # A provider still exporting past the deadline finishes in the background
+        tasks = [("shutdown", self._shutdown_providers)]
+        if self.logger_provider:
+            tasks.append(("logs-shutdown", self._shutdown_logger_provider))
+        pending += _run_until(tasks, deadline)
+
+        trace_exporters = getattr(self, "_trace_exporters", [])
+        for exporter in trace_exporters:
+            if isinstance(exporter.exporter, FanoutSpanExporter):
+                for queue in exporter.exporter.queues:
+                    print(f"TracingListener export {queue.summary()}")
+        if self._span_counter is not None:
+            ended = self._span_counter.ended
+            # Spans an exporter has not delivered by now
+            unsent = max(
+                (ended - exporter.delivered for exporter in trace_exporters),
+                default=0,
+            )
+            summary = (
+                f"TracingListener shutdown: {ended - unsent}/{ended} spans flushed "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+            if pending:
+                summary += f"; deadline of {timeout_sec:g}s hit ({', '.join(pending)})"
+            if unsent:
+                summary += f"; {unsent} unsent spans"
+                if self._trace_file_complete(ended):
+                    path = self._gz_final_path or self._trace_file.name
+                    summary += f" are kept in {path}"
+                else:
+                    summary += self._save_unsent_spans(trace_exporters)
+            print(summary)
 
         # Always close the trace file so all data is flushed to disk.
         self._trace_file_path = None
@@ -650,33 +1321,31 @@ class TracingListener:
         # multi-member gzip file (concatenated gzip streams are valid per RFC 1952).
         if self._gz_final_path and self._trace_file_path:
             try:
-                with open(self._trace_file_path, "rb") as f_in:
-                    data = f_in.read()
-                if data:
-                    # Use a lock file to serialize gz appends across processes
-                    lock_path = self._gz_final_path + ".lock"
-                    lock_fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT)
-                    try:
-                        _lock_file(lock_fd)
-                        with gzip.open(self._gz_final_path, "ab") as f_out:
-                            f_out.write(data)
-                    finally:
-                        _unlock_file(lock_fd)
-                        os.close(lock_fd)
-                        try:
-                            os.remove(lock_path)
-                        except OSError:
-                            pass  # Another process may still need it
-                os.remove(self._trace_file_path)
+                _append_locked(
+                    self._trace_file_path,
+                    self._gz_final_path,
+                    compress=True,
+                    index=self.config.trace_output_index,
+                )
             except Exception as e:
                 print(f"TracingListener error compressing trace file: {e}")
             self._gz_final_path = None
 
-        try:
-            if self.logger_provider:
-                self.logger_provider.force_flush()
-        except Exception as e:
-            print(f"TracingListener error flushing logs: {e}")
+        self._log_file_processor = None
+
+        if self._log_file:
+            try:
+                log_tmp_path = self._log_file.name
+                self._log_file.close()
+                _append_locked(
+                    log_tmp_path,
+                    self._log_final_path,
+                    compress=self._log_final_path.endswith(".gz"),
+                )
+            except Exception as e:
+                print(f"TracingListener error writing log output file: {e}")
+            self._log_file = None
+            self._log_final_path = None
 
     def log_message(self, message):
         """Capture log messages and send to logs API. Also detect screenshots."""
@@ -689,16 +1358,30 @@ class TracingListener:
             # It only needs an active span and a non-"none" screenshot mode.
             if self.config.screenshots.mode != "none" and self.span_stack:
                 try:
-                    process_log_message(
-                        self.config.screenshots,
-                        self.span_stack[-1],
-                        message.message,
-                        self._rf_output_dir,
-                    )
+                    if self._failure_screenshots is not None:
+                        self._failure_screenshots.record(
+                            message.message, self._rf_output_dir, len(self.span_stack)
+                        )
+                    elif self._screenshot_worker:
+                        self._screenshot_worker.submit(
+                            self.span_stack[-1],
+                            message.message,
+                            self._rf_output_dir,
+                            self._screenshot_blob_dir,
+                        )
+                    else:
+                        process_log_message(
+                            self.config.screenshots,
+                            self.span_stack[-1],
+                            message.message,
+                            self._rf_output_dir,
+                            self._screenshot_cache,
+                            self._screenshot_blob_dir,
+                        )
                 except Exception:
                     pass  # Never break the trace
 
-            if not self.config.capture_logs or not self.logger:
+            if not self.config.capture_logs or not (self.logger or self._log_events):
                 return
 
             # Filter by log level
@@ -709,38 +1392,28 @@ class TracingListener:
             if msg_level < min_level:
                 return
 
+            # Rate limit before any formatting or context building
+            if self._log_rate_limiter is not None and not self._log_rate_limiter.allow(
+                message.level
+            ):
+                return
+
             # Limit message length
             log_text = message.message
             if len(log_text) > self.config.max_log_length:
                 log_text = log_text[: self.config.max_log_length] + "..."
 
-            # Map RF log levels to OTel severity
-            severity_map = {
-                "TRACE": 1,
-                "DEBUG": 5,
-                "INFO": 9,
-                "WARN": 13,
-                "ERROR": 17,
-                "FAIL": 21,
-            }
-            severity_number = severity_map.get(message.level, 9)
+            span = self.span_stack[-1] if self.span_stack else None
 
-            # Get trace context for correlation
-            log_context = None
-            if self.span_stack:
-                # Use the current span's context
-                log_context = trace.set_span_in_context(self.span_stack[-1])
-
-            # Emit log using logger API
-            self.logger.emit(
-                body=log_text,
-                severity_number=severity_number,
-                severity_text=message.level,
-                context=log_context,
-                attributes={
-                    "rf.log.level": message.level,
-                },
-            )
+            # Merge repeats of the same message within the current span
+            if (
+                self._log_aggregator is not None
+                and span is not None
+                and self._log_aggregator.add(span, message.level, log_text, time.time_ns())
+            ):
+                return
+
+            self._emit_log(span, message.level, log_text)
 
         except RecursionError:
             # Avoid infinite recursion if logging causes more logs
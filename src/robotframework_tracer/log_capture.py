@@ -0,0 +1,136 @@
+"""Log capture helpers for the tracing listener.
+
+LogAggregator merges repeated log records within a span: identical
+(level, message) pairs logged while the same span is current are collapsed
+into one record that is emitted when the span ends, carrying the number of
+occurrences and the first/last timestamps. Chatty polling keywords then
+produce one log record instead of thousands.
+
+Only a bounded number of distinct messages is buffered per span; once the
+limit is reached, further new messages bypass aggregation and are emitted
+immediately, so memory stays bounded.
+
+LogRateLimiter applies token-bucket limits per log level. Buckets are reset
+for every test; suppressed records are only counted, and the listener
+reports the counts as one summary record when the test ends.
+"""
+
+import time
+from collections import OrderedDict
+
+DEFAULT_LOG_DEDUP_MAX_DISTINCT = 100
+DEFAULT_LOG_RATE_BURST = 100
+
+
+class LogAggregator:
+    """Collapse identical log records within a span."""
+
+    def __init__(self, max_distinct: int = DEFAULT_LOG_DEDUP_MAX_DISTINCT):
+        self.max_distinct = max(1, int(max_distinct))
+        # span -> OrderedDict[(level, text)] -> [count, first_ns, last_ns]
+        self._spans = {}
+
+    def __len__(self):
+        return sum(len(records) for records in self._spans.values())
+
+    def add(self, span, level: str, text: str, timestamp_ns: int) -> bool:
+        """Buffer a record for ``span``.
+
+        Returns True if the record was absorbed, False if the span already
+        holds ``max_distinct`` other messages and the caller should emit it
+        directly.
+        """
+        records = self._spans.get(span)
+        if records is None:
+            records = self._spans[span] = OrderedDict()
+        key = (level, text)
+        entry = records.get(key)
+        if entry is not None:
+            entry[0] += 1
+            entry[2] = timestamp_ns
+            return True
+        if len(records) >= self.max_distinct:
+            return False
+        records[key] = [1, timestamp_ns, timestamp_ns]
+        return True
+
+    def pop(self, span) -> list:
+        """Remove and return the buffered records of ``span`` in first-seen order.
+
+        Returns a list of (level, text, count, first_ns, last_ns) tuples.
+        """
+        records = self._spans.pop(span, None)
+        if not records:
+            return []
+        return [
+            (level, text, count, first_ns, last_ns)
+            for (level, text), (count, first_ns, last_ns) in records.items()
+        ]
+
+
+def parse_rate_limits(value) -> dict:
+    """Parse a log rate limit setting into {level: records_per_second}.
+
+    Accepts a number (same limit for every level, stored under "*"), a
+    "LEVEL=rate,LEVEL=rate" string, or a dict from the config file.
+    Rates <= 0 mean unlimited and are dropped.
+    """
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, (int, float)):
+        items = [("*", value)]
+    else:
+        items = []
+        for part in str(value).split(","):
+            part = part.strip()
+            if not part:
+                continue
+            level, sep, rate = part.partition("=")
+            items.append((level, rate) if sep else ("*", level))
+    limits = {}
+    for level, rate in items:
+        try:
+            rate = float(rate)
+        except (TypeError, ValueError):
+            continue
+        if rate > 0:
+            limits[str(level).strip().upper()] = rate
+    return limits
+
+
+class LogRateLimiter:
+    """Token-bucket rate limits for log capture, one bucket per level."""
+
+    def __init__(self, limits: dict, burst: int = DEFAULT_LOG_RATE_BURST):
+        self.limits = dict(limits)
+        self.burst = max(1.0, float(burst))
+        self._buckets = {}  # level -> [tokens, last_refill]
+        self._suppressed = {}
+
+    def allow(self, level: str, now: float = None) -> bool:
+        """Take a token for ``level``. Returns False (and counts it) if none is left."""
+        rate = self.limits.get(level) or self.limits.get("*")
+        if not rate:
+            return True
+        if now is None:
+            now = time.monotonic()
+        bucket = self._buckets.get(level)
+        if bucket is None:
+            bucket = self._buckets[level] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return True
+        self._suppressed[level] = self._suppressed.get(level, 0) + 1
+        return False
+
+    def reset(self) -> dict:
+        """Refill all buckets and return the suppressed counts by level."""
+        suppressed = self._suppressed
+        self._suppressed = {}
+        self._buckets.clear()
+        return suppressed
@@ -0,0 +1,298 @@
+"""Merge trace output files into one file ordered by span start time.
+
+Pabot runs leave one trace file per worker, or one multi-member gzip file
+whose batches are interleaved in arbitrary order. Within a file, spans are
+ordered by end time at best (the batch processor exports spans as they end).
+
+The merge is an external sort, so memory stays bounded by ``chunk_spans``
+regardless of input size:
+
+  1. All inputs are streamed; spans are buffered in chunks, each chunk is
+     sorted by start time and written to a temporary run file. Every run
+     line starts with the zero-padded start time, so plain string order is
+     start-time order.
+  2. The runs are combined with a heap-based k-way merge (``heapq.merge``)
+     and written out in batches of ``batch_spans`` spans. At most ``fan_in``
+     run files are open at a time: with more runs, groups of ``fan_in`` runs
+     are first merged into longer runs, in as many passes as needed. Spans of the same
+     resource and scope within a batch are grouped into one ResourceSpans
+     entry; every span of a batch starts no later than any span of the next.
+
+Resources and instrumentation scopes are interned while reading, so run
+files carry only small ids. Span JSON is written back verbatim.
+
+With ``reparent``, top-level suite spans (suite spans whose parent is not a
+suite in the inputs) are re-parented under one synthetic run root span, and
+their traces are rewritten to the root's trace id, so separate pabot worker
+traces become one trace.
+"""
+
+import gzip
+import heapq
+import json
+import os
+import secrets
+import tempfile
+
+from .fileutil import atomic_path
+from .reader import open_trace_text
+from .transform import OUTPUT_FORMATS, guess_format
+
+DEFAULT_CHUNK_SPANS = 100_000
+DEFAULT_BATCH_SPANS = 512
+DEFAULT_ROOT_NAME = "Merged Run"
+DEFAULT_FAN_IN = 64
+_GZIP_LEVEL = 6
+# Enum names, as in the OTLP JSON written by the listener (MessageToDict)
+_SPAN_KIND_INTERNAL = "SPAN_KIND_INTERNAL"
+
+
+def _is_suite(span):
+    for attr in span.get("attributes", ()):
+        key = attr.get("key")
+        if key in ("rf.suite.id", "rf.suite.name"):
+            return True
+        if key == "rf.type":
+            return attr.get("value", {}).get("string_value") == "SUITE"
+    return False
+
+
+class _Interner:
+    """Map JSON-serializable values to small integer ids and back (as JSON text)."""
+
+    def __init__(self):
+        self._ids = {}
+        self.texts = []
+
+    def intern(self, value):
+        text = json.dumps(value or {}, separators=(",", ":"), sort_keys=True)
+        index = self._ids.get(text)
+        if index is None:
+            index = self._ids[text] = len(self.texts)
+            self.texts.append(text)
+        return index
+
+
+def _write_run(lines, tmp_dir, runs):
+    lines.sort()
+    path = os.path.join(tmp_dir, f"run{len(runs):05d}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    runs.append(path)
+    lines.clear()
+
+
+def _read_runs(inputs, tmp_dir, chunk_spans, resources, scopes, suites):
+    """Phase 1: split inputs into sorted run files. Returns (run_paths, span_count)."""
+    runs = []
+    chunk = []
+    total = 0
+    for path in inputs:
+        with open_trace_text(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                d = json.loads(line)
+                for rs in d.get("resource_spans", []):
+                    res_id = resources.intern(rs.get("resource"))
+                    for ss in rs.get("scope_spans", []):
+                        scope_id = scopes.intern(ss.get("scope"))
+                        for span in ss.get("spans", []):
+                            start = int(span.get("start_time_unix_nano", 0) or 0)
+                            if suites is not None and _is_suite(span):
+                                suites[span.get("span_id", "")] = (
+                                    span.get("parent_span_id", ""),
+                                    span.get("trace_id", ""),
+                                    start,
+                                    int(span.get("end_time_unix_nano", 0) or 0),
+                                    res_id,
+                                )
+                            text = json.dumps(span, separators=(",", ":"))
+                            chunk.append(f"{start:020d}\t{res_id}\t{scope_id}\t{text}\n")
+                            total += 1
+                            if len(chunk) >= chunk_spans:
+                                _write_run(chunk, tmp_dir, runs)
+    if chunk:
+        _write_run(chunk, tmp_dir, runs)
+    return runs, total
+
+
+def _merge_passes(runs, tmp_dir, fan_in):
+    """Merge groups of ``fan_in`` runs until at most ``fan_in`` remain. Returns (runs, passes)."""
+    passes = 0
+    while len(runs) > fan_in:
+        passes += 1
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i : i + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            path = os.path.join(tmp_dir, f"pass{passes:03d}-{len(merged):05d}.txt")
+            files = [open(run, encoding="utf-8") for run in group]
+            try:
+                with open(path, "w", encoding="utf-8") as out:
+                    out.writelines(heapq.merge(*files))
+            finally:
+                for f in files:
+                    f.close()
+            for run in group:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+    return runs, passes
+
+
+def _plan_reparent(suites, root_name, inputs_count):
+    """Build the synthetic root run line and the rewrite rules for reparenting."""
+    top = {
+        span_id: info for span_id, info in suites.items() if not info[0] or info[0] not in suites
+    }
+    if not top:
+        return None, set(), {}
+    first = min(top.values(), key=lambda info: info[2])
+    trace_id = first[1]
+    root = {
+        "trace_id": trace_id,
+        "span_id": secrets.token_hex(8),
+        "name": root_name,
+        "kind": _SPAN_KIND_INTERNAL,
+        "start_time_unix_nano": str(first[2]),
+        "end_time_unix_nano": str(max(info[3] for info in top.values())),
+        "attributes": [{"key": "rf.merge.inputs", "value": {"int_value": str(inputs_count)}}],
+        "status": {},
+    }
+    text = json.dumps(root, separators=(",", ":"))
+    # Root goes under scope id -1, resolved to an empty scope when writing
+    root_line = f"{first[2]:020d}\t{first[4]}\t-1\t{text}\n"
+    remap = {info[1]: trace_id for info in top.values() if info[1] and info[1] != trace_id}
+    return (root_line, root["span_id"]), set(top), remap
+
+
+def _rewrite(text, top_ids, root_span_id, remap):
+    if remap:
+        for old, new in remap.items():
+            old_field = f'"trace_id":"{old}"'
+            if old_field in text:
+                text = text.replace(old_field, f'"trace_id":"{new}"')
+    if top_ids and root_span_id:
+        span_id = text.split('"span_id":"', 1)[1].split('"', 1)[0] if '"span_id":"' in text else ""
+        if span_id in top_ids:
+            span = json.loads(text)
+            span["parent_span_id"] = root_span_id
+            text = json.dumps(span, separators=(",", ":"))
+    return text
+
+
+def _format_batch(batch, resources, scopes):
+    """Render (res_id, scope_id, span_text) records as one ExportTraceServiceRequest line."""
+    grouped = {}
+    for res_id, scope_id, text in batch:
+        grouped.setdefault(res_id, {}).setdefault(scope_id, []).append(text)
+    resource_spans = []
+    for res_id, by_scope in grouped.items():
+        scope_spans = []
+        for scope_id, spans in by_scope.items():
+            scope = scopes.texts[scope_id] if scope_id >= 0 else "{}"
+            scope_spans.append(f'{{"scope":{scope},"spans":[{",".join(spans)}]}}')
+        resource_spans.append(
+            f'{{"resource":{resources.texts[res_id]},"scope_spans":[{",".join(scope_spans)}]}}'
+        )
+    return f'{{"resource_spans":[{",".join(resource_spans)}]}}\n'
+
+
+def merge_files(
+    inputs,
+    dst,
+    output_format=None,
+    reparent=False,
+    root_name=DEFAULT_ROOT_NAME,
+    chunk_spans=DEFAULT_CHUNK_SPANS,
+    batch_spans=DEFAULT_BATCH_SPANS,
+    tmp_dir=None,
+    fan_in=DEFAULT_FAN_IN,
+):
+    """Merge trace files into ``dst`` ordered by span start time.
+
+    Args:
+        inputs: Trace files (.json or .json.gz, multi-member gzip allowed).
+        dst: Output path. Written atomically via a temporary file.
+        output_format: "json" or "gz"; inferred from ``dst`` when None.
+        reparent: Put top-level suite spans under one synthetic root span.
+        root_name: Name of the synthetic root span.
+        chunk_spans: Spans sorted in memory at a time (bounds memory use).
+        batch_spans: Spans per output line.
+        tmp_dir: Directory for temporary run files (default: system temp).
+        fan_in: Run files merged (and open) at a time, at least 2.
+
+    Returns:
+        Dict with files, spans_in, spans_out, runs, merge_passes and
+        reparented counters.
+    """
+    output_format = (output_format or guess_format(dst)).lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    inputs = list(inputs)
+    if not inputs:
+        raise ValueError("No input files")
+    if any(os.path.abspath(src) == os.path.abspath(dst) for src in inputs):
+        raise ValueError("Input and output must be different files")
+    chunk_spans = max(1, int(chunk_spans))
+    batch_spans = max(1, int(batch_spans))
+    fan_in = max(2, int(fan_in))
+
+    resources = _Interner()
+    scopes = _Interner()
+    suites = {} if reparent else None
+    stats = {
+        "files": len(inputs),
+        "spans_in": 0,
+        "spans_out": 0,
+        "runs": 0,
+        "merge_passes": 0,
+        "reparented": 0,
+    }
+
+    with atomic_path(dst) as tmp_path, tempfile.TemporaryDirectory(
+        prefix="rf-tracer-merge-", dir=tmp_dir
+    ) as run_dir:
+        runs, stats["spans_in"] = _read_runs(
+            inputs, run_dir, chunk_spans, resources, scopes, suites
+        )
+        stats["runs"] = len(runs)
+        runs, stats["merge_passes"] = _merge_passes(runs, run_dir, fan_in)
+
+        root, top_ids, remap = (None, set(), {})
+        if reparent:
+            root, top_ids, remap = _plan_reparent(suites, root_name, len(inputs))
+            suites.clear()
+        extra = [[root[0]]] if root else []
+        stats["reparented"] = len(top_ids)
+        root_span_id = root[1] if root else None
+
+        opener = (
+            gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=_GZIP_LEVEL)
+            if output_format == "gz"
+            else open(tmp_path, "w", encoding="utf-8")
+        )
+        files = [open(path, encoding="utf-8") for path in runs]
+        try:
+            with opener as out:
+                batch = []
+                for line in heapq.merge(*files, *extra):
+                    _, res_id, scope_id, text = line.rstrip("\n").split("\t", 3)
+                    if top_ids or remap:
+                        text = _rewrite(text, top_ids, root_span_id, remap)
+                    batch.append((int(res_id), int(scope_id), text))
+                    if len(batch) >= batch_spans:
+                        out.write(_format_batch(batch, resources, scopes))
+                        stats["spans_out"] += len(batch)
+                        batch = []
+                if batch:
+                    out.write(_format_batch(batch, resources, scopes))
+                    stats["spans_out"] += len(batch)
+        finally:
+            for f in files:
+                f.close()
+    return stats
@@ -0,0 +1,281 @@
+"""Lazy streaming reader for trace output files.
+
+Trace output files hold one OTLP JSON ExportTraceServiceRequest per line,
+plain or as (multi-member) gzip. The functions here decode one batch at a
+time, so memory use does not depend on the file size:
+
+    from robotframework_tracer.reader import iter_spans, iter_span_records
+
+    for span in iter_spans("traces.json.gz", types=["TEST"], fields=["name", "status"]):
+        ...
+
+Filters are pushed down as far as possible: ``contains``, ``names`` and
+``types`` first check the raw text of a batch and only decode batches that
+may match; ``trace_id`` uses the sidecar member index (index.py), when one
+exists, to decompress only the members holding that trace. ``fields``
+projects span dicts onto the keys a caller needs; ``iter_span_records``
+yields lightweight slotted objects with flattened attributes instead.
+
+Files that are not one object per line (pretty-printed or concatenated JSON
+documents) are decoded as well, buffering only the current document. A
+corrupt line followed by complete one-line documents is skipped.
+"""
+
+import gzip
+import json
+
+from .index import iter_lines, read_member_lines
+
+SPAN_TYPES = ("SUITE", "TEST", "KEYWORD")
+
+# Attribute keys identifying the span type when rf.type was filtered out
+_TYPE_KEYS = {"SUITE": "rf.suite.name", "TEST": "rf.test.name", "KEYWORD": "rf.keyword.type"}
+_DECODER = json.JSONDecoder()
+# Longest multi-line document buffered before giving up on the file
+_MAX_DOCUMENT_CHARS = 256 * 1024 * 1024
+
+
+def open_trace_text(path):
+    """Open a trace output file for line-by-line text reading.
+
+    Multi-member gzip files (as written by concurrent pabot workers) are
+    read transparently as one stream.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def _starts_document(text):
+    """Whether a stripped line starts with a complete one-line JSON document."""
+    if not (text.startswith('{"') and text.endswith("}")):
+        return False
+    try:
+        _DECODER.raw_decode(text)
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+def _decode_documents(lines, prefilters=()):
+    """Yield JSON documents from text lines holding one or more documents each.
+
+    A document spanning several lines is buffered until it is complete.
+    A one-line document is skipped without decoding unless its text holds
+    one needle of every prefilter. A complete one-line document arriving
+    while a document is buffered means the buffered text is corrupt (e.g.
+    a line cut short by a killed worker): it is dropped and decoding
+    restarts at that line. Buffering more than ``_MAX_DOCUMENT_CHARS``
+    raises ValueError.
+    """
+    parts = []
+    size = 0
+    for line in lines:
+        text = line.strip()
+        if parts and _starts_document(text):
+            parts, size = [], 0
+        if not parts:
+            if not text:
+                continue
+            if prefilters and text.startswith("{") and text.endswith("}"):
+                if not all(any(n in text for n in needles) for needles in prefilters):
+                    continue
+        parts.append(line)
+        size += len(line)
+        if size > _MAX_DOCUMENT_CHARS:
+            raise ValueError(f"JSON document exceeds {_MAX_DOCUMENT_CHARS} characters")
+        if not text.endswith("}"):
+            continue  # A document cannot end on this line
+        buffer = "".join(parts).strip()
+        pos = 0
+        try:
+            while pos < len(buffer):
+                document, pos = _DECODER.raw_decode(buffer, pos)
+                yield document
+                while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                    pos += 1
+        except json.JSONDecodeError:
+            rest = buffer[pos:] + "\n"  # Incomplete document, wait for more lines
+            parts, size = [rest], len(rest)
+            continue
+        parts, size = [], 0
+    if parts:
+        raise ValueError("Trace file ends with an incomplete JSON document")
+
+
+def _needles(values):
+    """Raw-text forms of ``values`` as they can appear in a JSON document."""
+    needles = set()
+    for value in values:
+        needles.add(json.dumps(value)[1:-1])
+        needles.add(json.dumps(value, ensure_ascii=False)[1:-1])
+    return needles
+
+
+def iter_batches(path, contains=None, trace_id=None, members=None):
+    """Yield the ExportTraceServiceRequest dicts of a trace file, one at a time.
+
+    Args:
+        path: Trace file (.json or .json.gz).
+        contains: Only decode batches whose raw text contains this string.
+        trace_id: Only read index members holding this trace (all batches
+            are read when the file has no valid index).
+        members: Read only these sidecar index entries.
+    """
+    prefilters = [{contains}] if contains else []
+    if members is not None:
+        lines = (line.decode("utf-8") for line in read_member_lines(path, members))
+        return _decode_documents(lines, prefilters)
+    return _iter_prefiltered(path, prefilters, trace_id)
+
+
+def _attribute_value(value):
+    for kind, raw in value.items():
+        if kind in ("int_value", "intValue"):
+            return int(raw)
+        if kind in ("double_value", "doubleValue"):
+            return float(raw)
+        if kind in ("array_value", "arrayValue"):
+            return [_attribute_value(v) for v in raw.get("values", ())]
+        return raw
+    return None
+
+
+def span_attributes(span, keys=None):
+    """Flatten a span dict's OTLP attribute list into ``{key: value}``.
+
+    Accepts snake_case and camelCase value fields. ``keys`` limits the
+    result to those attribute keys.
+    """
+    values = {}
+    for attr in span.get("attributes", ()):
+        key = attr.get("key")
+        if keys is None or key in keys:
+            values[key] = _attribute_value(attr.get("value", {}))
+    return values
+
+
+def span_type(span):
+    """Return "SUITE", "TEST" or "KEYWORD" for a span dict."""
+    attrs = span_attributes(span)
+    kind = str(attrs.get("rf.type", "")).upper()
+    if kind in SPAN_TYPES:
+        return kind
+    for kind, key in _TYPE_KEYS.items():
+        if key in attrs:
+            return kind
+    return "KEYWORD"
+
+
+def _batch_spans(path, types, names, where, trace_id, contains):
+    if types is not None:
+        types = {t.upper() for t in types}
+    if names is not None:
+        names = set(names)
+    prefilters = []
+    if contains:
+        prefilters.append({contains})
+    if names:
+        prefilters.append(_needles(names))
+    if types and "KEYWORD" not in types:
+        prefilters.append({f'"{t}"' for t in types} | {_TYPE_KEYS[t] for t in types})
+    for batch in _iter_prefiltered(path, prefilters, trace_id):
+        for rs in batch.get("resource_spans", ()):
+            for ss in rs.get("scope_spans", ()):
+                for span in ss.get("spans", ()):
+                    if trace_id is not None and span.get("trace_id") != trace_id:
+                        continue
+                    if names is not None and span.get("name") not in names:
+                        continue
+                    if types is not None and span_type(span) not in types:
+                        continue
+                    if where is not None and not where(span):
+                        continue
+                    yield rs, span
+
+
+def _iter_prefiltered(path, prefilters, trace_id):
+    if trace_id is not None:
+        lines = (line.decode("utf-8") for line in iter_lines(path, trace_id=trace_id))
+        yield from _decode_documents(lines, prefilters)
+        return
+    with open_trace_text(path) as f:
+        yield from _decode_documents(f, prefilters)
+
+
+def iter_spans(path, types=None, names=None, where=None, fields=None, trace_id=None, contains=None):
+    """Yield span dicts from a trace file lazily, in file order.
+
+    Args:
+        path: Trace file (.json or .json.gz).
+        types: Span types to keep ("SUITE", "TEST", "KEYWORD").
+        names: Span names to keep.
+        where: Predicate on the span dict, applied after the other filters.
+        fields: Span keys to keep (projection); all keys when None.
+        trace_id: Only spans of this trace; uses the sidecar index if present.
+        contains: Only decode batches whose raw text contains this string.
+    """
+    for _, span in _batch_spans(path, types, names, where, trace_id, contains):
+        if fields is not None:
+            span = {key: span[key] for key in fields if key in span}
+        yield span
+
+
+class SpanRecord:
+    """Lightweight span view with parsed timestamps and flattened attributes."""
+
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_span_id",
+        "name",
+        "type",
+        "start_ns",
+        "end_ns",
+        "status",
+        "service",
+        "attributes",
+        "events",
+    )
+
+    def __init__(self, span, resource=None, attributes=None, events=False):
+        self.trace_id = span.get("trace_id", "")
+        self.span_id = span.get("span_id", "")
+        self.parent_span_id = span.get("parent_span_id", "")
+        self.name = span.get("name", "")
+        self.type = span_type(span)
+        self.start_ns = int(span.get("start_time_unix_nano", 0) or 0)
+        self.end_ns = int(span.get("end_time_unix_nano", 0) or 0)
+        self.status = span.get("status", {}).get("code", "")
+        self.service = (
+            span_attributes(resource, ("service.name",)).get("service.name", "") if resource else ""
+        )
+        self.attributes = span_attributes(span, attributes)
+        self.events = span.get("events", []) if events else None
+
+    @property
+    def duration_ns(self):
+        return max(0, self.end_ns - self.start_ns)
+
+    def __repr__(self):
+        return f"SpanRecord({self.type} {self.name!r} {self.span_id})"
+
+
+def iter_span_records(
+    path,
+    types=None,
+    names=None,
+    where=None,
+    attributes=None,
+    events=False,
+    trace_id=None,
+    contains=None,
+):
+    """Yield ``SpanRecord`` objects from a trace file lazily.
+
+    Takes the same filters as ``iter_spans``; ``where`` receives the span
+    dict. ``attributes`` limits the flattened attributes to those keys and
+    events are only kept with ``events=True``.
+    """
+    for rs, span in _batch_spans(path, types, names, where, trace_id, contains):
+        yield SpanRecord(span, rs.get("resource"), attributes, events)
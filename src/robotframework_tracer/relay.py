@@ -0,0 +1,436 @@
+"""Per-host span relay shared by pabot workers.
+
+Without a relay, every pabot worker owns its exporters, batch threads and
+collector connections. With ``relay`` enabled, workers instead hand their
+encoded span batches to one relay process per host over a Unix domain
+socket; the relay owns the pooled exporters (FanoutSpanExporter with its
+per-endpoint queues, retries and optional disk spill) and an optional
+trace output file.
+
+Wire format, worker -> relay: frames of a 1-byte type, a 4-byte big-endian
+length and the payload.
+
+    S  payload is a serialized ExportTraceServiceRequest
+    F  flush request (empty payload); the relay answers with one ``K`` byte
+       once everything received so far was handed to the endpoint queues
+
+The relay coalesces requests arriving within ``batch_delay_ms`` (up to
+``batch_max_bytes``) into one request per endpoint. Serialized protobuf
+messages of the same type can simply be concatenated: repeated fields are
+merged, so the concatenation is a valid ExportTraceServiceRequest holding
+all resource spans.
+
+The first worker that cannot connect spawns the relay (``rf-tracer relay``)
+under a lock file, so concurrent workers start only one. An auto-spawned
+relay exits after ``idle_timeout_sec`` without connected workers. When no
+relay can be reached, workers fall back to exporting directly.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+RELAY_AVAILABLE = hasattr(socket, "AF_UNIX")
+
+DEFAULT_BATCH_DELAY_MS = 200
+DEFAULT_BATCH_MAX_BYTES = 4 * 1024 * 1024
+DEFAULT_IDLE_TIMEOUT_SEC = 30.0
+_SPAWN_WAIT_SEC = 5.0
+_FLUSH_TIMEOUT_SEC = 10.0
+
+_FRAME = struct.Struct(">cI")
+_SPANS = b"S"
+_FLUSH = b"F"
+_ACK = b"K"
+
+
+def default_socket_path(endpoints, protocol: str, options=()) -> str:
+    """Per-user socket path, distinct for every endpoint/protocol/options combination.
+
+    ``options`` are the other ``rf-tracer relay`` arguments (export settings),
+    so workers configured differently never share a relay.
+    """
+    key = json.dumps([sorted(endpoints), protocol, list(options)]).encode("utf-8")
+    digest = hashlib.sha1(key).hexdigest()[:10]
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), f"rf-tracer-relay-{uid}-{digest}.sock")
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("relay connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _connect(path: str, timeout_sec: float = _FLUSH_TIMEOUT_SEC):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout_sec)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class RelayServer:
+    """Receive encoded span batches from local workers and export them."""
+
+    def __init__(
+        self,
+        socket_path: str,
+        exporter,
+        output: str = "",
+        batch_delay_ms: float = DEFAULT_BATCH_DELAY_MS,
+        batch_max_bytes: int = DEFAULT_BATCH_MAX_BYTES,
+        idle_timeout_sec: float = 0,
+    ):
+        """
+        Args:
+            socket_path: Unix socket to listen on.
+            exporter: FanoutSpanExporter that delivers to the endpoints.
+            output: Optional trace file receiving every batch as OTLP JSON.
+            batch_delay_ms: Time to coalesce requests from workers.
+            batch_max_bytes: Size at which a coalesced request is sent right away.
+            idle_timeout_sec: Exit after this long without workers (0 = never).
+        """
+        self.socket_path = socket_path
+        self.exporter = exporter
+        self.batch_delay = max(0.0, batch_delay_ms / 1000.0)
+        self.batch_max_bytes = max(1, int(batch_max_bytes))
+        self.idle_timeout_sec = idle_timeout_sec
+        self.stats = {"connections": 0, "requests": 0, "batches": 0, "bytes": 0}
+        self._output = open(output, "a") if output else None
+        self._pending = []
+        self._pending_bytes = 0
+        self._sending = 0  # Batches taken by the batcher but not yet submitted
+        self._cond = threading.Condition()
+        self._active = 0
+        self._last_activity = time.monotonic()
+        self._stopped = False
+        self._server = None
+        self._batcher = None
+
+    def _bind(self):
+        if os.path.exists(self.socket_path):
+            try:
+                _connect(self.socket_path, 1.0).close()
+            except OSError:
+                os.unlink(self.socket_path)  # Stale socket of a dead relay
+            else:
+                raise OSError(f"A relay is already listening on {self.socket_path}")
+        relay = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                relay._handle(self.request)
+
+        # Create the socket owner-only from the start: a chmod after bind()
+        # would leave a window in which other users can connect
+        old_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+
+    def start(self):
+        self._bind()
+        self._batcher = threading.Thread(target=self._run_batcher, name="rf-tracer-relay-batch")
+        self._batcher.daemon = True
+        self._batcher.start()
+        threading.Thread(
+            target=self._server.serve_forever, name="rf-tracer-relay", daemon=True
+        ).start()
+        return self
+
+    def serve(self):
+        """Run until stopped or, with an idle timeout, until no worker is left."""
+        if self._server is None:
+            self.start()
+        try:
+            while not self._stopped:
+                time.sleep(0.5)
+                with self._cond:
+                    idle = self._active == 0 and not self._pending
+                    idle_for = time.monotonic() - self._last_activity
+                if self.idle_timeout_sec and idle and idle_for >= self.idle_timeout_sec:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _handle(self, sock):
+        with self._cond:
+            self._active += 1
+            self.stats["connections"] += 1
+            self._last_activity = time.monotonic()
+        try:
+            while True:
+                kind, length = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+                payload = _recv_exact(sock, length) if length else b""
+                if kind == _SPANS:
+                    self._add(payload)
+                elif kind == _FLUSH:
+                    self.flush()
+                    sock.sendall(_ACK)
+        except (ConnectionError, OSError, struct.error):
+            pass
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._last_activity = time.monotonic()
+
+    def _add(self, payload: bytes):
+        with self._cond:
+            self._pending.append(payload)
+            self._pending_bytes += len(payload)
+            self.stats["requests"] += 1
+            self.stats["bytes"] += len(payload)
+            self._last_activity = time.monotonic()
+            self._cond.notify_all()
+
+    def _take_batch(self):
+        """Wait for pending requests, then the batch delay. Call with the lock held."""
+        self._cond.wait_for(lambda: self._pending or self._stopped)
+        if not self._pending:
+            return None
+        deadline = time.monotonic() + self.batch_delay
+        while (
+            not self._stopped
+            and self._pending_bytes < self.batch_max_bytes
+            and time.monotonic() < deadline
+        ):
+            self._cond.wait(deadline - time.monotonic())
+        batch = b"".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._sending += 1
+        return batch
+
+    def _run_batcher(self):
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+                if batch is None:
+                    return
+            try:
+                if batch:  # Empty when a flush took the pending requests first
+                    self._send(batch)
+            finally:
+                with self._cond:
+                    self._sending -= 1
+                    self._cond.notify_all()
+
+    def _send(self, batch: bytes):
+        # Concatenated ExportTraceServiceRequest messages form one valid request
+        self.exporter.submit(batch)
+        self.stats["batches"] += 1
+        if self._output is not None:
+            self._write(batch)
+
+    def _write(self, batch: bytes):
+        from google.protobuf.json_format import MessageToDict
+        from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+            ExportTraceServiceRequest,
+        )
+
+        from .listener import _OtlpJsonFileExporter
+
+        d = MessageToDict(
+            ExportTraceServiceRequest.FromString(batch), preserving_proto_field_name=True
+        )
+        self._output.write(
+            json.dumps(_OtlpJsonFileExporter._fix_byte_ids(d), separators=(",", ":")) + "\n"
+        )
+        self._output.flush()
+
+    def flush(self, timeout_sec: float = _FLUSH_TIMEOUT_SEC):
+        """Send everything pending right away and wait for the endpoint queues.
+
+        A batch the batcher already took is waited for as well, so every
+        request received before the flush is in the queues when it returns.
+        """
+        deadline = time.monotonic() + timeout_sec
+        with self._cond:
+            batch = b"".join(self._pending)
+            self._pending = []
+            self._pending_bytes = 0
+        if batch:
+            self._send(batch)
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._sending == 0, max(0.0, deadline - time.monotonic())
+            ):
+                return False
+        remaining = max(0.0, deadline - time.monotonic())
+        return self.exporter.force_flush(int(remaining * 1000))
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._batcher is not None:
+            self._batcher.join(timeout=5)
+        self.flush()
+        self.exporter.shutdown()
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+
+
+def spawn_relay(socket_path: str, args) -> bool:
+    """Start a detached ``rf-tracer relay`` unless one is already reachable.
+
+    A lock file next to the socket serializes concurrent workers, so only
+    the first one spawns. Returns True once the relay accepts connections.
+    """
+    from .listener import _lock_file, _unlock_file
+
+    lock_fd = os.open(socket_path + ".lock", os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        _lock_file(lock_fd)
+        try:
+            _connect(socket_path, 1.0).close()
+            return True
+        except OSError:
+            pass
+        subprocess.Popen(
+            [sys.executable, "-m", "robotframework_tracer.cli", "relay", "--socket", socket_path]
+            + list(args),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + _SPAWN_WAIT_SEC
+        while time.monotonic() < deadline:
+            try:
+                _connect(socket_path, 1.0).close()
+                return True
+            except OSError:
+                time.sleep(0.05)
+        return False
+    finally:
+        _unlock_file(lock_fd)
+        os.close(lock_fd)
+
+
+class RelaySpanExporter(SpanExporter):
+    """Encode span batches once and hand them to the local relay.
+
+    ``spawn_args`` are the ``rf-tracer relay`` arguments used to auto-spawn
+    the relay (None disables spawning). ``fallback`` creates a direct
+    exporter, used when no relay can be reached.
+    """
+
+    def __init__(self, socket_path: str, spawn_args=None, fallback=None):
+        self.socket_path = socket_path
+        self.spawn_args = spawn_args
+        self._fallback_factory = fallback
+        self._fallback = None
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _ensure_connected(self):
+        if self._sock is not None:
+            return True
+        try:
+            self._sock = _connect(self.socket_path)
+            return True
+        except OSError:
+            pass
+        if self.spawn_args is not None and spawn_relay(self.socket_path, self.spawn_args):
+            try:
+                self._sock = _connect(self.socket_path)
+                return True
+            except OSError:
+                pass
+        return False
+
+    def _send(self, kind: bytes, payload: bytes = b""):
+        """Send one frame, reconnecting once. Call with the lock held."""
+        for _ in range(2):
+            if not self._ensure_connected():
+                return False
+            try:
+                self._sock.sendall(_FRAME.pack(kind, len(payload)) + payload)
+                return True
+            except OSError:
+                self._close_socket()
+        return False
+
+    def _close_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _direct(self):
+        if self._fallback is None and self._fallback_factory is not None:
+            print(f"Warning: span relay at {self.socket_path} not reachable, exporting directly")
+            self._fallback = self._fallback_factory()
+        return self._fallback
+
+    def export(self, spans):
+        try:
+            body = encode_spans(spans).SerializeToString()
+        except Exception:
+            return SpanExportResult.FAILURE
+        with self._lock:
+            if self._fallback is None and self._send(_SPANS, body):
+                return SpanExportResult.SUCCESS
+            direct = self._direct()
+        if direct is None:
+            return SpanExportResult.FAILURE
+        return direct.export(spans)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        with self._lock:
+            if self._fallback is not None:
+                return self._fallback.force_flush(timeout_millis)
+            if self._sock is None:
+                return True  # Nothing was handed to the relay yet
+            if not self._send(_FLUSH):
+                return False
+            try:
+                self._sock.settimeout(timeout_millis / 1000.0)
+                return _recv_exact(self._sock, 1) == _ACK
+            except OSError:
+                self._close_socket()
+                return False
+            finally:
+                if self._sock is not None:
+                    self._sock.settimeout(_FLUSH_TIMEOUT_SEC)
+
+    def shutdown(self):
+        self.force_flush(int(_FLUSH_TIMEOUT_SEC * 1000))
+        with self._lock:
+            self._close_socket()
+            if self._fallback is not None:
+                self._fallback.shutdown()
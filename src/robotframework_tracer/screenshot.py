@@ -4,32 +4,95 @@ Detects screenshots emitted by SeleniumLibrary and Browser (Playwright)
 via log_message HTML output, and attaches them to the current span as
 OTel span events.
 
-Three modes:
+Modes:
   - "none"     → no screenshot processing (default)
   - "path"     → attach file path reference only
   - "embedded" → attach base64-encoded image data (with size guard + fallback)
+  - "blob"     → store each image once in a content-addressed directory next
+                 to the trace output file; the event carries hash, mime, size
+  - "on_failure" → remember screenshot paths only; read and embed them when
+                 the keyword/test ends with FAIL, discard them on PASS
+
+Inline ``<img src="data:image/...;base64,...">`` screenshots (Browser library,
+some Selenium setups) are supported too: the existing base64 payload is
+sliced straight into the event without decoding and re-encoding.
+
+In embedded mode, file reads and encoding run on a small thread pool
+(ScreenshotWorker) and the events are attached when the owning span ends,
+so retry sleeps and base64 encoding overlap with test execution.
+
+With ``dedup`` enabled, a run-wide ScreenshotCache keyed by SHA-256 makes
+sure identical images are embedded only once; later events reference the
+span that carries the bytes.
+
+With ``recompress`` enabled and Pillow installed, embedded screenshots
+larger than ``max_size_kb`` are downscaled and re-encoded as WebP/JPEG until
+they fit, instead of falling back to a path reference.
 """
 
 import base64
+import copy
 import hashlib
+import io
 import mimetypes
 import os
 import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Optional
 
+# Pillow is optional; only needed for screenshots.recompress
+try:
+    from PIL import Image
+
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
 # Regex to extract src from <img> tags emitted by RF screenshot keywords.
 # Handles both single and double quotes, and optional attributes before src.
 _IMG_SRC_RE = re.compile(r"<img\b[^>]*\bsrc=[\"']([^\"']+)[\"']", re.IGNORECASE)
 
+# Inline data-URI screenshot; the payload runs from match end to the closing quote
+_DATA_URI_RE = re.compile(r"<img\b[^>]*?\bsrc=([\"'])data:(image/[\w.+-]+);base64,", re.IGNORECASE)
+
+# Extensions for inline images, by MIME type
+_INLINE_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/webp": ".webp",
+}
+
 # Allowed image extensions (lowercase, with dot)
 _VALID_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
 
 # Default config values
 DEFAULT_MODE = "none"
+MODES = ("none", "path", "embedded", "blob", "on_failure")
 DEFAULT_MAX_SIZE_KB = 200
 DEFAULT_RETRY_ATTEMPTS = 3
 DEFAULT_RETRY_DELAY_SEC = 0.05
+DEFAULT_WORKERS = 2
+DEFAULT_WAIT_TIMEOUT_SEC = 5.0
+DEFAULT_DEDUP = False
+DEFAULT_DEDUP_CACHE_SIZE = 1024
+
+DEFAULT_RECOMPRESS = False
+DEFAULT_RECOMPRESS_FORMAT = "webp"
+DEFAULT_RECOMPRESS_QUALITY = 80
+
+_RECOMPRESS_MIME = {"webp": "image/webp", "jpeg": "image/jpeg"}
+# Quality floor and scale factor per step when shrinking oversized images
+_MIN_RECOMPRESS_QUALITY = 30
+_DOWNSCALE_FACTOR = 0.7
+_MAX_DOWNSCALE_STEPS = 6
+
+# Bytes hashed for the cheap dedup pre-check (together with file identity + mtime)
+_HEAD_HASH_BYTES = 4096
 
 
 class ScreenshotConfig:
@@ -45,11 +108,38 @@ class ScreenshotConfig:
         max_size_kb: int = DEFAULT_MAX_SIZE_KB,
         retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
         retry_delay_sec: float = DEFAULT_RETRY_DELAY_SEC,
+        workers: int = DEFAULT_WORKERS,
+        wait_timeout_sec: float = DEFAULT_WAIT_TIMEOUT_SEC,
+        dedup: bool = DEFAULT_DEDUP,
+        dedup_cache_size: int = DEFAULT_DEDUP_CACHE_SIZE,
+        recompress: bool = DEFAULT_RECOMPRESS,
+        recompress_format: str = DEFAULT_RECOMPRESS_FORMAT,
+        recompress_quality: int = DEFAULT_RECOMPRESS_QUALITY,
+        blob_dir: str = "",
+        blob_hardlink: bool = False,
     ):
-        self.mode = mode if mode in ("none", "path", "embedded") else DEFAULT_MODE
+        self.mode = mode if mode in MODES else DEFAULT_MODE
         self.max_size_kb = max(0, int(max_size_kb))
         self.retry_attempts = max(1, int(retry_attempts))
         self.retry_delay_sec = max(0.0, float(retry_delay_sec))
+        # 0 workers = process screenshots synchronously inside log_message
+        self.workers = max(0, int(workers))
+        self.wait_timeout_sec = max(0.0, float(wait_timeout_sec))
+        self.dedup = bool(dedup)
+        self.dedup_cache_size = max(1, int(dedup_cache_size))
+        self.recompress = bool(recompress)
+        recompress_format = str(recompress_format).lower()
+        if recompress_format == "jpg":
+            recompress_format = "jpeg"
+        self.recompress_format = (
+            recompress_format
+            if recompress_format in _RECOMPRESS_MIME
+            else DEFAULT_RECOMPRESS_FORMAT
+        )
+        self.recompress_quality = min(95, max(1, int(recompress_quality)))
+        # Empty = "<trace output file>.blobs", resolved by the listener
+        self.blob_dir = str(blob_dir or "")
+        self.blob_hardlink = bool(blob_hardlink)
 
     @classmethod
     def from_dict(cls, data: dict) -> "ScreenshotConfig":
@@ -61,15 +151,136 @@ class ScreenshotConfig:
             max_size_kb=data.get("max_size_kb", DEFAULT_MAX_SIZE_KB),
             retry_attempts=data.get("retry_attempts", DEFAULT_RETRY_ATTEMPTS),
             retry_delay_sec=data.get("retry_delay_sec", DEFAULT_RETRY_DELAY_SEC),
+            workers=data.get("workers", DEFAULT_WORKERS),
+            wait_timeout_sec=data.get("wait_timeout_sec", DEFAULT_WAIT_TIMEOUT_SEC),
+            dedup=data.get("dedup", DEFAULT_DEDUP),
+            dedup_cache_size=data.get("dedup_cache_size", DEFAULT_DEDUP_CACHE_SIZE),
+            recompress=data.get("recompress", DEFAULT_RECOMPRESS),
+            recompress_format=data.get("recompress_format", DEFAULT_RECOMPRESS_FORMAT),
+            recompress_quality=data.get("recompress_quality", DEFAULT_RECOMPRESS_QUALITY),
+            blob_dir=data.get("blob_dir", ""),
+            blob_hardlink=data.get("blob_hardlink", False),
         )
 
 
+class ScreenshotCache:
+    """Run-wide LRU cache of embedded screenshots, keyed by SHA-256.
+
+    Maps each image hash to the (trace_id, span_id) of the span whose event
+    carries the base64 data. A second map from a cheap file fingerprint
+    (device, inode, size, mtime, hash of the first 4 KB) to the SHA-256 lets
+    an unchanged file be recognized without reading it completely.
+
+    Both maps are bounded by ``max_entries`` with least-recently-used
+    eviction; an evicted image is simply embedded again on its next use.
+    Thread-safe, shared by the ScreenshotWorker pool.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_DEDUP_CACHE_SIZE):
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._refs = OrderedDict()  # sha256 -> (trace_id_hex, span_id_hex)
+        self._fingerprints = OrderedDict()  # fingerprint -> sha256
+
+    @staticmethod
+    def _put(store, key, value, max_entries):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > max_entries:
+            store.popitem(last=False)
+
+    def sha_for(self, fingerprint) -> Optional[str]:
+        """Return the SHA-256 recorded for a file fingerprint, if any."""
+        with self._lock:
+            sha = self._fingerprints.get(fingerprint)
+            if sha is not None:
+                self._fingerprints.move_to_end(fingerprint)
+            return sha
+
+    def remember(self, fingerprint, sha: str) -> None:
+        with self._lock:
+            self._put(self._fingerprints, fingerprint, sha, self.max_entries)
+
+    def get(self, sha: str) -> Optional[tuple]:
+        """Return the span reference holding the bytes for ``sha``, if cached."""
+        with self._lock:
+            ref = self._refs.get(sha)
+            if ref is not None:
+                self._refs.move_to_end(sha)
+            return ref
+
+    def claim(self, sha: str, ref: tuple) -> Optional[tuple]:
+        """Register ``ref`` as the holder of ``sha`` unless one exists.
+
+        Returns the existing holder (caller should reference it), or None if
+        the caller now owns the image and must embed it.
+        """
+        with self._lock:
+            existing = self._refs.get(sha)
+            if existing is not None:
+                self._refs.move_to_end(sha)
+                return existing
+            self._put(self._refs, sha, ref, self.max_entries)
+            return None
+
+    def release(self, sha: str, ref: tuple) -> None:
+        """Drop a claim made by ``ref`` that did not end up embedding data."""
+        with self._lock:
+            if self._refs.get(sha) == ref:
+                del self._refs[sha]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._refs)
+
+
+def file_fingerprint(path: str) -> Optional[tuple]:
+    """Cheap identity of a file's current content: stat fields + head hash."""
+    try:
+        st = os.stat(path)
+        if st.st_size == 0:
+            return None
+        with open(path, "rb") as f:
+            head = hashlib.sha256(f.read(_HEAD_HASH_BYTES)).hexdigest()
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, head)
+
+
+def span_ref(span) -> Optional[tuple]:
+    """Return (trace_id_hex, span_id_hex) of a span, or None if unavailable."""
+    try:
+        ctx = span.get_span_context()
+        return (format(ctx.trace_id, "032x"), format(ctx.span_id, "016x"))
+    except Exception:
+        return None
+
+
+def _may_contain_img(html: str) -> bool:
+    """Cheap substring pre-screen so regexes only run on messages with an <img> tag.
+
+    Never lowercases the whole message (it may hold a multi-MB data URI):
+    mixed-case tags are found by checking the 4 characters at each ``<i``.
+    """
+    if "<img" in html or "<IMG" in html:
+        return True
+    for prefix in ("<i", "<I"):
+        start = html.find(prefix)
+        while start != -1:
+            if html[start : start + 4].lower() == "<img":
+                return True
+            start = html.find(prefix, start + 2)
+    return False
+
+
 def extract_image_path(html: str) -> Optional[str]:
     """Extract image file path from an HTML log message.
 
     Returns the src value if the message contains an <img> tag
     pointing to a file with a valid image extension, else None.
     """
+    if not _may_contain_img(html):
+        return None
     match = _IMG_SRC_RE.search(html)
     if not match:
         return None
@@ -83,6 +294,30 @@ def extract_image_path(html: str) -> Optional[str]:
     return src
 
 
+def extract_data_uri(html: str) -> Optional[tuple]:
+    """Extract an inline base64 image from an ``<img src="data:...">`` tag.
+
+    Returns (mime, base64_payload) or None. The payload is a slice of the
+    message; it is never decoded here.
+    """
+    if not html or not _may_contain_img(html):
+        return None
+    match = _DATA_URI_RE.search(html)
+    if not match:
+        return None
+    start = match.end()
+    end = html.find(match.group(1), start)
+    if end <= start:
+        return None
+    return match.group(2).lower(), html[start:end]
+
+
+def base64_decoded_size(b64: str) -> int:
+    """Size in bytes of base64 data, computed from the encoded length."""
+    padding = len(b64) - len(b64.rstrip("="))
+    return len(b64) * 3 // 4 - padding
+
+
 def normalize_path(path: str, output_dir: str = "") -> str:
     """Resolve a potentially relative path to an absolute path.
 
@@ -152,21 +387,165 @@ def compute_sha256(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
+def recompress_image(
+    data: bytes,
+    max_bytes: int,
+    fmt: str = DEFAULT_RECOMPRESS_FORMAT,
+    quality: int = DEFAULT_RECOMPRESS_QUALITY,
+) -> Optional[tuple]:
+    """Re-encode an image as WebP/JPEG, downscaling until it fits ``max_bytes``.
+
+    Each step first tries the configured quality, then a lower one, before
+    shrinking both dimensions by 30%.
+
+    Returns (encoded_bytes, mime, (width, height)), or None if Pillow is not
+    installed, the image cannot be decoded or encoded (e.g. a Pillow build
+    without WebP support), or no step fits the budget.
+    """
+    if not PIL_AVAILABLE or max_bytes <= 0:
+        return None
+    fmt = fmt if fmt in _RECOMPRESS_MIME else DEFAULT_RECOMPRESS_FORMAT
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        return None
+
+    if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif fmt == "webp" and img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGBA")
+
+    resample = getattr(Image, "Resampling", Image).LANCZOS
+    qualities = sorted({quality, max(_MIN_RECOMPRESS_QUALITY, quality - 30)}, reverse=True)
+    width, height = img.size
+    scale = 1.0
+    for _ in range(_MAX_DOWNSCALE_STEPS):
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        candidate = img if scale == 1.0 else img.resize(size, resample)
+        for q in qualities:
+            buf = io.BytesIO()
+            try:
+                candidate.save(buf, format=fmt.upper(), quality=q)
+            except Exception:
+                return None
+            if buf.tell() <= max_bytes:
+                return buf.getvalue(), _RECOMPRESS_MIME[fmt], size
+        scale *= _DOWNSCALE_FACTOR
+    return None
+
+
+def store_blob(data: bytes, src_path: str, blob_dir: str, sha: str, hardlink: bool = False) -> str:
+    """Store an image once under ``blob_dir/<sha256><ext>``. Returns the blob file name.
+
+    Existing blobs are left untouched. New blobs are written from ``data``,
+    or with ``hardlink`` hard-linked from the source file when possible (same
+    filesystem); either way they appear atomically via a temp file + rename,
+    so concurrent pabot workers can share one blob directory. A linked blob
+    changes with its source, so linking is only safe for screenshot files
+    that are never overwritten in place.
+    """
+    ext = os.path.splitext(src_path)[1].lower()
+    name = f"{sha}{ext}"
+    dst = os.path.join(blob_dir, name)
+    if os.path.exists(dst):
+        return name
+    os.makedirs(blob_dir, exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        linked = False
+        if hardlink:
+            try:
+                os.link(src_path, tmp)
+                linked = True
+            except OSError:
+                pass
+        if not linked:
+            with open(tmp, "wb") as f:
+                f.write(data)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return name
+
+
+def _blob_attributes(config, abs_path, mime, filename, timestamp_ms, blob_dir, cache):
+    if not blob_dir:
+        # No trace output file to put the blobs next to
+        return _path_fallback_attributes(abs_path, timestamp_ms)
+
+    # A known fingerprint whose blob already exists needs no read at all
+    fingerprint = file_fingerprint(abs_path) if cache is not None else None
+    sha = cache.sha_for(fingerprint) if fingerprint else None
+    ext = os.path.splitext(abs_path)[1].lower()
+    if sha and os.path.exists(os.path.join(blob_dir, f"{sha}{ext}")):
+        size = fingerprint[2]
+    else:
+        data = read_with_retry(abs_path, config.retry_attempts, config.retry_delay_sec)
+        if data is None:
+            return _path_fallback_attributes(abs_path, timestamp_ms)
+        sha = compute_sha256(data)
+        size = len(data)
+        store_blob(data, abs_path, blob_dir, sha, config.blob_hardlink)
+        if cache is not None:
+            fingerprint = fingerprint or file_fingerprint(abs_path)
+            if fingerprint:
+                cache.remember(fingerprint, sha)
+
+    return {
+        "rf.screenshot.mode": "blob",
+        "rf.screenshot.sha256": sha,
+        "rf.screenshot.mime": mime,
+        "rf.screenshot.size": size,
+        "rf.screenshot.name": filename,
+        "rf.screenshot.timestamp": timestamp_ms,
+    }
+
+
+def _dedup_attributes(abs_path, mime, filename, size, sha, ref, timestamp_ms):
+    attrs = {
+        "rf.screenshot.mode": "deduplicated",
+        "rf.screenshot.mime": mime,
+        "rf.screenshot.name": filename,
+        "rf.screenshot.size": size,
+        "rf.screenshot.sha256": sha,
+        "rf.screenshot.ref_trace_id": ref[0],
+        "rf.screenshot.ref_span_id": ref[1],
+        "rf.screenshot.timestamp": timestamp_ms,
+    }
+    if abs_path:
+        attrs["rf.screenshot.path"] = abs_path
+    return attrs
+
+
 def build_event_attributes(
     config: ScreenshotConfig,
     abs_path: str,
+    timestamp_ms: Optional[int] = None,
+    cache: Optional[ScreenshotCache] = None,
+    ref: Optional[tuple] = None,
+    blob_dir: str = "",
 ) -> Optional[dict]:
     """Build the span event attribute dict for a screenshot.
 
     Returns None if mode is "none" or processing fails entirely.
-    For "embedded" mode, falls back to "path" on read/size errors.
+    For "embedded" and "blob" modes, falls back to "path" on read/size errors
+    (and, for "blob", when no ``blob_dir`` is known).
+    ``timestamp_ms`` defaults to now; pass the log message time when
+    building the attributes later on a worker thread.
+
+    With a ``cache`` and the (trace_id, span_id) ``ref`` of the span the
+    event will be added to, images already embedded elsewhere in the run
+    produce a "deduplicated" event that references the holding span.
     """
     if config.mode == "none":
         return None
 
     filename = os.path.basename(abs_path)
     mime = guess_mime_type(abs_path)
-    timestamp_ms = int(time.time() * 1000)
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
 
     if config.mode == "path":
         return {
@@ -177,36 +556,71 @@ def build_event_attributes(
             "rf.screenshot.timestamp": timestamp_ms,
         }
 
+    if config.mode == "blob":
+        return _blob_attributes(config, abs_path, mime, filename, timestamp_ms, blob_dir, cache)
+
     # --- embedded mode ---
+    use_cache = cache is not None and ref is not None
+    fingerprint = None
+    if use_cache:
+        fingerprint = file_fingerprint(abs_path)
+        sha = cache.sha_for(fingerprint) if fingerprint else None
+        holder = cache.get(sha) if sha else None
+        if holder is not None:
+            return _dedup_attributes(
+                abs_path, mime, filename, fingerprint[2], sha, holder, timestamp_ms
+            )
+
     data = read_with_retry(abs_path, config.retry_attempts, config.retry_delay_sec)
 
     if data is None:
         # File unreadable after retries → fallback to path
-        return {
-            "rf.screenshot.mode": "path_fallback",
-            "rf.screenshot.path": abs_path,
-            "rf.screenshot.mime": mime,
-            "rf.screenshot.name": filename,
-            "rf.screenshot.size": 0,
-            "rf.screenshot.timestamp": timestamp_ms,
-        }
+        return _path_fallback_attributes(abs_path, timestamp_ms)
 
-    size_kb = len(data) / 1024.0
-    if size_kb > config.max_size_kb:
+    original_size = len(data)
+    too_large = original_size / 1024.0 > config.max_size_kb
+    if too_large and not (config.recompress and PIL_AVAILABLE):
         # Too large → fallback to path
-        return {
-            "rf.screenshot.mode": "path_fallback",
-            "rf.screenshot.path": abs_path,
-            "rf.screenshot.mime": mime,
-            "rf.screenshot.name": filename,
-            "rf.screenshot.size": len(data),
-            "rf.screenshot.timestamp": timestamp_ms,
+        return _path_fallback_attributes(abs_path, timestamp_ms, original_size)
+
+    # The hash always identifies the original file, so a recompressed image
+    # is deduplicated without being re-encoded.
+    sha = compute_sha256(data)
+    if use_cache:
+        if fingerprint is None:
+            fingerprint = file_fingerprint(abs_path)
+        if fingerprint is not None:
+            cache.remember(fingerprint, sha)
+        holder = cache.claim(sha, ref)
+        if holder is not None:
+            return _dedup_attributes(
+                abs_path, mime, filename, original_size, sha, holder, timestamp_ms
+            )
+
+    extra = {}
+    if too_large:
+        recompressed = recompress_image(
+            data,
+            int(config.max_size_kb * 1024),
+            config.recompress_format,
+            config.recompress_quality,
+        )
+        if recompressed is None:
+            if use_cache:
+                cache.release(sha, ref)
+            return _path_fallback_attributes(abs_path, timestamp_ms, original_size)
+        data, mime, (width, height) = recompressed
+        filename = os.path.splitext(filename)[0] + _INLINE_EXTENSIONS[mime]
+        extra = {
+            "rf.screenshot.recompressed": True,
+            "rf.screenshot.original_size": original_size,
+            "rf.screenshot.width": width,
+            "rf.screenshot.height": height,
         }
 
     b64 = base64.b64encode(data).decode("ascii")
-    sha = compute_sha256(data)
 
-    return {
+    attrs = {
         "rf.screenshot.mode": "embedded",
         "rf.screenshot.path": abs_path,
         "rf.screenshot.data": b64,
@@ -216,10 +630,151 @@ def build_event_attributes(
         "rf.screenshot.sha256": sha,
         "rf.screenshot.timestamp": timestamp_ms,
     }
+    attrs.update(extra)
+    return attrs
+
+
+def _inline_omitted_attributes(mime: str, b64: str, timestamp_ms: int) -> dict:
+    return {
+        "rf.screenshot.mode": "inline_omitted",
+        "rf.screenshot.mime": mime,
+        "rf.screenshot.name": f"inline{_INLINE_EXTENSIONS.get(mime, '.bin')}",
+        "rf.screenshot.size": base64_decoded_size(b64),
+        "rf.screenshot.timestamp": timestamp_ms,
+    }
+
+
+def build_inline_attributes(
+    config: ScreenshotConfig,
+    mime: str,
+    b64: str,
+    timestamp_ms: Optional[int] = None,
+    cache: Optional[ScreenshotCache] = None,
+    ref: Optional[tuple] = None,
+    blob_dir: str = "",
+) -> Optional[dict]:
+    """Build the span event attribute dict for an inline data-URI screenshot.
+
+    In embedded mode the base64 payload is attached as-is; the size comes
+    from the encoded length. The payload is only decoded when needed: to
+    hash it for deduplication (``cache`` given), to recompress it, or to
+    write it to the blob store. Without anywhere to put the data ("path"
+    mode, no blob directory, too large), an "inline_omitted" event records
+    that the screenshot happened.
+    """
+    if config.mode == "none":
+        return None
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+    name = f"inline{_INLINE_EXTENSIONS.get(mime, '.bin')}"
+    size = base64_decoded_size(b64)
+
+    if config.mode == "path" or (config.mode == "blob" and not blob_dir):
+        return _inline_omitted_attributes(mime, b64, timestamp_ms)
+
+    if config.mode == "blob":
+        data = base64.b64decode(b64)
+        sha = compute_sha256(data)
+        store_blob(data, name, blob_dir, sha, hardlink=False)
+        return {
+            "rf.screenshot.mode": "blob",
+            "rf.screenshot.sha256": sha,
+            "rf.screenshot.mime": mime,
+            "rf.screenshot.size": len(data),
+            "rf.screenshot.name": name,
+            "rf.screenshot.timestamp": timestamp_ms,
+        }
+
+    # --- embedded mode ---
+    too_large = size / 1024.0 > config.max_size_kb
+    if too_large and not (config.recompress and PIL_AVAILABLE):
+        return _inline_omitted_attributes(mime, b64, timestamp_ms)
+
+    use_cache = cache is not None and ref is not None
+    data = None
+    sha = None
+    if use_cache:
+        data = base64.b64decode(b64)
+        sha = compute_sha256(data)
+        holder = cache.claim(sha, ref)
+        if holder is not None:
+            return _dedup_attributes("", mime, name, size, sha, holder, timestamp_ms)
+
+    attrs = {}
+    if too_large:
+        if data is None:
+            data = base64.b64decode(b64)
+        recompressed = recompress_image(
+            data,
+            int(config.max_size_kb * 1024),
+            config.recompress_format,
+            config.recompress_quality,
+        )
+        if recompressed is None:
+            if use_cache:
+                cache.release(sha, ref)
+            return _inline_omitted_attributes(mime, b64, timestamp_ms)
+        data, mime, (width, height) = recompressed
+        name = f"inline{_INLINE_EXTENSIONS[mime]}"
+        b64 = base64.b64encode(data).decode("ascii")
+        attrs = {
+            "rf.screenshot.recompressed": True,
+            "rf.screenshot.original_size": size,
+            "rf.screenshot.width": width,
+            "rf.screenshot.height": height,
+        }
+        size = len(data)
+
+    attrs.update(
+        {
+            "rf.screenshot.mode": "inline",
+            "rf.screenshot.data": b64,
+            "rf.screenshot.mime": mime,
+            "rf.screenshot.name": name,
+            "rf.screenshot.size": size,
+            "rf.screenshot.timestamp": timestamp_ms,
+        }
+    )
+    if sha:
+        attrs["rf.screenshot.sha256"] = sha
+    return attrs
+
+
+def _extract_source(message_html: str):
+    """Return the screenshot source of a log message.
+
+    Either a (mime, base64) tuple for inline images, the raw src path for
+    file screenshots, or None.
+    """
+    inline = extract_data_uri(message_html)
+    if inline is not None:
+        return inline
+    return extract_image_path(message_html)
+
+
+def _build_source_attributes(
+    config, source, output_dir, timestamp_ms, cache=None, ref=None, blob_dir=""
+):
+    if isinstance(source, tuple):
+        mime, b64 = source
+        return build_inline_attributes(config, mime, b64, timestamp_ms, cache, ref, blob_dir)
+    abs_path = normalize_path(source, output_dir)
+    return build_event_attributes(config, abs_path, timestamp_ms, cache, ref, blob_dir)
+
+
+def _timeout_fallback_attributes(source, output_dir, timestamp_ms):
+    if isinstance(source, tuple):
+        return _inline_omitted_attributes(source[0], source[1], timestamp_ms)
+    return _path_fallback_attributes(normalize_path(source, output_dir), timestamp_ms)
 
 
 def process_log_message(
-    config: ScreenshotConfig, span, message_html: str, output_dir: str = ""
+    config: ScreenshotConfig,
+    span,
+    message_html: str,
+    output_dir: str = "",
+    cache: Optional[ScreenshotCache] = None,
+    blob_dir: str = "",
 ) -> bool:
     """Check a log message for screenshot <img> tags and attach to span.
 
@@ -231,6 +786,8 @@ def process_log_message(
         span: The current OTel span (must support add_event).
         message_html: The raw message.message string from Robot Framework.
         output_dir: RF output directory for resolving relative screenshot paths.
+        cache: Optional run-wide ScreenshotCache for deduplication.
+        blob_dir: Blob directory for "blob" mode.
 
     Returns:
         True if a screenshot event was added, False otherwise.
@@ -241,14 +798,20 @@ def process_log_message(
     if not span or not message_html:
         return False
 
-    raw_path = extract_image_path(message_html)
-    if raw_path is None:
+    source = _extract_source(message_html)
+    if source is None:
         return False
 
-    abs_path = normalize_path(raw_path, output_dir)
-
     try:
-        attrs = build_event_attributes(config, abs_path)
+        attrs = _build_source_attributes(
+            config,
+            source,
+            output_dir,
+            None,
+            cache=cache,
+            ref=span_ref(span) if cache is not None else None,
+            blob_dir=blob_dir,
+        )
         if attrs is None:
             return False
         span.add_event("rf.screenshot", attrs)
@@ -256,3 +819,195 @@ def process_log_message(
     except Exception:
         # Never break the trace — silently skip
         return False
+
+
+def _path_fallback_attributes(abs_path: str, timestamp_ms: int, size: int = 0) -> dict:
+    return {
+        "rf.screenshot.mode": "path_fallback",
+        "rf.screenshot.path": abs_path,
+        "rf.screenshot.mime": guess_mime_type(abs_path),
+        "rf.screenshot.name": os.path.basename(abs_path),
+        "rf.screenshot.size": size,
+        "rf.screenshot.timestamp": timestamp_ms,
+    }
+
+
+class ScreenshotWorker:
+    """Build screenshot events on a thread pool and attach them at span end.
+
+    ``submit()`` only runs the <img> regex on the listener thread; path
+    resolution, read retries, base64 encoding, hashing and blob writes
+    happen on the pool. ``attach()`` is called right before the owning span ends and waits
+    at most ``config.wait_timeout_sec`` in total for that span's screenshots.
+    Screenshots still pending after the deadline are attached as
+    "path_fallback" (or "inline_omitted") events so no reference is lost;
+    a dedup claim their late result makes is released again.
+
+    All methods are called from the listener thread only.
+    """
+
+    def __init__(self, config: ScreenshotConfig, cache: Optional[ScreenshotCache] = None):
+        self.config = config
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, config.workers), thread_name_prefix="rf-tracer-screenshot"
+        )
+        # span -> list of (future, source, output_dir, timestamp_ns, ref)
+        self._pending = {}
+
+    def _build(self, source, output_dir, timestamp_ms, ref=None, blob_dir=""):
+        return _build_source_attributes(
+            self.config, source, output_dir, timestamp_ms, self.cache, ref, blob_dir
+        )
+
+    def submit(self, span, message_html: str, output_dir: str = "", blob_dir: str = "") -> bool:
+        """Queue screenshot processing for a log message. Returns True if queued."""
+        if self.config.mode == "none" or not span or not message_html:
+            return False
+        source = _extract_source(message_html)
+        if source is None:
+            return False
+        timestamp_ns = time.time_ns()
+        ref = span_ref(span) if self.cache is not None else None
+        future = self._executor.submit(
+            self._build, source, output_dir, timestamp_ns // 1_000_000, ref, blob_dir
+        )
+        self._pending.setdefault(span, []).append((future, source, output_dir, timestamp_ns, ref))
+        return True
+
+    def _release_when_done(self, future, ref):
+        """Release the dedup claim of a result that is not attached to its span."""
+        if self.cache is None or ref is None:
+            return
+
+        def release(done):
+            try:
+                attrs = done.result()
+            except Exception:
+                return
+            # Only events that embed the data hold the claim for their sha
+            if attrs and "rf.screenshot.data" in attrs and "rf.screenshot.sha256" in attrs:
+                self.cache.release(attrs["rf.screenshot.sha256"], ref)
+
+        future.add_done_callback(release)
+
+    def attach(self, span, timeout: Optional[float] = None) -> int:
+        """Add the finished screenshot events of ``span``. Returns the number added."""
+        entries = self._pending.pop(span, None)
+        if not entries:
+            return 0
+        if timeout is None:
+            timeout = self.config.wait_timeout_sec
+        deadline = time.monotonic() + timeout
+        added = 0
+        for future, source, output_dir, timestamp_ns, ref in entries:
+            try:
+                attrs = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                if not future.cancel():
+                    self._release_when_done(future, ref)
+                attrs = _timeout_fallback_attributes(source, output_dir, timestamp_ns // 1_000_000)
+            except Exception:
+                continue  # Never break the trace
+            if attrs is None:
+                continue
+            try:
+                span.add_event("rf.screenshot", attrs, timestamp=timestamp_ns)
+                added += 1
+            except Exception:
+                self._release_when_done(future, ref)
+        return added
+
+    def shutdown(self) -> int:
+        """Attach whatever is left without waiting and stop the pool.
+
+        Spans that already ended no longer accept events (the SDK drops them
+        with a warning), so their screenshots are discarded instead.
+
+        Returns the number of screenshots discarded that way.
+        """
+        discarded = 0
+        for span in list(self._pending):
+            if span.is_recording():
+                self.attach(span, timeout=0.0)
+                continue
+            for future, _, _, _, ref in self._pending.pop(span):
+                if not future.cancel():
+                    self._release_when_done(future, ref)
+                discarded += 1
+        self._executor.shutdown(wait=False)
+        return discarded
+
+
+class FailureScreenshots:
+    """Deferred screenshots for "on_failure" mode.
+
+    ``record()`` only extracts and resolves the screenshot path (or keeps a
+    reference to an inline data-URI payload), remembering
+    it with the span stack depth at which it was logged. ``resolve()`` is
+    called when a keyword, test or suite span ends: entries logged inside
+    that span are embedded on it if the span failed, otherwise they are kept
+    (keywords) or discarded (tests/suites) by the caller's choice of
+    ``failed``/``keep``. Files are only read for failing spans, so green
+    runs do no screenshot I/O.
+
+    All methods are called from the listener thread only.
+    """
+
+    def __init__(self, config: ScreenshotConfig, cache: Optional[ScreenshotCache] = None):
+        self.config = config
+        self.cache = cache
+        # Failing spans embed like "embedded" mode (incl. dedup/recompress)
+        self._embed_config = copy.copy(config)
+        self._embed_config.mode = "embedded"
+        self._entries = []  # (source, timestamp_ns, depth); see _extract_source
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, message_html: str, output_dir: str, depth: int) -> bool:
+        """Remember a screenshot path from a log message. Returns True if recorded."""
+        if not message_html:
+            return False
+        source = _extract_source(message_html)
+        if source is None:
+            return False
+        if not isinstance(source, tuple):
+            source = normalize_path(source, output_dir)
+        self._entries.append((source, time.time_ns(), depth))
+        return True
+
+    def resolve(self, span, depth: int, failed: bool, keep: bool = False) -> int:
+        """Handle entries logged at ``depth`` or deeper when a span ends.
+
+        If ``failed``, they are read, encoded and added to ``span``. Otherwise
+        they stay pending when ``keep`` is set (a passing keyword inside a
+        test that may still fail) and are dropped when it is not.
+
+        Returns the number of events added.
+        """
+        if not failed and keep:
+            return 0
+        inner = [e for e in self._entries if e[2] >= depth]
+        if not inner:
+            return 0
+        self._entries = [e for e in self._entries if e[2] < depth]
+        if not failed:
+            return 0
+
+        ref = span_ref(span) if self.cache is not None else None
+        added = 0
+        for source, timestamp_ns, _ in inner:
+            try:
+                attrs = _build_source_attributes(
+                    self._embed_config, source, "", timestamp_ns // 1_000_000, self.cache, ref
+                )
+                if attrs is not None:
+                    span.add_event("rf.screenshot", attrs, timestamp=timestamp_ns)
+                    added += 1
+            except Exception:
+                pass  # Never break the trace
+        return added
+
+    def clear(self):
+        self._entries = []
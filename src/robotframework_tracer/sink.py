@@ -0,0 +1,230 @@
+"""Lightweight local OTLP receiver for exporter tuning and benchmarks.
+
+Accepts OTLP/HTTP protobuf requests on ``/v1/traces`` (and ``/v1/logs``)
+and, when grpcio is installed, the OTLP/gRPC TraceService. Received requests
+are counted (requests, spans, wire bytes) and can optionally be written to an
+OTLP JSON trace file in the same format as the listener's trace output file.
+
+Latency and errors can be injected to reproduce a slow or flaky collector:
+every request is delayed by ``latency_ms`` and a ``error_rate`` fraction of
+requests is answered with ``error_status`` (HTTP) or UNAVAILABLE (gRPC).
+"""
+
+import gzip
+import json
+import random
+import threading
+import time
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.protobuf.json_format import MessageToDict
+from opentelemetry.proto.collector.logs.v1.logs_service_pb2 import ExportLogsServiceRequest
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+    ExportTraceServiceResponse,
+)
+
+try:
+    import grpc
+
+    GRPC_AVAILABLE = True
+except ImportError:
+    GRPC_AVAILABLE = False
+
+DEFAULT_HTTP_PORT = 4318
+DEFAULT_GRPC_PORT = 4317
+
+_TRACE_SERVICE = "opentelemetry.proto.collector.trace.v1.TraceService"
+
+
+class SinkStats:
+    """Thread-safe counters for received OTLP data."""
+
+    FIELDS = ("requests", "spans", "log_records", "bytes", "errors_injected", "bad_requests")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, **counts):
+        with self._lock:
+            for field, value in counts.items():
+                setattr(self, field, getattr(self, field) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = {field: getattr(self, field) for field in self.FIELDS}
+        data["elapsed_sec"] = time.monotonic() - self.started
+        return data
+
+    def summary(self) -> str:
+        data = self.snapshot()
+        rate = data["spans"] / data["elapsed_sec"] if data["elapsed_sec"] else 0.0
+        return (
+            f"{data['requests']} requests, {data['spans']} spans, "
+            f"{data['log_records']} log records, {data['bytes']} bytes, "
+            f"{data['errors_injected']} injected errors, {data['bad_requests']} bad requests "
+            f"in {data['elapsed_sec']:.1f}s ({rate:.0f} spans/s)"
+        )
+
+
+class OtlpSink:
+    """Local OTLP/HTTP (and optionally OTLP/gRPC) receiver."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        http_port: int = DEFAULT_HTTP_PORT,
+        grpc_port: int = None,
+        latency_ms: float = 0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        output: str = "",
+    ):
+        self.host = host
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.error_rate = min(1.0, max(0.0, float(error_rate)))
+        self.error_status = int(error_status)
+        self.stats = SinkStats()
+        self._output = open(output, "a") if output else None
+        self._output_lock = threading.Lock()
+        self._random = random.Random()
+        self._http = ThreadingHTTPServer((host, http_port), self._handler_class())
+        self._http.daemon_threads = True
+        self._http_thread = None
+        self._grpc = None
+        self.grpc_port = None
+        if grpc_port is not None:
+            if not GRPC_AVAILABLE:
+                raise RuntimeError(
+                    "gRPC sink requires grpcio. Install with: pip install robotframework-tracer[grpc]"
+                )
+            self._grpc = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+            handler = grpc.method_handlers_generic_handler(
+                _TRACE_SERVICE,
+                {"Export": grpc.unary_unary_rpc_method_handler(self._grpc_export)},
+            )
+            self._grpc.add_generic_rpc_handlers((handler,))
+            self.grpc_port = self._grpc.add_insecure_port(f"{host}:{grpc_port}")
+
+    @property
+    def http_port(self) -> int:
+        return self._http.server_address[1]
+
+    @property
+    def http_endpoint(self) -> str:
+        return f"http://{self.host}:{self.http_port}/v1/traces"
+
+    @property
+    def grpc_endpoint(self) -> str:
+        return f"http://{self.host}:{self.grpc_port}" if self.grpc_port else ""
+
+    def start(self):
+        self.stats = SinkStats()
+        self._http_thread = threading.Thread(
+            target=self._http.serve_forever, name="rf-tracer-sink-http", daemon=True
+        )
+        self._http_thread.start()
+        if self._grpc is not None:
+            self._grpc.start()
+        return self
+
+    def stop(self):
+        self._http.shutdown()
+        self._http.server_close()
+        if self._grpc is not None:
+            self._grpc.stop(grace=1).wait()
+        if self._output is not None:
+            with self._output_lock:
+                self._output.close()
+                self._output = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _inject(self) -> bool:
+        """Apply the configured latency; return True if this request should fail."""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.stats.add(errors_injected=1)
+            return True
+        return False
+
+    def _receive_traces(self, body: bytes, wire_bytes: int):
+        request = ExportTraceServiceRequest.FromString(body)
+        spans = sum(len(ss.spans) for rs in request.resource_spans for ss in rs.scope_spans)
+        self.stats.add(requests=1, spans=spans, bytes=wire_bytes)
+        if self._output is not None:
+            self._write(request)
+
+    def _receive_logs(self, body: bytes, wire_bytes: int):
+        request = ExportLogsServiceRequest.FromString(body)
+        records = sum(len(sl.log_records) for rl in request.resource_logs for sl in rl.scope_logs)
+        self.stats.add(requests=1, log_records=records, bytes=wire_bytes)
+
+    def _write(self, request):
+        from .listener import _OtlpJsonFileExporter
+
+        d = MessageToDict(request, preserving_proto_field_name=True)
+        line = json.dumps(_OtlpJsonFileExporter._fix_byte_ids(d), separators=(",", ":")) + "\n"
+        with self._output_lock:
+            if self._output is not None:
+                self._output.write(line)
+                self._output.flush()
+
+    def _grpc_export(self, body, context):
+        if self._inject():
+            context.abort(grpc.StatusCode.UNAVAILABLE, "injected error")
+        try:
+            self._receive_traces(body, len(body))
+        except Exception:
+            self.stats.add(bad_requests=1)
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "malformed request")
+        return ExportTraceServiceResponse().SerializeToString()
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like a real collector
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.rstrip("/").endswith("/v1/logs"):
+                    receive = sink._receive_logs
+                elif self.path.rstrip("/").endswith("/v1/traces"):
+                    receive = sink._receive_traces
+                else:
+                    self._reply(404)
+                    return
+                if sink._inject():
+                    self._reply(sink.error_status)
+                    return
+                try:
+                    data = body
+                    if self.headers.get("Content-Encoding", "") == "gzip":
+                        data = gzip.decompress(body)
+                    receive(data, len(body))
+                except Exception:
+                    sink.stats.add(bad_requests=1)
+                    self._reply(400)
+                    return
+                self._reply(200)
+
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-protobuf")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass  # Keep the console for the stats report
+
+        return Handler
@@ -0,0 +1,264 @@
+"""Disk-backed spill queue for OTLP export payloads.
+
+Encoded export requests that cannot be sent right away are appended to
+segment files in a spill directory and replayed later, possibly by the next
+run. Each record is a 4-byte big-endian length followed by the payload.
+
+Segment file names start with a millisecond timestamp, so a plain sort
+yields oldest-first order across processes:
+
+    <time_ms>-<pid>-<seq>.open   segment being written by a live process
+    <time_ms>-<pid>-<seq>.seg    sealed segment, ready for replay
+
+Replay claims a segment by renaming it to ``.<pid>.claim`` (atomic, so
+concurrent pabot workers never replay the same segment twice). ``.open``
+and ``.claim`` files of dead processes are picked up as well. When the
+directory exceeds its size cap, the oldest sealed segments are evicted.
+Sizes and record counts of sealed segments are kept in memory (scanned once
+at startup and again when replaying), so appending never stats or reads the
+segment files.
+"""
+
+import glob
+import os
+import struct
+import threading
+import time
+
+DEFAULT_SPILL_MAX_MB = 256
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+
+_HEADER = struct.Struct(">I")
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _owner_pid(path: str) -> int:
+    """PID encoded in a segment file name (``<time_ms>-<pid>-<seq>.*``), 0 if unknown."""
+    try:
+        return int(os.path.basename(path).split("-", 2)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _claimer_pid(path: str) -> int:
+    """PID of the process that claimed a segment (``<name>.<pid>.claim``), 0 if unknown."""
+    try:
+        return int(path.rsplit(".", 2)[-2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def count_records(path: str) -> int:
+    """Count the complete records of a segment file by walking the length headers."""
+    count = 0
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + _HEADER.size <= size:
+            f.seek(offset)
+            (length,) = _HEADER.unpack(f.read(_HEADER.size))
+            offset += _HEADER.size + length
+            if offset > size:
+                break
+            count += 1
+    return count
+
+
+def read_segment(path: str) -> list:
+    """Read all complete records of a segment file. A truncated tail is ignored."""
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        (length,) = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+        if offset + length > len(data):
+            break  # Partially written record (crash while appending)
+        records.append(data[offset : offset + length])
+        offset += length
+    return records
+
+
+class SpillStore:
+    """Append-only segment files with a total size cap and oldest-first eviction."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEFAULT_SPILL_MAX_MB * 1024 * 1024,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max(1, int(max_bytes))
+        # Keep several segments under the cap so eviction stays fine-grained
+        self.segment_bytes = max(1, min(int(segment_bytes), self.max_bytes // 4 or 1))
+        self.evicted = 0  # Records dropped by the size cap
+        self.spilled = 0  # Records appended
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._open_path = None
+        self._open_file = None
+        self._open_size = 0
+        self._open_records = 0
+        self._sealed = {}  # Sealed segment path -> (bytes, records)
+        self._sealed_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan_sealed(self._segments("*.seg"))
+
+    def _new_name(self) -> str:
+        self._seq += 1
+        return f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._seq:06d}"
+
+    def _track(self, path, size, records):
+        self._untrack(path)
+        self._sealed[path] = (size, records)
+        self._sealed_bytes += size
+
+    def _untrack(self, path):
+        entry = self._sealed.pop(path, None)
+        if entry is not None:
+            self._sealed_bytes -= entry[0]
+        return entry
+
+    def _scan_sealed(self, paths):
+        """Sync the sealed-segment bookkeeping with a directory listing."""
+        current = set(paths)
+        for path in [p for p in self._sealed if p not in current]:
+            self._untrack(path)  # Claimed or evicted by another process
+        for path in paths:
+            if path in self._sealed:
+                continue
+            try:
+                self._track(path, os.path.getsize(path), count_records(path))
+            except OSError:
+                continue
+
+    def _seal(self):
+        if self._open_file is None:
+            return
+        self._open_file.close()
+        sealed = self._open_path[: -len(".open")] + ".seg"
+        os.replace(self._open_path, sealed)
+        self._track(sealed, self._open_size, self._open_records)
+        self._open_file = None
+        self._open_path = None
+        self._open_size = 0
+        self._open_records = 0
+
+    def append(self, payload: bytes):
+        """Append one payload, rotating segments and enforcing the size cap."""
+        with self._lock:
+            record_size = _HEADER.size + len(payload)
+            if self._open_file is not None and self._open_size + record_size > self.segment_bytes:
+                self._seal()
+            if self._open_file is None:
+                self._open_path = os.path.join(self.directory, self._new_name() + ".open")
+                self._open_file = open(self._open_path, "ab")
+            self._open_file.write(_HEADER.pack(len(payload)))
+            self._open_file.write(payload)
+            self._open_file.flush()
+            self._open_size += record_size
+            self._open_records += 1
+            self.spilled += 1
+            self._enforce_cap()
+
+    def _segments(self, pattern="*"):
+        return sorted(glob.glob(os.path.join(self.directory, pattern)))
+
+    def _enforce_cap(self):
+        if self._sealed_bytes + self._open_size <= self.max_bytes:
+            return
+        for path in sorted(self._sealed, key=os.path.basename):
+            if self._sealed_bytes + self._open_size <= self.max_bytes:
+                break
+            _, records = self._untrack(path)
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # Claimed by another process meanwhile
+            self.evicted += records
+
+    def claim(self, seal_open: bool = False):
+        """Claim the oldest replayable segment.
+
+        The own open segment is only replayed once it is full (sealed by
+        ``append``) or, with ``seal_open``, when nothing else is pending; the
+        caller passes that once the endpoint is reachable again, so an
+        outage does not produce one segment per spilled record. Returns
+        (claimed_path, records) or None.
+        """
+        with self._lock:
+            candidates = self._segments("*.seg")
+            self._scan_sealed(candidates)
+            # Leftovers of crashed processes: unsealed segments and unfinished claims
+            for path in self._segments("*.open"):
+                if path != self._open_path and not _pid_alive(_owner_pid(path)):
+                    candidates.append(path)
+            for path in self._segments("*.claim"):
+                if not _pid_alive(_claimer_pid(path)):
+                    candidates.append(path)
+            if seal_open and not candidates and self._open_file is not None:
+                sealed = self._open_path[: -len(".open")] + ".seg"
+                self._seal()
+                candidates = [sealed]
+            for path in sorted(candidates, key=os.path.basename):
+                base = os.path.basename(path).split(".", 1)[0]
+                claimed = os.path.join(self.directory, f"{base}.{os.getpid()}.claim")
+                try:
+                    os.replace(path, claimed)
+                except OSError:
+                    self._untrack(path)
+                    continue  # Another process was faster
+                self._untrack(path)
+                try:
+                    return claimed, read_segment(claimed)
+                except OSError:
+                    continue
+            return None
+
+    def done(self, claimed_path: str):
+        """Remove a fully replayed segment."""
+        try:
+            os.remove(claimed_path)
+        except OSError:
+            pass
+
+    def restore(self, claimed_path: str, records: list):
+        """Put back the records of a claimed segment that could not be replayed.
+
+        The segment keeps its original time-ordered name, so it stays first
+        in line for the next replay attempt.
+        """
+        base = os.path.basename(claimed_path).split(".", 1)[0]
+        path = os.path.join(self.directory, f"{base}.seg")
+        if not records:
+            self.done(claimed_path)
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            for payload in records:
+                f.write(_HEADER.pack(len(payload)))
+                f.write(payload)
+        os.replace(tmp, path)
+        with self._lock:
+            self._track(path, os.path.getsize(path), len(records))
+        self.done(claimed_path)
+
+    def pending(self) -> int:
+        """Number of segment files waiting for replay (including the open one)."""
+        return len(self._segments("*.seg")) + len(self._segments("*.open"))
+
+    def close(self):
+        """Seal the open segment so the next run can replay it."""
+        with self._lock:
+            self._seal()
@@ -0,0 +1,299 @@
+"""Duration statistics for keywords, tests and libraries across trace files.
+
+For every keyword (library + keyword name), test (``rf.test.id`` + name)
+and library the statistics are: count, total duration, self time, p50, p90
+and p99 duration and failure rate.
+
+Self time is a span's duration minus the durations of its direct children.
+It is derived from the parent/child ids while streaming: trace files are
+written in span end order, so children usually arrive before their parent
+and only the child time of still-open spans is kept. Files in start order
+(e.g. from ``rf-tracer merge``) are handled too, by remembering recently
+finished spans.
+
+Work is spread across a process pool. Files are the units of work; when
+there are fewer files than workers, files with a sidecar index (index.py)
+are split into ranges of gzip members. Child time that crosses a range
+boundary is settled when the results are combined: each range reports the
+spans that can be parents of spans in other ranges, i.e. spans that started
+before the range's first span ended or ended after its last span started.
+
+Percentiles use NumPy when it is installed (``pip install
+robotframework-tracer[stats]``) and an equivalent pure-Python linear
+interpolation otherwise.
+"""
+
+import array
+import heapq
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .index import load_index
+from .reader import iter_batches, span_attributes
+
+try:
+    import numpy
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+GROUPS = ("keyword", "test", "library")
+PERCENTILES = (50, 90, 99)
+SORT_KEYS = ("total", "self", "count", "p50", "p90", "p99", "failure_rate")
+
+_ATTR_KEYS = (
+    "rf.type",
+    "rf.keyword.name",
+    "rf.keyword.library",
+    "rf.keyword.type",
+    "rf.test.id",
+    "rf.test.name",
+    "rf.suite.name",
+    "rf.status",
+)
+# Finished spans remembered for children that arrive after their parent
+_DONE_CAP = 200_000
+
+# Group record fields
+_COUNT, _TOTAL, _SELF, _FAILED, _DURATIONS = range(5)
+
+
+def percentiles(values, qs=PERCENTILES):
+    """Return linearly interpolated percentiles (NumPy's default method)."""
+    if not len(values):
+        return [0.0 for _ in qs]
+    if NUMPY_AVAILABLE:
+        return [float(v) for v in numpy.percentile(numpy.asarray(values, dtype=float), qs)]
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    result = []
+    for q in qs:
+        pos = last * q / 100.0
+        lo = int(pos)
+        hi = min(lo + 1, last)
+        result.append(ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))
+    return result
+
+
+def span_keys(span, attrs):
+    """Return the (group, *identity) keys a span contributes to."""
+    kind = str(attrs.get("rf.type", "")).upper()
+    if kind == "TEST" or (not kind and "rf.test.name" in attrs):
+        return (("test", str(attrs.get("rf.test.id", "")), attrs.get("rf.test.name", "")),)
+    if kind == "KEYWORD" or (not kind and "rf.keyword.type" in attrs):
+        library = str(attrs.get("rf.keyword.library", ""))
+        name = attrs.get("rf.keyword.name") or span.get("name", "")
+        return (("keyword", library, name), ("library", library))
+    return ()
+
+
+def _is_failed(span, attrs):
+    if "rf.status" in attrs:
+        return attrs["rf.status"] == "FAIL"
+    return span.get("status", {}).get("code") in ("STATUS_CODE_ERROR", 2)
+
+
+class _Accumulator:
+    """Per-unit aggregation with streaming self-time bookkeeping."""
+
+    def __init__(self, boundary=False):
+        self.groups = {}
+        self.spans = 0
+        self.child_ns = {}  # Parent span id -> child time seen before the parent
+        self._done = OrderedDict()  # Span id -> keys, for children seen after the parent
+        self._boundary = boundary
+        self._min_end = None
+        self._max_start = None
+        self._early = []  # (start, span_id, keys) started before the first end so far
+        self._open = []  # Heap of (end, span_id, keys) ending after the latest start
+
+    def add(self, span):
+        self.spans += 1
+        attrs = span_attributes(span, _ATTR_KEYS)
+        start = int(span.get("start_time_unix_nano", 0) or 0)
+        end = int(span.get("end_time_unix_nano", 0) or 0)
+        duration = max(0, end - start)
+        span_id = span.get("span_id", "")
+        keys = span_keys(span, attrs)
+        if keys:
+            self_ns = duration - self.child_ns.pop(span_id, 0)
+            failed = 1 if _is_failed(span, attrs) else 0
+            for key in keys:
+                record = self.groups.get(key)
+                if record is None:
+                    record = self.groups[key] = [0, 0, 0, 0, array.array("d")]
+                record[_COUNT] += 1
+                record[_TOTAL] += duration
+                record[_SELF] += self_ns
+                record[_FAILED] += failed
+                record[_DURATIONS].append(duration / 1e6)
+            self._done[span_id] = keys
+            if len(self._done) > _DONE_CAP:
+                self._done.popitem(last=False)
+        else:
+            self.child_ns.pop(span_id, None)
+
+        parent = span.get("parent_span_id", "")
+        if parent:
+            parent_keys = self._done.get(parent)
+            if parent_keys is not None:
+                self.subtract(parent_keys, duration)
+            else:
+                self.child_ns[parent] = self.child_ns.get(parent, 0) + duration
+        if self._boundary and keys:
+            self._track_boundary(span_id, start, end, keys)
+
+    def subtract(self, keys, child_ns):
+        for key in keys:
+            record = self.groups.get(key)
+            if record is not None:
+                record[_SELF] -= child_ns
+
+    def _track_boundary(self, span_id, start, end, keys):
+        if self._min_end is None or end < self._min_end:
+            self._min_end = end
+        if start <= self._min_end:
+            self._early.append((start, span_id, keys))
+        if self._max_start is None or start > self._max_start:
+            self._max_start = start
+        heapq.heappush(self._open, (end, span_id, keys))
+        while self._open and self._open[0][0] < self._max_start:
+            heapq.heappop(self._open)
+
+    def candidates(self):
+        """Spans of this unit that can be parents of spans in other units."""
+        found = {span_id: keys for _, span_id, keys in self._open}
+        for start, span_id, keys in self._early:
+            if start <= self._min_end:
+                found[span_id] = keys
+        return found
+
+    def result(self):
+        return {
+            "groups": self.groups,
+            "spans": self.spans,
+            "unresolved": self.child_ns,
+            "candidates": self.candidates() if self._boundary else {},
+        }
+
+
+def _unit_spans(path, members):
+    for batch in iter_batches(path, members=members):
+        for rs in batch.get("resource_spans", ()):
+            for ss in rs.get("scope_spans", ()):
+                yield from ss.get("spans", ())
+
+
+def _analyze_unit(unit):
+    path, members = unit
+    acc = _Accumulator(boundary=members is not None)
+    for span in _unit_spans(path, members):
+        acc.add(span)
+    return acc.result()
+
+
+def plan_units(paths, workers):
+    """Split the input into (path, members) work units; members None = whole file."""
+    units = []
+    for path in paths:
+        index = load_index(path) if len(paths) < workers and path.endswith(".gz") else None
+        members = index["members"] if index else []
+        parts = min(workers, len(members))
+        if parts <= 1:
+            units.append((path, None))
+            continue
+        target = sum(m["length"] for m in members) / parts
+        chunk, size = [], 0
+        for member in members:
+            chunk.append(member)
+            size += member["length"]
+            if size >= target:
+                units.append((path, chunk))
+                chunk, size = [], 0
+        if chunk:
+            units.append((path, chunk))
+    return units
+
+
+def _combine(results):
+    groups = {}
+    spans = 0
+    unresolved = {}
+    candidates = {}
+    for result in results:
+        spans += result["spans"]
+        for key, record in result["groups"].items():
+            total = groups.get(key)
+            if total is None:
+                groups[key] = record
+                continue
+            for field in (_COUNT, _TOTAL, _SELF, _FAILED):
+                total[field] += record[field]
+            total[_DURATIONS].extend(record[_DURATIONS])
+        for parent, child_ns in result["unresolved"].items():
+            unresolved[parent] = unresolved.get(parent, 0) + child_ns
+        candidates.update(result["candidates"])
+    # Child time whose parent was analyzed in another unit of the same file
+    for parent, child_ns in unresolved.items():
+        for key in candidates.get(parent, ()):
+            groups[key][_SELF] -= child_ns
+    return groups, spans
+
+
+def _row(key, record):
+    count = record[_COUNT]
+    p50, p90, p99 = percentiles(record[_DURATIONS])
+    if key[0] == "test":
+        name = f"{key[2]} [{key[1]}]" if key[1] else key[2]
+    elif key[0] == "keyword":
+        name = f"{key[1]}.{key[2]}" if key[1] else key[2]
+    else:
+        name = key[1] or "(no library)"
+    return {
+        "name": name,
+        "count": count,
+        "total_ms": record[_TOTAL] / 1e6,
+        "self_ms": max(0, record[_SELF]) / 1e6,
+        "mean_ms": record[_TOTAL] / 1e6 / count if count else 0.0,
+        "p50_ms": p50,
+        "p90_ms": p90,
+        "p99_ms": p99,
+        "failure_rate": record[_FAILED] / count if count else 0.0,
+    }
+
+
+def compute_stats(paths, workers=None, sort="total", top=None):
+    """Compute duration statistics over trace files.
+
+    Args:
+        paths: Trace files (.json or .json.gz).
+        workers: Process pool size. Defaults to the CPU count; 1 runs inline.
+        sort: Row order, one of SORT_KEYS (descending).
+        top: Keep only this many rows per group.
+
+    Returns:
+        Dict with files, spans, units and per-group lists of row dicts.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unsupported sort key: {sort}")
+    paths = list(paths)
+    if not paths:
+        raise ValueError("No input files")
+    workers = max(1, workers or os.cpu_count() or 1)
+    units = plan_units(paths, workers)
+    if workers <= 1 or len(units) <= 1:
+        results = [_analyze_unit(unit) for unit in units]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(units))) as pool:
+            results = list(pool.map(_analyze_unit, units))
+    groups, spans = _combine(results)
+
+    sort_field = sort if sort in ("count", "failure_rate") else f"{sort}_ms"
+    report = {"files": len(paths), "spans": spans, "units": len(units), "numpy": NUMPY_AVAILABLE}
+    for group in GROUPS:
+        rows = [_row(key, record) for key, record in groups.items() if key[0] == group]
+        rows.sort(key=lambda row: row[sort_field], reverse=True)
+        report[group] = rows[:top] if top else rows
+    return report
@@ -0,0 +1,174 @@
+"""Offline transform of existing trace output files.
+
+Streams a ``*_traces.json`` or ``*_traces.json.gz`` file line by line,
+re-applies an output filter (preset name or filter file), drops batches that
+end up empty, and writes the result as json or gz.
+
+Line batches are fanned out to a process pool. Only a small, fixed number of
+batches is in flight at any time, so memory use does not depend on the size
+of the input file. For gz output every batch is compressed by the worker into
+its own gzip member; concatenated members form a valid multi-member gzip file
+(RFC 1952), the same layout the listener produces for pabot runs.
+"""
+
+import gzip
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .fileutil import atomic_path
+from .output_filter import apply_filter, load_filter
+from .reader import open_trace_text
+
+OUTPUT_FORMATS = ("json", "gz")
+
+DEFAULT_BATCH_LINES = 256
+# Batches queued per worker; bounds memory to a few batches per process.
+_IN_FLIGHT_PER_WORKER = 2
+_GZIP_LEVEL = 6
+
+
+def guess_format(path):
+    """Return the output format implied by a file name."""
+    return "gz" if path.endswith(".gz") else "json"
+
+
+def _compact(d):
+    """Drop scope/resource entries left without spans. Returns remaining span count."""
+    total = 0
+    resource_spans = []
+    for rs in d.get("resource_spans", []):
+        scope_spans = [ss for ss in rs.get("scope_spans", []) if ss.get("spans")]
+        if not scope_spans:
+            continue
+        rs["scope_spans"] = scope_spans
+        total += sum(len(ss["spans"]) for ss in scope_spans)
+        resource_spans.append(rs)
+    d["resource_spans"] = resource_spans
+    return total
+
+
+def _count_spans(d):
+    return sum(
+        len(ss.get("spans", []))
+        for rs in d.get("resource_spans", [])
+        for ss in rs.get("scope_spans", [])
+    )
+
+
+def transform_lines(lines, output_filter=None, compress=False):
+    """Transform a batch of trace file lines.
+
+    Args:
+        lines: Raw text lines, each one OTLP JSON ExportTraceServiceRequest.
+        output_filter: Loaded filter config (dict) or None.
+        compress: Return the batch as one gzip member instead of plain JSON.
+
+    Returns:
+        (payload_bytes, stats_dict)
+    """
+    stats = {"lines_in": 0, "lines_out": 0, "spans_in": 0, "spans_out": 0}
+    out = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        stats["lines_in"] += 1
+        d = json.loads(line)
+        stats["spans_in"] += _count_spans(d)
+        d = apply_filter(d, output_filter)
+        remaining = _compact(d)
+        if not remaining:
+            continue
+        stats["lines_out"] += 1
+        stats["spans_out"] += remaining
+        out.append(json.dumps(d, separators=(",", ":")))
+
+    if not out:
+        return b"", stats
+    payload = ("\n".join(out) + "\n").encode("utf-8")
+    if compress:
+        payload = gzip.compress(payload, compresslevel=_GZIP_LEVEL)
+    return payload, stats
+
+
+def _iter_batches(lines, batch_lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_lines:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _merge_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+
+
+def transform_file(
+    src,
+    dst,
+    output_filter="",
+    output_format=None,
+    workers=None,
+    batch_lines=DEFAULT_BATCH_LINES,
+):
+    """Stream ``src`` through the filter/compaction pipeline into ``dst``.
+
+    Args:
+        src: Input trace file (.json or .json.gz).
+        dst: Output path. Written atomically via a temporary file.
+        output_filter: Filter preset name or path to a filter .json file.
+        output_format: "json" or "gz"; inferred from ``dst`` when None.
+        workers: Process pool size. Defaults to the CPU count; 1 runs inline.
+        batch_lines: Number of input lines per unit of work.
+
+    Returns:
+        Dict with lines_in, lines_out, spans_in and spans_out counters.
+    """
+    output_format = (output_format or guess_format(dst)).lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if os.path.abspath(src) == os.path.abspath(dst):
+        raise ValueError("Input and output must be different files")
+
+    filter_cfg = None
+    if output_filter:
+        filter_cfg = load_filter(output_filter)
+        if filter_cfg is None:
+            raise ValueError(f"Could not load output filter: {output_filter}")
+
+    compress = output_format == "gz"
+    workers = workers or os.cpu_count() or 1
+    batch_lines = max(1, int(batch_lines))
+    totals = {"lines_in": 0, "lines_out": 0, "spans_in": 0, "spans_out": 0}
+
+    with atomic_path(dst) as tmp_path, open_trace_text(src) as f_in:
+        with open(tmp_path, "wb") as f_out:
+            batches = _iter_batches(f_in, batch_lines)
+            if workers <= 1:
+                for batch in batches:
+                    payload, stats = transform_lines(batch, filter_cfg, compress)
+                    f_out.write(payload)
+                    _merge_stats(totals, stats)
+            else:
+                max_in_flight = workers * _IN_FLIGHT_PER_WORKER
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    pending = deque()
+                    for batch in batches:
+                        pending.append(pool.submit(transform_lines, batch, filter_cfg, compress))
+                        # Write results in input order; block once the window is full
+                        while len(pending) >= max_in_flight or (pending and pending[0].done()):
+                            payload, stats = pending.popleft().result()
+                            f_out.write(payload)
+                            _merge_stats(totals, stats)
+                    while pending:
+                        payload, stats = pending.popleft().result()
+                        f_out.write(payload)
+                        _merge_stats(totals, stats)
+
+    return totals
@@ -0,0 +1,106 @@
+"""Builders for OTLP JSON spans and trace files, shared by the trace tool tests.
+
+Spans look like the listener's trace output: hex ids, nanosecond times as
+strings and typed attribute values.
+"""
+
+import gzip
+import json
+
+
+def attribute(key, value):
+    """One OTLP JSON attribute; dict values are used as the typed value as-is."""
+    if isinstance(value, dict):
+        typed = value
+    elif isinstance(value, bool):
+        typed = {"bool_value": value}
+    elif isinstance(value, int):
+        typed = {"int_value": str(value)}
+    elif isinstance(value, float):
+        typed = {"double_value": value}
+    else:
+        typed = {"string_value": value}
+    return {"key": key, "value": typed}
+
+
+def span(
+    span_id,
+    kind=None,
+    name=None,
+    parent="",
+    start=0,
+    end=None,
+    trace_id="t" * 32,
+    events=None,
+    **attrs,
+):
+    """An OTLP JSON span with ``rf.type`` ``kind`` and the given attributes.
+
+    Attribute keywords without a dot have underscores turned into dots
+    (``rf_test_id`` -> ``rf.test.id``); dotted keys can be passed with ``**``.
+    ``end`` defaults to ``start + 10``; a root span has no ``parent_span_id``.
+    """
+    attributes = [attribute("rf.type", kind)] if kind else []
+    for key, value in attrs.items():
+        attributes.append(attribute(key if "." in key else key.replace("_", "."), value))
+    result = {
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "name": name or span_id,
+        "kind": "SPAN_KIND_INTERNAL",
+        "start_time_unix_nano": str(start),
+        "end_time_unix_nano": str(start + 10 if end is None else end),
+        "attributes": attributes,
+    }
+    if parent:
+        result["parent_span_id"] = parent
+    if events is not None:
+        result["events"] = events
+    return result
+
+
+def batch(*spans, service=None, scope=None):
+    """One exported batch (a trace file line) holding ``spans``."""
+    resource = {"attributes": [attribute("service.name", service)]} if service else {}
+    scope_spans = {"spans": list(spans)}
+    if scope:
+        scope_spans = {"scope": {"name": scope}, **scope_spans}
+    return {"resource_spans": [{"resource": resource, "scope_spans": [scope_spans]}]}
+
+
+def line(*spans, **kwargs):
+    """A batch as one JSON line, without the newline."""
+    return json.dumps(batch(*spans, **kwargs), separators=(",", ":"))
+
+
+def write_trace_file(path, lines, gz=False):
+    """Write batches (dicts or JSON strings) one per line; ``gz`` as one gzip member."""
+    text = "".join(
+        (entry if isinstance(entry, str) else json.dumps(entry, separators=(",", ":"))) + "\n"
+        for entry in lines
+    )
+    if gz:
+        path.write_bytes(gzip.compress(text.encode()))
+    else:
+        path.write_text(text)
+    return str(path)
+
+
+def write_spans(path, spans, per_line=1, gz=False):
+    """Write ``spans`` as a trace file with ``per_line`` spans per batch."""
+    batches = [batch(*spans[i : i + per_line]) for i in range(0, len(spans), per_line)]
+    return write_trace_file(path, batches, gz)
+
+
+def read_spans(path):
+    """All spans of a json or gz trace file, in file order."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return [
+            s
+            for text in f
+            if text.strip()
+            for rs in json.loads(text)["resource_spans"]
+            for ss in rs["scope_spans"]
+            for s in ss["spans"]
+        ]
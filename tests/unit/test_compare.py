@@ -0,0 +1,134 @@
+"""Tests for run-to-run duration comparison."""
+
+import json
+
+from otlp_builders import span, write_spans
+
+from robotframework_tracer.cli import main
+from robotframework_tracer.compare import collect_samples, compare_files, compare_samples
+
+
+def _run(login_ms=100, sleep_ms=10):
+    """One suite run in export (end) order; durations in milliseconds."""
+    ms = 1_000_000
+    spans = [
+        span("k0", "KEYWORD", "Setup", parent="s1", start=0, end=5 * ms, rf_keyword_name="Setup"),
+    ]
+    t = 10 * ms
+    for i in range(3):  # Keyword called in a loop: three samples of one identity
+        spans.append(
+            span(
+                f"k1{i}",
+                "KEYWORD",
+                "Sleep",
+                parent="k1",
+                start=t,
+                end=t + sleep_ms * ms,
+                rf_keyword_name="Sleep",
+            )
+        )
+        t += sleep_ms * ms
+    spans.append(
+        span("k1", "KEYWORD", "Outer", parent="t1", start=10 * ms, end=t, rf_keyword_name="Outer")
+    )
+    spans.append(span("t1", "TEST", "Fast", parent="s1", start=10 * ms, end=t, rf_test_id="s1-t1"))
+    spans.append(span("k2", "KEYWORD", "Login", parent="t2", start=t, end=t + login_ms * ms))
+    spans.append(
+        span("t2", "TEST", "Slow", parent="s1", start=t, end=t + login_ms * ms, rf_test_id="s1-t2")
+    )
+    spans.append(span("s1", "SUITE", "Suite", start=0, end=t + login_ms * ms, rf_suite_id="s1"))
+    return spans
+
+
+def test_identities_resolved_in_end_and_start_order(tmp_path):
+    spans = _run()
+    end_ordered, _ = collect_samples(write_spans(tmp_path / "end.json", spans))
+    start_ordered, count = collect_samples(write_spans(tmp_path / "start.json", spans[::-1]))
+    assert count == len(spans)
+    assert end_ordered.keys() == start_ordered.keys()
+    assert set(end_ordered) == {
+        ("keyword", "suite:Suite [s1]", "Setup"),
+        ("keyword", "Fast [s1-t1]", "Outer"),
+        ("keyword", "Fast [s1-t1]", "Outer/Sleep"),
+        ("keyword", "Slow [s1-t2]", "Login"),
+        ("test", "Fast [s1-t1]", ""),
+        ("test", "Slow [s1-t2]", ""),
+    }
+    assert list(end_ordered[("keyword", "Fast [s1-t1]", "Outer/Sleep")]) == [10.0, 10.0, 10.0]
+
+
+def _worker(suite, test, login_ms):
+    """One pabot worker's suite; every worker numbers its suite s1."""
+    ms = 1_000_000
+    return [
+        span(f"{suite}k", "KEYWORD", "Login", parent=f"{suite}t", start=0, end=login_ms * ms),
+        span(
+            f"{suite}t",
+            "TEST",
+            test,
+            parent=f"{suite}s",
+            start=0,
+            end=login_ms * ms,
+            rf_test_id="s1-t1",
+        ),
+        span(f"{suite}s", "SUITE", suite, start=0, end=login_ms * ms, rf_suite_id="s1"),
+    ]
+
+
+def test_same_test_id_from_two_workers_stays_apart(tmp_path):
+    baseline = write_spans(
+        tmp_path / "base.json", _worker("A", "Checkout", 100) + _worker("B", "Search", 100)
+    )
+    candidate = write_spans(
+        tmp_path / "cand.json", _worker("A", "Checkout", 100) + _worker("B", "Search", 500)
+    )
+    samples, _ = collect_samples(baseline)
+    assert list(samples[("test", "Checkout [s1-t1]", "")]) == [100.0]
+    assert list(samples[("test", "Search [s1-t1]", "")]) == [100.0]
+    report = compare_files(baseline, candidate, workers=1)
+    assert [row["id"] for row in report["regressions"]] == [
+        "Search [s1-t1]",
+        "Search [s1-t1] :: Login",
+    ]
+
+
+def test_regression_needs_percent_and_absolute_delta():
+    baseline = {("test", "a", ""): [1000.0], ("test", "b", ""): [10.0], ("test", "c", ""): [500.0]}
+    candidate = {("test", "a", ""): [1500.0], ("test", "b", ""): [30.0], ("test", "d", ""): [1.0]}
+    regressions, improvements, compared, new, missing = compare_samples(baseline, candidate)
+    # b tripled but only by 20 ms
+    assert [row["id"] for row in regressions] == ["a"]
+    assert regressions[0]["ratio"] == 1.5
+    assert regressions[0]["z"] is None
+    assert improvements == []
+    assert compared == 2
+    assert new == ["d"]
+    assert missing == ["c"]
+
+
+def test_noisy_samples_are_not_flagged():
+    base = [100.0, 400.0, 150.0, 380.0, 120.0]
+    noisy = {("keyword", "t", "Kw"): [v + 120.0 for v in base]}
+    stable = {("keyword", "t", "Kw"): [300.0, 305.0, 298.0, 302.0, 301.0]}
+    baseline = {("keyword", "t", "Kw"): base}
+    assert compare_samples(baseline, noisy)[0] == []
+    tight = {("keyword", "t", "Kw"): [150.0, 152.0, 149.0, 151.0, 150.0]}
+    (row,) = compare_samples(tight, stable)[0]
+    assert row["z"] > 3
+    assert compare_samples(stable, tight)[1][0]["id"] == "t :: Kw"
+
+
+def test_compare_files_and_cli_exit_code(tmp_path, capsys):
+    baseline = write_spans(tmp_path / "base.json.gz", _run(), gz=True)
+    candidate = write_spans(tmp_path / "cand.json.gz", _run(login_ms=400), gz=True)
+    report = compare_files(baseline, candidate, workers=1)
+    assert [row["id"] for row in report["regressions"]] == ["Slow [s1-t2]", "Slow [s1-t2] :: Login"]
+    assert report["summary"]["compared"] == 6
+
+    out = tmp_path / "report.json"
+    assert main(["compare", baseline, candidate, "--json", str(out), "--workers", "1"]) == 1
+    assert "2 regressions" in capsys.readouterr().out
+    assert json.loads(out.read_text())["summary"]["regressions"] == 2
+    assert main(["compare", baseline, candidate, "--report-only", "--kinds", "test"]) == 0
+    assert main(["compare", baseline, baseline, "--workers", "1"]) == 0
+    assert main(["compare", baseline, candidate, "--kinds", "suite"]) == 2
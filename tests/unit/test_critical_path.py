@@ -0,0 +1,159 @@
+"""Tests for critical-path and self-time analysis."""
+
+import json
+
+from otlp_builders import span, write_spans
+
+from robotframework_tracer.cli import main
+from robotframework_tracer.critical_path import analyze, analyze_file, load_tree
+from robotframework_tracer.reader import iter_span_records
+
+MS = 1_000_000
+
+
+def _suite(prefix="", parent="", offset=0, slow=50):
+    """Suite with setup, two tests and teardown, in export (end) order."""
+    o = offset
+    p = prefix
+    return [
+        span(
+            f"{p}su",
+            "KEYWORD",
+            "Open",
+            parent=f"{p}s",
+            start=(o + 0) * MS,
+            end=(o + 10) * MS,
+            rf_keyword_type="SETUP",
+        ),
+        span(
+            f"{p}k1",
+            "KEYWORD",
+            "Login",
+            parent=f"{p}t1",
+            start=(o + 12) * MS,
+            end=(o + 12 + slow) * MS,
+        ),
+        span(
+            f"{p}t1",
+            "TEST",
+            "T1",
+            parent=f"{p}s",
+            start=(o + 11) * MS,
+            end=(o + 13 + slow) * MS,
+            rf_test_id=f"{p}s1-t1",
+        ),
+        span(f"{p}k2", "KEYWORD", "Login", parent=f"{p}t2", start=(o + 70) * MS, end=(o + 80) * MS),
+        span(f"{p}k3", "KEYWORD", "Check", parent=f"{p}t2", start=(o + 80) * MS, end=(o + 90) * MS),
+        span(
+            f"{p}t2",
+            "TEST",
+            "T2",
+            parent=f"{p}s",
+            start=(o + 70) * MS,
+            end=(o + 90) * MS,
+            rf_test_id=f"{p}s1-t2",
+        ),
+        span(
+            f"{p}td",
+            "KEYWORD",
+            "Close",
+            parent=f"{p}s",
+            start=(o + 90) * MS,
+            end=(o + 95) * MS,
+            rf_keyword_type="TEARDOWN",
+        ),
+        span(f"{p}s", "SUITE", f"Suite {p}", parent=parent, start=(o + 0) * MS, end=(o + 100) * MS),
+    ]
+
+
+def test_sequential_suite_self_time_and_critical_path(tmp_path):
+    tree = load_tree(write_spans(tmp_path / "traces.json", _suite()))
+    report, self_ns, critical, on_path = analyze(tree)
+
+    assert all(on_path)
+    assert sum(critical) == 100 * MS
+    assert self_ns[tree.index["t2"]] == 0
+    assert self_ns[tree.index["s"]] == (100 - 10 - 52 - 20 - 5) * MS
+    (root,) = report["roots"]
+    assert root["wall_ms"] == 100.0
+    assert root["setup_teardown_ms"] == 15.0
+    assert [step["name"] for step in root["path"]] == ["Suite ", "Open", "T1", "T2", "Close"]
+    login = report["keywords"][0]
+    assert login["name"] == "Login"
+    assert login["count"] == 2
+    assert login["critical_ms"] == 60.0
+    assert login["critical_share"] == 0.6
+    assert [(t["id"], t["critical_ms"]) for t in report["tests"]] == [
+        ("s1-t1", 52.0),
+        ("s1-t2", 20.0),
+    ]
+
+
+def test_parallel_suites_follow_the_longest_chain(tmp_path):
+    # Two pabot suites under a merged run root: A runs within B's time
+    spans = [
+        span("ak1", "KEYWORD", "Fast", parent="a", start=20 * MS, end=50 * MS),
+        span("a", "SUITE", "Suite A", parent="run", start=10 * MS, end=60 * MS),
+        *_suite("b", "run", 5),
+        span("run", "SUITE", "Run", start=0 * MS, end=110 * MS),
+    ]
+    tree = load_tree(write_spans(tmp_path / "traces.json.gz", spans, gz=True))
+    report, self_ns, critical, on_path = analyze(tree)
+
+    assert sum(critical) == 110 * MS
+    assert not on_path[tree.index["a"]]
+    assert not on_path[tree.index["ak1"]]
+    assert on_path[tree.index["bk1"]]
+    # Time outside suite B is the run root's own time; its self time is clipped at 0
+    assert critical[tree.index["run"]] == 10 * MS
+    assert self_ns[tree.index["run"]] == 0
+    # Off-path keywords rank last however long they run
+    fast = report["keywords"][-1]
+    assert (fast["name"], fast["self_ms"], fast["critical_ms"]) == ("Fast", 30.0, 0.0)
+
+
+def test_deep_tree_is_walked_without_recursion(tmp_path):
+    depth = 20_000
+    spans = [span("s", "SUITE", "Suite", start=0 * MS, end=(2 * depth + 2) * MS)]
+    parent = "s"
+    for i in range(depth):
+        spans.append(
+            span(
+                f"k{i}",
+                "KEYWORD",
+                "Nested",
+                parent=parent,
+                start=(i + 1) * MS,
+                end=(2 * depth + 1 - i) * MS,
+            )
+        )
+        parent = f"k{i}"
+    report = analyze_file(write_spans(tmp_path / "deep.json", spans), top=5)
+    assert report["spans"] == depth + 1
+    assert report["keywords"][0]["count"] == depth
+    assert report["keywords"][0]["critical_ms"] == 2 * depth
+
+
+def test_annotated_output_and_cli(tmp_path, capsys):
+    src = write_spans(tmp_path / "traces.json", _suite())
+    out = str(tmp_path / "annotated.json.gz")
+    report_path = tmp_path / "critical.json"
+    assert main(["critical-path", src, "--output", out, "--json", str(report_path)]) == 0
+    printed = capsys.readouterr().out
+    assert "SUITE Suite : wall 0.10 s" in printed
+    assert json.loads(report_path.read_text())["wall_ms"] == 100.0
+
+    records = {
+        r.span_id: r.attributes
+        for r in iter_span_records(
+            out, attributes=["rf.self_time_ms", "rf.critical_time_ms", "rf.critical_path"]
+        )
+    }
+    assert len(records) == 8
+    assert records["k1"] == {
+        "rf.self_time_ms": 50.0,
+        "rf.critical_time_ms": 50.0,
+        "rf.critical_path": True,
+    }
+    assert not list(tmp_path.glob("*.tmp"))
+    assert main(["critical-path", str(tmp_path / "missing.json")]) == 2
@@ -0,0 +1,414 @@
+"""Tests for the queued OTLP span exporter."""
+
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+
+from robotframework_tracer.exporters import (
+    EndpointQueue,
+    ExportConfig,
+    FanoutSpanExporter,
+    GrpcSender,
+    HttpSender,
+    OtlpSpanExporter,
+    create_span_exporter,
+    endpoint_key,
+    parse_headers,
+)
+from robotframework_tracer.spill import SpillStore
+
+
+class FakeSender:
+    """Records payloads; fails while ``down`` is set."""
+
+    def __init__(self, down=False, retryable=True):
+        self.down = down
+        self.retryable = retryable
+        self.payloads = []
+        self.attempts = 0
+        self.lock = threading.Lock()
+
+    def send(self, payload):
+        with self.lock:
+            self.attempts += 1
+            if self.down:
+                return False, self.retryable
+            self.payloads.append(payload)
+            return True, False
+
+    def close(self):
+        pass
+
+
+def _spans(n=1):
+    provider = TracerProvider()
+    collected = []
+
+    class _Collector(SpanExporter):
+        def export(self, batch):
+            collected.extend(batch)
+            return SpanExportResult.SUCCESS
+
+    provider.add_span_processor(SimpleSpanProcessor(_Collector()))
+    tracer = provider.get_tracer("test")
+    for i in range(n):
+        tracer.start_span(f"span{i}").end()
+    return collected
+
+
+def _config(**kwargs):
+    kwargs.setdefault("retry_attempts", 1)
+    kwargs.setdefault("retry_backoff_max_sec", 0)
+    return ExportConfig(**kwargs)
+
+
+def test_export_config_defaults_and_from_dict():
+    cfg = ExportConfig()
+    assert cfg.spill is False
+    assert cfg.spill_dir == ".rf-tracer-spill"
+    assert cfg.compression == "gzip"
+    cfg = ExportConfig.from_dict({"spill": True, "queue_high_water": 0, "compression": "zstd"})
+    assert cfg.spill is True
+    assert cfg.queue_high_water == 1
+    assert cfg.compression == "gzip"
+
+
+def test_sdk_exporter_environment_is_honoured(monkeypatch, tmp_path):
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_HEADERS", "x-generic=1")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_TRACES_HEADERS", "x-traces=2")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_CERTIFICATE", str(tmp_path / "ca.pem"))
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_TRACES_CLIENT_CERTIFICATE", "client.pem")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_TRACES_CLIENT_KEY", "client.key")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_TRACES_TIMEOUT", "3")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_COMPRESSION", "none")
+
+    sender = HttpSender("http://collector:4318/v1/traces")
+    try:
+        # The signal-specific variable wins, as in the SDK exporters
+        assert sender._session.headers["x-traces"] == "2"
+        assert "x-generic" not in sender._session.headers
+        assert sender._session.verify == str(tmp_path / "ca.pem")
+        assert sender._session.cert == ("client.pem", "client.key")
+    finally:
+        sender.close()
+    cfg = ExportConfig.from_dict({"spill": True})
+    assert (cfg.timeout_sec, cfg.compression) == (3.0, "none")
+    # Explicit export settings take precedence over the environment
+    cfg = ExportConfig.from_dict({"timeout_sec": 7, "compression": "gzip"})
+    assert (cfg.timeout_sec, cfg.compression) == (7.0, "gzip")
+
+
+def test_parse_headers_and_endpoint_key():
+    assert parse_headers("Api-Key=abc%3D,x=1") == {"api-key": "abc=", "x": "1"}
+    key = endpoint_key("http://collector:4318/v1/traces")
+    assert key.startswith("http_collector_4318_v1_traces_")
+    assert "/" not in key
+
+
+def test_exporter_encodes_once_and_delivers():
+    sender = FakeSender()
+    queue = EndpointQueue(sender, _config())
+    exporter = OtlpSpanExporter(queue, compression="none")
+
+    assert exporter.export(_spans(3)) == SpanExportResult.SUCCESS
+    assert exporter.force_flush(5000)
+    exporter.shutdown()
+
+    request = ExportTraceServiceRequest.FromString(sender.payloads[0][1:])
+    assert len(request.resource_spans[0].scope_spans[0].spans) == 3
+    assert queue.stats["sent"] == 1
+
+
+def test_fanout_encodes_once_for_all_endpoints(monkeypatch):
+    import robotframework_tracer.exporters as exporters
+
+    calls = []
+    real_encode = exporters.encode_spans
+    monkeypatch.setattr(
+        exporters, "encode_spans", lambda spans: calls.append(1) or real_encode(spans)
+    )
+    senders = [FakeSender(), FakeSender(), FakeSender(down=True)]
+    queues = [EndpointQueue(sender, _config()) for sender in senders]
+    exporter = FanoutSpanExporter(queues, compression="none")
+
+    assert exporter.export(_spans(2)) == SpanExportResult.SUCCESS
+    exporter.force_flush(5000)
+    exporter.shutdown()
+
+    assert len(calls) == 1
+    # Healthy endpoints get identical bytes; the failing one does not hold them up
+    assert senders[0].payloads == senders[1].payloads
+    assert len(senders[0].payloads) == 1
+    assert queues[2].stats["failed"] == 1
+    assert queues[2].stats["dropped"] == 1
+
+
+def test_fanout_compresses_once_for_http_senders():
+    http = HttpSender("http://127.0.0.1:1/v1/traces")
+    queues = [EndpointQueue(http, _config()), EndpointQueue(FakeSender(), _config())]
+    exporter = FanoutSpanExporter(queues)
+    raw, gzipped = exporter._payloads(encode_spans(_spans()).SerializeToString())
+    for queue in queues:
+        queue.shutdown(0.1)
+
+    assert raw[:1] == b"r"
+    assert gzip.decompress(gzipped[1:]) == raw[1:]
+
+
+def test_fanout_counts_spans_when_sent_not_queued():
+    gate = threading.Event()
+
+    class GatedSender(FakeSender):
+        def send(self, payload):
+            gate.wait(5)
+            return super().send(payload)
+
+    queues = [EndpointQueue(GatedSender(), _config()), EndpointQueue(FakeSender(), _config())]
+    exporter = FanoutSpanExporter(queues, compression="none")
+    assert exporter.export(_spans(3)) == SpanExportResult.SUCCESS
+    # Queued is not delivered: the slowest endpoint sets the count
+    assert exporter.delivered_spans == 0
+    gate.set()
+    exporter.force_flush(5000)
+    exporter.shutdown()
+    assert exporter.delivered_spans == 3
+
+
+def test_fanout_spill_writes_spans_to_every_store(tmp_path):
+    stores = [SpillStore(str(tmp_path / "a")), SpillStore(str(tmp_path / "b"))]
+    queues = [EndpointQueue(FakeSender(down=True), _config(), store) for store in stores]
+    exporter = FanoutSpanExporter(queues, compression="none")
+    for queue in queues:
+        queue.shutdown(0.1)
+
+    assert exporter.spill(_spans(2))
+    for store in stores:
+        assert store.pending() == 1
+    queue = EndpointQueue(FakeSender(), _config())
+    assert not FanoutSpanExporter([queue]).spill(_spans())
+    queue.shutdown(0.1)
+
+
+def test_grpc_sender_maps_compression(monkeypatch):
+    grpc = pytest.importorskip("grpc")
+    sent = []
+    for compression, expected in (
+        ("gzip", grpc.Compression.Gzip),
+        ("none", grpc.Compression.NoCompression),
+    ):
+        sender = GrpcSender("http://127.0.0.1:1", compression=compression)
+        monkeypatch.setattr(sender, "_export", lambda body, **kwargs: sent.append(kwargs))
+        assert sender.send(b"r" + b"body") == (True, False)
+        assert sent[-1]["compression"] == expected
+        # A corrupt gzip payload is dropped instead of raising
+        assert sender.send(b"g" + b"not gzip") == (False, False)
+        sender.close()
+
+
+def test_failed_export_is_spilled_and_replayed(tmp_path):
+    sender = FakeSender(down=True)
+    store = SpillStore(str(tmp_path))
+    queue = EndpointQueue(sender, _config(), store)
+    OtlpSpanExporter(queue).export(_spans())
+    queue.flush(5)
+    assert queue.stats["spilled"] == 1
+    assert queue.stats["failed"] == 1
+    assert queue.stats["latency_ms_max"] >= 0
+
+    # Still down: the open segment is not sealed, so nothing is replayed yet
+    queue._replay_wakeup.set()
+    threading.Event().wait(0.2)
+    assert sender.attempts == 1
+    assert len(list(tmp_path.glob("*.open"))) == 1
+
+    # The next live export shows the endpoint is back and triggers the replay
+    sender.down = False
+    OtlpSpanExporter(queue).export(_spans())
+    for _ in range(100):
+        if len(sender.payloads) == 2:
+            break
+        threading.Event().wait(0.05)
+    queue.shutdown(1)
+    assert len(sender.payloads) == 2
+    assert queue.stats["replayed"] == 1
+
+
+def test_replay_survives_sender_errors(tmp_path):
+    previous = SpillStore(str(tmp_path))
+    previous.append(b"g" + b"not gzip")
+    previous.append(b"r" + b"ok")
+    previous.close()
+
+    class BrokenSender(FakeSender):
+        def send(self, payload):
+            if payload[:1] == b"g":
+                raise OSError("corrupt payload")
+            return super().send(payload)
+
+    sender = BrokenSender()
+    queue = EndpointQueue(sender, _config(), SpillStore(str(tmp_path)))
+    for _ in range(100):
+        if sender.payloads:
+            break
+        threading.Event().wait(0.05)
+    assert sender.payloads == [b"r" + b"ok"]
+    assert queue._replayer.is_alive()
+    queue.shutdown(1)
+    assert not list(tmp_path.glob("*.claim"))
+    assert queue.store.pending() == 0
+
+
+def test_queue_over_high_water_spills(tmp_path):
+    gate = threading.Event()
+
+    class SlowSender(FakeSender):
+        def send(self, payload):
+            gate.wait(5)
+            return super().send(payload)
+
+    sender = SlowSender()
+    queue = EndpointQueue(sender, _config(queue_high_water=1), SpillStore(str(tmp_path)))
+    for i in range(5):
+        queue.submit(b"r" + bytes([i]))
+    assert queue.stats["spilled"] >= 3
+    gate.set()
+    queue.shutdown(2)
+
+
+def test_leftovers_spilled_at_shutdown_and_replayed_next_run(tmp_path):
+    sender = FakeSender(down=True)
+    cfg = _config(spill=True, spill_dir=str(tmp_path))
+    exporter = create_span_exporter("http://collector:4318/v1/traces", "http", cfg)
+    exporter.queue.sender = sender
+    exporter.export(_spans())
+    exporter.shutdown()
+    assert exporter.queue.stats["spilled"] == 1
+
+    # Next run: a new exporter for the same endpoint replays the spill
+    sender2 = FakeSender()
+    store = SpillStore(str(tmp_path / endpoint_key("http://collector:4318/v1/traces")))
+    queue2 = EndpointQueue(sender2, cfg, store)
+    for _ in range(100):
+        if sender2.payloads:
+            break
+        threading.Event().wait(0.05)
+    queue2.shutdown(1)
+    assert len(sender2.payloads) == 1
+
+
+def test_without_spill_full_queue_drops_after_timeout():
+    gate = threading.Event()
+
+    class BlockedSender(FakeSender):
+        def send(self, payload):
+            gate.wait(5)
+            return super().send(payload)
+
+    queue = EndpointQueue(BlockedSender(), _config(queue_high_water=1, timeout_sec=0.1))
+    for i in range(3):
+        queue.submit(b"r" + bytes([i]))
+    assert queue.stats["dropped"] >= 1
+    gate.set()
+    queue.shutdown(2)
+
+
+def test_max_in_flight_sends_concurrently():
+    gate = threading.Event()
+    started = threading.Semaphore(0)
+
+    class SlowSender(FakeSender):
+        def send(self, payload):
+            started.release()
+            gate.wait(5)
+            return super().send(payload)
+
+    queue = EndpointQueue(SlowSender(), _config(max_in_flight=3))
+    for i in range(3):
+        queue.submit(b"r" + bytes([i]))
+    for _ in range(3):
+        assert started.acquire(timeout=5)
+    assert queue.in_flight == 3
+    gate.set()
+    assert queue.flush(5)
+    queue.shutdown(1)
+    assert queue.stats["sent"] == 3
+    assert queue.stats["max_in_flight"] == 3
+    assert "in-flight max 3/3" in queue.summary()
+
+
+def test_retry_is_requeued_without_blocking_others():
+    class FlakySender(FakeSender):
+        def send(self, payload):
+            if payload == b"r0" and not self.attempts:
+                self.attempts += 1
+                return False, True
+            return super().send(payload)
+
+    sender = FlakySender()
+    queue = EndpointQueue(sender, _config(retry_attempts=2))
+    queue.submit(b"r0")
+    queue.submit(b"r1")
+    assert queue.flush(5)
+    queue.shutdown(1)
+
+    # r1 went out while r0 was backing off
+    assert sender.payloads == [b"r1", b"r0"]
+    assert queue.stats["retried"] == 1
+    assert queue.stats["sent"] == 2
+
+
+def test_http_sender_posts_gzip_protobuf():
+    received = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received["encoding"] = self.headers.get("Content-Encoding")
+            received["type"] = self.headers.get("Content-Type")
+            received["body"] = gzip.decompress(body)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.handle_request, daemon=True)
+    thread.start()
+    sender = HttpSender(f"http://127.0.0.1:{server.server_port}/v1/traces", timeout_sec=5)
+    ok, _ = sender.send(b"g" + gzip.compress(b"payload"))
+    thread.join(5)
+    server.server_close()
+    sender.close()
+
+    assert ok
+    assert received == {
+        "encoding": "gzip",
+        "type": "application/x-protobuf",
+        "body": b"payload",
+    }
+
+
+def test_http_sender_reports_retryable_status():
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(503)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.handle_request, daemon=True)
+    thread.start()
+    sender = HttpSender(f"http://127.0.0.1:{server.server_port}/v1/traces", timeout_sec=5)
+    assert sender.send(b"rx") == (False, True)
+    thread.join(5)
+    server.server_close()
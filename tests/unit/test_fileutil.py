@@ -0,0 +1,27 @@
+"""Tests for the shared file helpers."""
+
+import pytest
+
+from robotframework_tracer.fileutil import atomic_path
+
+
+def _write_then_fail(dst):
+    with atomic_path(dst) as tmp:
+        with open(tmp, "w") as f:
+            f.write("partial")
+        raise RuntimeError("boom")
+
+
+def test_atomic_path_replaces_only_on_success(tmp_path):
+    dst = tmp_path / "out.json"
+    dst.write_text("old")
+    with pytest.raises(RuntimeError):
+        _write_then_fail(str(dst))
+    assert dst.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.json"]
+
+    with atomic_path(str(dst)) as tmp:
+        with open(tmp, "w") as f:
+            f.write("new")
+    assert dst.read_text() == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.json"]
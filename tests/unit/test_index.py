@@ -0,0 +1,136 @@
+"""Tests for the sidecar member index of trace files."""
+
+import gzip
+
+from otlp_builders import line, span, write_trace_file
+
+from robotframework_tracer.cli import main
+from robotframework_tracer.index import (
+    append_indexed,
+    build_index,
+    index_path,
+    iter_lines,
+    load_index,
+    read_test_spans,
+    select_members,
+)
+
+
+def _worker_lines():
+    # Export order: keywords end before their test, tests before the suite
+    return [
+        line(
+            span("k1", "KEYWORD", parent="t1", start=110),
+            span("k2", "KEYWORD", parent="k1", start=120),
+        ),
+        line(span("t1", "TEST", parent="s1", start=100, rf_test_id="s1-t1", rf_status="PASS")),
+        line(span("k3", "KEYWORD", parent="t2", start=210)),
+        line(span("t2", "TEST", parent="s1", start=200, rf_test_id="s1-t2", rf_status="FAIL")),
+        line(span("s1", "SUITE", start=50)),
+    ]
+
+
+def test_append_indexed_writes_members_and_sidecar(tmp_path):
+    dst = str(tmp_path / "traces.json.gz")
+    # Tiny members: one line each
+    append_indexed(write_trace_file(tmp_path / "worker.tmp", _worker_lines()), dst, member_bytes=1)
+
+    index = load_index(dst)
+    assert index is not None
+    assert len(index["members"]) == 5
+    # Keyword members are attributed to the test exported later
+    assert [m["test_ids"] for m in index["members"]] == [
+        ["s1-t1"],
+        ["s1-t1"],
+        ["s1-t2"],
+        ["s1-t2"],
+        [],
+    ]
+    summary = index["summary"]
+    assert summary["spans"] == 6
+    assert summary["tests"] == 2
+    assert summary["failed_tests"] == 1
+    assert summary["start"] == 50
+    assert summary["trace_ids"] == ["t" * 32]
+    # The file is still a plain multi-member gzip file
+    with gzip.open(dst, "rt") as f:
+        assert len(f.readlines()) == 5
+
+
+def test_index_seeks_to_relevant_members(tmp_path):
+    dst = str(tmp_path / "traces.json.gz")
+    append_indexed(write_trace_file(tmp_path / "worker.tmp", _worker_lines()), dst, member_bytes=1)
+    index = load_index(dst)
+
+    assert [m["offset"] for m in select_members(index, test_id="s1-t2")] == [
+        index["members"][2]["offset"],
+        index["members"][3]["offset"],
+    ]
+    assert len(list(iter_lines(dst, test_id="s1-t2"))) == 2
+    assert [s["span_id"] for s in read_test_spans(dst, "s1-t1")] == ["t1", "k1", "k2"]
+
+
+def test_second_worker_extends_index(tmp_path):
+    dst = str(tmp_path / "traces.json.gz")
+    append_indexed(write_trace_file(tmp_path / "worker.tmp", _worker_lines()), dst)
+    other = [
+        line(
+            span(
+                "t9",
+                "TEST",
+                parent="s9",
+                start=900,
+                trace_id="u" * 32,
+                rf_test_id="s2-t1",
+                rf_status="PASS",
+            )
+        )
+    ]
+    append_indexed(write_trace_file(tmp_path / "other.tmp", other), dst)
+
+    index = load_index(dst)
+    assert len(index["members"]) == 2
+    assert index["summary"]["tests"] == 3
+    assert index["summary"]["trace_ids"] == ["t" * 32, "u" * 32]
+    assert [s["span_id"] for s in read_test_spans(dst, "s2-t1")] == ["t9"]
+
+
+def test_stale_index_is_ignored_and_rebuilt(tmp_path):
+    dst = str(tmp_path / "traces.json.gz")
+    append_indexed(write_trace_file(tmp_path / "worker.tmp", _worker_lines()), dst, member_bytes=1)
+    expected = load_index(dst)
+    with open(dst, "ab") as f:
+        f.write(gzip.compress((line(span("x", "KEYWORD", start=5)) + "\n").encode()))
+
+    assert load_index(dst) is None
+    # Without an index every line is read
+    assert len(list(iter_lines(dst, test_id="s1-t1"))) == 6
+    rebuilt = build_index(dst)
+    assert rebuilt["members"][:5] == expected["members"]
+    assert len(rebuilt["members"]) == 6
+    assert load_index(dst) == rebuilt
+
+
+def test_build_index_for_single_member_and_plain_json(tmp_path):
+    gz = tmp_path / "one.json.gz"
+    write_trace_file(gz, _worker_lines(), gz=True)
+    index = build_index(str(gz))
+    assert len(index["members"]) == 1
+    assert index["members"][0]["test_ids"] == ["s1-t1", "s1-t2"]
+
+    plain = write_trace_file(tmp_path / "traces.json", _worker_lines())
+    index = build_index(plain, member_bytes=1)
+    assert len(index["members"]) == 5
+    assert [s["span_id"] for s in read_test_spans(plain, "s1-t2")] == ["t2", "k3"]
+
+
+def test_cli_index(tmp_path, capsys):
+    gz = tmp_path / "traces.json.gz"
+    write_trace_file(gz, _worker_lines(), gz=True)
+
+    assert main(["index", str(gz)]) == 0
+    assert "(built): 1 members, 6 spans, 2 tests (1 failed)" in capsys.readouterr().out
+    assert (tmp_path / "traces.json.gz.idx.json").exists()
+    assert index_path(str(gz)).endswith(".idx.json")
+    assert main(["index", str(gz)]) == 0
+    assert "(up to date)" in capsys.readouterr().out
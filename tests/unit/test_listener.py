@@ -277,32 +277,88 @@ def test_start_suite_passes_parent_context(mock_trace, mock_provider, mock_expor
     assert call_args.kwargs.get("context") is not None or call_args[1].get("context") is not None
 
 
+@patch("robotframework_tracer.listener.create_fanout_exporter")
 @patch("robotframework_tracer.listener.BatchSpanProcessor")
 @patch("robotframework_tracer.listener.HTTPExporter")
 @patch("robotframework_tracer.listener.TracerProvider")
 @patch("robotframework_tracer.listener.trace")
-def test_multi_endpoint_creates_multiple_processors(
-    mock_trace, mock_provider, mock_exporter, mock_processor
+def test_multi_endpoint_uses_single_fanout_processor(
+    mock_trace, mock_provider, mock_exporter, mock_processor, mock_fanout
 ):
-    """Test that multiple endpoints each get their own exporter and processor."""
+    """Test that multiple endpoints share one processor and fan-out exporter."""
     listener = TracingListener()
     listener.config.endpoints = [
         "http://jaeger:4318/v1/traces",
         "http://tempo:4318/v1/traces",
     ]
     # Force re-init of providers
-    if hasattr(listener, "_trace_processors"):
-        delattr(listener, "_trace_processors")
-    listener._provider = None
+    listener._span_pipeline = None
+    listener._providers = {}
     mock_exporter.reset_mock()
     mock_processor.reset_mock()
     listener._init_providers("test-service")
 
-    # Should have created 2 exporters and 2 processors
-    assert mock_exporter.call_count == 2
-    assert mock_processor.call_count == 2
-    mock_exporter.assert_any_call(endpoint="http://jaeger:4318/v1/traces")
-    mock_exporter.assert_any_call(endpoint="http://tempo:4318/v1/traces")
+    # One fan-out exporter for both endpoints, no per-endpoint SDK exporters
+    mock_exporter.assert_not_called()
+    assert mock_processor.call_count == 1
+    mock_fanout.assert_called_once_with(
+        ["http://jaeger:4318/v1/traces", "http://tempo:4318/v1/traces"],
+        "http",
+        listener.config.export,
+    )
+    (exporter,), _ = mock_processor.call_args
+    assert exporter.exporter is mock_fanout.return_value
+
+
+@patch("robotframework_tracer.listener.RELAY_AVAILABLE", True)
+@patch("robotframework_tracer.listener.RelaySpanExporter")
+@patch("robotframework_tracer.listener.HTTPExporter")
+def test_relay_exporter_replaces_direct_span_export(mock_exporter, mock_relay):
+    """Test that relay=true hands spans to the relay with direct export as fallback."""
+    listener = TracingListener()
+    listener.config.relay = True
+    listener.config.endpoints = ["http://jaeger:4318/v1/traces"]
+    listener.config.relay_socket = "/tmp/test-relay.sock"
+    mock_exporter.reset_mock()
+
+    exporters = listener._create_exporters("traces")
+
+    assert exporters == [mock_relay.return_value]
+    mock_exporter.assert_not_called()
+    args, kwargs = mock_relay.call_args
+    assert args == ("/tmp/test-relay.sock",)
+    assert kwargs["spawn_args"][kwargs["spawn_args"].index("--endpoint") + 1] == (
+        "http://jaeger:4318/v1/traces"
+    )
+    assert callable(kwargs["fallback"])
+
+
+@patch("robotframework_tracer.listener.RELAY_AVAILABLE", True)
+@patch("robotframework_tracer.listener.RelaySpanExporter")
+def test_relay_spawn_args_carry_the_export_config(mock_relay, tmp_path):
+    """Test the spawned relay parses back the listener's full export config."""
+    from robotframework_tracer.cli import _relay_export_config, build_parser
+    from robotframework_tracer.exporters import ExportConfig
+
+    listener = TracingListener("relay=true")
+    listener.config.export = ExportConfig(
+        spill=True,
+        spill_dir=str(tmp_path),
+        spill_max_mb=64,
+        queue_high_water=7,
+        max_in_flight=3,
+        timeout_sec=2.5,
+        retry_attempts=2,
+        retry_backoff_max_sec=4,
+        compression="none",
+    )
+    listener._create_exporters("traces")
+
+    spawn_args = mock_relay.call_args.kwargs["spawn_args"]
+    relay_config = _relay_export_config(build_parser().parse_args(["relay", *spawn_args]))
+    assert vars(relay_config) == vars(listener.config.export)
+    assert relay_config.compression == "none"
+    assert relay_config.queue_high_water == 7
 
 
 @patch("robotframework_tracer.listener.BatchSpanProcessor")
@@ -316,12 +372,320 @@ def test_single_endpoint_fallback_when_no_endpoints(
     listener = TracingListener()
     listener.config.endpoints = []
     listener.config.endpoint = "http://jaeger:4318/v1/traces"
-    if hasattr(listener, "_trace_processors"):
-        delattr(listener, "_trace_processors")
-    listener._provider = None
+    listener._span_pipeline = None
+    listener._providers = {}
     mock_exporter.reset_mock()
     mock_processor.reset_mock()
     listener._init_providers("test-service")
 
     assert mock_processor.call_count == 1
     mock_exporter.assert_called_with(endpoint="http://jaeger:4318/v1/traces")
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_embedded_screenshot_attached_at_end_keyword(
+    mock_trace, mock_provider, mock_exporter, tmp_path
+):
+    """Test embedded screenshots are processed in the background and attached at keyword end."""
+    shot = tmp_path / "shot.png"
+    shot.write_bytes(b"\x89PNG")
+    listener = TracingListener("screenshot_mode=embedded")
+    assert listener._screenshot_worker is not None
+    mock_span = Mock()
+    listener.span_stack = [mock_span]
+
+    message = Mock()
+    message.message = f'<img src="{shot}">'
+    message.level = "INFO"
+    listener.log_message(message)
+
+    data = Mock()
+    data.type = "KEYWORD"
+    result = Mock()
+    result.status = "PASS"
+    result.elapsedtime = 10
+    listener.end_keyword(data, result)
+
+    events = [c for c in mock_span.add_event.call_args_list if c[0][0] == "rf.screenshot"]
+    assert len(events) == 1
+    assert events[0][0][1]["rf.screenshot.mode"] == "embedded"
+    mock_span.end.assert_called_once()
+    listener.close()
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_blob_dir_derived_from_trace_output_file(
+    mock_trace, mock_provider, mock_exporter, tmp_path
+):
+    """Test blob screenshot mode stores images next to the trace output file."""
+    filepath = str(tmp_path / "traces.json")
+    listener = TracingListener(f"trace_output_file={filepath}", "screenshot_mode=blob")
+    assert listener._screenshot_blob_dir == f"{filepath}.blobs"
+    assert listener._screenshot_worker is not None
+    listener._screenshot_worker.shutdown()
+    listener._trace_file.close()
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_on_failure_screenshot_only_embedded_for_failing_test(
+    mock_trace, mock_provider, mock_exporter, tmp_path
+):
+    """Test on_failure mode embeds screenshots on FAIL and drops them on PASS."""
+    shot = tmp_path / "shot.png"
+    shot.write_bytes(b"\x89PNG")
+    listener = TracingListener("screenshot_mode=on_failure")
+    message = Mock()
+    message.message = f'<img src="{shot}">'
+    message.level = "INFO"
+    result = Mock()
+    result.elapsedtime = 10
+
+    for status in ("PASS", "FAIL"):
+        test_span, keyword_span = Mock(), Mock()
+        listener.span_stack = [Mock(), test_span, keyword_span]
+        listener.log_message(message)
+        result.status = "PASS"
+        keyword = Mock()
+        keyword.type = "KEYWORD"
+        listener.end_keyword(keyword, result)
+        result.status = status
+        listener.end_test(Mock(), result)
+
+        events = [c for c in test_span.add_event.call_args_list if c[0][0] == "rf.screenshot"]
+        assert len(events) == (1 if status == "FAIL" else 0)
+        assert not [c for c in keyword_span.add_event.call_args_list if c[0][0] == "rf.screenshot"]
+    assert len(listener._failure_screenshots) == 0
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_log_dedup_emits_one_record_per_message_at_span_end(
+    mock_trace, mock_provider, mock_exporter
+):
+    """Test repeated log messages within a keyword are merged into one record."""
+    listener = TracingListener("capture_logs=true", "log_dedup=true")
+    listener.logger = Mock()
+    keyword_span = Mock()
+    listener.span_stack = [Mock(), keyword_span]
+
+    message = Mock()
+    message.level = "INFO"
+    message.message = "element not visible yet"
+    for _ in range(5):
+        listener.log_message(message)
+    listener.logger.emit.assert_not_called()
+
+    data = Mock()
+    data.type = "KEYWORD"
+    result = Mock()
+    result.status = "PASS"
+    listener.end_keyword(data, result)
+
+    listener.logger.emit.assert_called_once()
+    kwargs = listener.logger.emit.call_args[1]
+    assert kwargs["body"] == "element not visible yet"
+    assert kwargs["attributes"]["rf.log.count"] == 5
+    assert (
+        kwargs["attributes"]["rf.log.first_timestamp"]
+        <= kwargs["attributes"]["rf.log.last_timestamp"]
+    )
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_log_rate_limit_reports_suppressed_records_at_end_test(
+    mock_trace, mock_provider, mock_exporter
+):
+    """Test rate-limited logs are dropped and summarized once at end_test."""
+    listener = TracingListener(
+        "capture_logs=true", "log_rate_limit=DEBUG=0.001", "log_rate_burst=2"
+    )
+    listener.logger = Mock()
+    test_span = Mock()
+    listener.span_stack = [Mock(), test_span]
+    listener.config.log_level = "DEBUG"
+
+    message = Mock()
+    message.level = "DEBUG"
+    message.message = "polling"
+    for _ in range(10):
+        listener.log_message(message)
+    assert listener.logger.emit.call_count == 2
+
+    result = Mock()
+    result.status = "PASS"
+    listener.end_test(Mock(), result)
+
+    assert listener.logger.emit.call_count == 3
+    summary = listener.logger.emit.call_args[1]
+    assert summary["severity_text"] == "WARN"
+    assert summary["attributes"]["rf.log.suppressed"] == 8
+    assert summary["attributes"]["rf.log.suppressed.DEBUG"] == 8
+
+
+@patch("robotframework_tracer.listener.LoggerProvider")
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_log_destination_events_adds_capped_span_events(
+    mock_trace, mock_provider, mock_exporter, mock_logger_provider
+):
+    """Test log_destination=events attaches logs to the current span without a LoggerProvider."""
+    listener = TracingListener(
+        "capture_logs=true", "log_destination=events", "log_max_events_per_span=2"
+    )
+    mock_logger_provider.assert_not_called()
+    assert listener.logger is None
+    keyword_span = Mock()
+    listener.span_stack = [Mock(), keyword_span]
+
+    message = Mock()
+    message.level = "INFO"
+    message.message = "x" * 600
+    for _ in range(3):
+        listener.log_message(message)
+
+    events = [c for c in keyword_span.add_event.call_args_list if c[0][0] == "rf.log"]
+    assert len(events) == 2
+    assert events[0][0][1]["rf.log.level"] == "INFO"
+    assert events[0][0][1]["rf.log.message"] == "x" * 500 + "..."
+
+    data = Mock()
+    data.type = "KEYWORD"
+    result = Mock()
+    result.status = "PASS"
+    listener.end_keyword(data, result)
+    keyword_span.set_attribute.assert_any_call("rf.log.events_dropped", 1)
+    assert listener._log_event_counts == {}
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_log_rate_limit_summary_event_is_not_leaked(mock_trace, mock_provider, mock_exporter):
+    """Test the suppressed-logs summary event counts toward the span and is cleared with it."""
+    listener = TracingListener(
+        "capture_logs=true",
+        "log_destination=events",
+        "log_rate_limit=DEBUG=0.001",
+        "log_rate_burst=1",
+    )
+    test_span = Mock()
+    listener.span_stack = [Mock(), test_span]
+    listener.config.log_level = "DEBUG"
+
+    message = Mock()
+    message.level = "DEBUG"
+    message.message = "polling"
+    for _ in range(5):
+        listener.log_message(message)
+
+    result = Mock()
+    result.status = "PASS"
+    listener.end_test(Mock(), result)
+
+    events = [c[0][1] for c in test_span.add_event.call_args_list if c[0][0] == "rf.log"]
+    assert len(events) == 2
+    assert events[1]["rf.log.suppressed"] == 4
+    assert listener._log_event_counts == {}
+
+
+@patch("robotframework_tracer.listener.BatchLogRecordProcessor")
+@patch("robotframework_tracer.listener.OTLPLogExporter")
+@patch("robotframework_tracer.listener.HTTPExporter")
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_logs_exported_to_every_endpoint(
+    mock_trace, mock_provider, mock_exporter, mock_log_exporter, mock_log_processor
+):
+    """Test log export uses the same endpoint list as traces."""
+    listener = TracingListener("capture_logs=true", "batch_max_export_size=128")
+    listener.config.endpoints = [
+        "http://jaeger:4318/v1/traces",
+        "http://tempo:4318",
+    ]
+    listener.logger_provider = None
+    mock_log_exporter.reset_mock()
+    mock_log_processor.reset_mock()
+    listener._init_providers("test-service")
+
+    mock_log_exporter.assert_any_call(endpoint="http://jaeger:4318/v1/logs")
+    mock_log_exporter.assert_any_call(endpoint="http://tempo:4318/v1/logs")
+    assert mock_log_processor.call_count == 2
+    assert mock_log_processor.call_args[1] == {"max_export_batch_size": 128}
+
+
+@patch("robotframework_tracer.listener.GRPC_AVAILABLE", True)
+@patch("robotframework_tracer.listener.GRPCLogExporter", create=True)
+@patch("robotframework_tracer.listener.GRPCExporter", create=True)
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_grpc_protocol_used_for_logs(
+    mock_trace, mock_provider, mock_grpc_exporter, mock_grpc_log_exporter
+):
+    """Test protocol=grpc applies to log export as well as traces."""
+    listener = TracingListener("capture_logs=true", "protocol=grpc", "endpoint=collector:4317")
+    mock_grpc_exporter.assert_called_once_with(endpoint="collector:4317")
+    mock_grpc_log_exporter.assert_called_once_with(endpoint="collector:4317")
+    assert listener.logger_provider is not None
+
+
+@patch("robotframework_tracer.listener.TracerProvider")
+@patch("robotframework_tracer.listener.trace")
+def test_spill_enabled_uses_queued_exporter(mock_trace, mock_provider, tmp_path):
+    """Test spill=true replaces the SDK exporter with the spill-backed queued exporter."""
+    from robotframework_tracer.exporters import OtlpSpanExporter
+
+    listener = TracingListener("spill=true", f"spill_dir={tmp_path}")
+    exporter = listener._trace_exporters[0].exporter
+    assert isinstance(exporter, OtlpSpanExporter)
+    assert exporter.queue.store is not None
+    assert exporter.queue.store.directory.startswith(str(tmp_path))
+    exporter.queue.shutdown(0.1)
+
+
+@patch("robotframework_tracer.listener.trace")
+def test_auto_service_exports_one_resource_per_suite(mock_trace):
+    """Test service_name=auto gives each suite its own provider over one shared pipeline."""
+    from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    memory = InMemorySpanExporter()
+    with patch.object(TracingListener, "_create_exporters", return_value=[memory]):
+        listener = TracingListener("service_name=auto")
+        listener._init_providers("Suite A")
+        provider_a = listener._provider
+        listener.tracer.start_span("a").end()
+        listener._init_providers("Suite B")
+        listener.tracer.start_span("b").end()
+        listener._init_providers("Suite A")
+        listener.tracer.start_span("c").end()
+
+    assert listener._provider is provider_a
+    assert len(listener._providers) == 2
+    assert len(listener._trace_processors) == 1
+    listener._span_pipeline.force_flush()
+    assert listener._span_counter.ended == 3
+    request = encode_spans(memory.get_finished_spans())
+    exported = {}
+    for rs in request.resource_spans:
+        attrs = {kv.key: kv.value.string_value for kv in rs.resource.attributes}
+        names = [s.name for ss in rs.scope_spans for s in ss.spans]
+        exported.setdefault(attrs["service.name"], []).extend(names)
+        assert attrs["host.name"]
+    assert exported == {"Suite A": ["a", "c"], "Suite B": ["b"]}
+    # No atexit hooks: close() shuts every provider down
+    assert all(p._atexit_handler is None for p in listener._providers.values())
+    shut = []
+    for name, provider in listener._providers.items():
+        provider.shutdown = lambda name=name: shut.append(name)
+    listener.close()
+    assert sorted(shut) == ["Suite A", "Suite B"]
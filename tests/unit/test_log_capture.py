@@ -0,0 +1,72 @@
+"""Tests for log capture helpers."""
+
+from robotframework_tracer.log_capture import LogAggregator, LogRateLimiter, parse_rate_limits
+
+
+class TestLogAggregator:
+    def test_identical_messages_merged(self):
+        agg = LogAggregator()
+        span = object()
+        for ts in (10, 20, 30):
+            assert agg.add(span, "INFO", "not visible yet", ts) is True
+        assert agg.add(span, "WARN", "not visible yet", 40) is True
+
+        records = agg.pop(span)
+        assert records == [
+            ("INFO", "not visible yet", 3, 10, 30),
+            ("WARN", "not visible yet", 1, 40, 40),
+        ]
+        assert agg.pop(span) == []
+
+    def test_spans_aggregated_separately(self):
+        agg = LogAggregator()
+        outer, inner = object(), object()
+        agg.add(outer, "INFO", "msg", 1)
+        agg.add(inner, "INFO", "msg", 2)
+        assert len(agg) == 2
+        assert agg.pop(inner) == [("INFO", "msg", 1, 2, 2)]
+        assert agg.pop(outer) == [("INFO", "msg", 1, 1, 1)]
+        assert len(agg) == 0
+
+    def test_distinct_messages_bounded(self):
+        agg = LogAggregator(max_distinct=2)
+        span = object()
+        assert agg.add(span, "INFO", "a", 1)
+        assert agg.add(span, "INFO", "b", 2)
+        assert agg.add(span, "INFO", "c", 3) is False
+        # Known messages are still counted
+        assert agg.add(span, "INFO", "a", 4) is True
+        assert [r[2] for r in agg.pop(span)] == [2, 1]
+
+
+class TestLogRateLimiter:
+    def test_parse_rate_limits(self):
+        assert parse_rate_limits("") == {}
+        assert parse_rate_limits("50") == {"*": 50.0}
+        assert parse_rate_limits(5) == {"*": 5.0}
+        assert parse_rate_limits("debug=10, INFO=50") == {"DEBUG": 10.0, "INFO": 50.0}
+        assert parse_rate_limits({"WARN": 0, "DEBUG": 2}) == {"DEBUG": 2.0}
+
+    def test_burst_then_refill(self):
+        limiter = LogRateLimiter({"DEBUG": 2}, burst=3)
+        assert [limiter.allow("DEBUG", now=0.0) for _ in range(4)] == [True, True, True, False]
+        # 0.5s at 2/s refills one token
+        assert limiter.allow("DEBUG", now=0.5) is True
+        assert limiter.allow("DEBUG", now=0.5) is False
+
+    def test_levels_limited_independently(self):
+        limiter = LogRateLimiter({"DEBUG": 1}, burst=1)
+        assert limiter.allow("DEBUG", now=0.0)
+        assert not limiter.allow("DEBUG", now=0.0)
+        # INFO has no limit and no "*" default
+        assert all(limiter.allow("INFO", now=0.0) for _ in range(10))
+
+    def test_reset_returns_suppressed_and_refills(self):
+        limiter = LogRateLimiter({"*": 1}, burst=1)
+        for _ in range(3):
+            limiter.allow("INFO", now=0.0)
+        limiter.allow("DEBUG", now=0.0)
+        limiter.allow("DEBUG", now=0.0)
+        assert limiter.reset() == {"INFO": 2, "DEBUG": 1}
+        assert limiter.reset() == {}
+        assert limiter.allow("INFO", now=0.0)
@@ -0,0 +1,112 @@
+"""Tests for the streaming k-way merge of trace files."""
+
+import gzip
+import json
+
+import pytest
+from otlp_builders import line, span, write_trace_file
+
+from robotframework_tracer.cli import main
+from robotframework_tracer.merge import merge_files
+
+
+def _workers(tmp_path):
+    # Worker A: plain json, batches in end order (test before its suite)
+    a = write_trace_file(
+        tmp_path / "a_traces.json",
+        [
+            line(span("a2", "TEST", parent="a1", start=30), service="A", scope="rf"),
+            line(span("a1", "SUITE", start=10, end=100), service="A", scope="rf"),
+        ],
+    )
+    # Worker B: multi-member gzip, own trace id
+    b = tmp_path / "b_traces.json.gz"
+    with open(b, "wb") as f:
+        for entry in (
+            line(
+                span("b2", "TEST", parent="b1", start=40, trace_id="u" * 32),
+                service="B",
+                scope="rf",
+            ),
+            line(span("b1", "SUITE", start=20, end=90, trace_id="u" * 32), service="B", scope="rf"),
+        ):
+            f.write(gzip.compress((entry + "\n").encode()))
+    return [a, str(b)]
+
+
+def _read_spans(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        lines = [json.loads(text) for text in f if text.strip()]
+    return [
+        (rs["resource"]["attributes"][0]["value"]["string_value"] if rs["resource"] else "", s)
+        for d in lines
+        for rs in d["resource_spans"]
+        for ss in rs["scope_spans"]
+        for s in ss["spans"]
+    ]
+
+
+def test_merge_orders_spans_by_start_time(tmp_path):
+    out = str(tmp_path / "merged.json.gz")
+    stats = merge_files(_workers(tmp_path), out, chunk_spans=2, batch_spans=1)
+
+    spans = _read_spans(out)
+    assert [s["span_id"] for _, s in spans] == ["a1", "b1", "a2", "b2"]
+    assert [service for service, _ in spans] == ["A", "B", "A", "B"]
+    assert stats["spans_in"] == stats["spans_out"] == 4
+    assert stats["runs"] == 2
+    assert stats["merge_passes"] == 0
+    assert stats["reparented"] == 0
+
+
+def test_merge_bounds_open_runs_with_passes(tmp_path):
+    out = str(tmp_path / "merged.json")
+    stats = merge_files(_workers(tmp_path), out, chunk_spans=1, batch_spans=1, fan_in=2)
+
+    assert [s["span_id"] for _, s in _read_spans(out)] == ["a1", "b1", "a2", "b2"]
+    assert stats["runs"] == 4
+    assert stats["merge_passes"] == 1
+    assert stats["spans_out"] == 4
+
+
+def test_merge_groups_resources_within_a_batch(tmp_path):
+    out = str(tmp_path / "merged.json")
+    merge_files(_workers(tmp_path), out, batch_spans=10)
+    with open(out) as f:
+        (line,) = f.readlines()
+    d = json.loads(line)
+    assert len(d["resource_spans"]) == 2
+    assert [s["span_id"] for s in d["resource_spans"][0]["scope_spans"][0]["spans"]] == ["a1", "a2"]
+
+
+def test_merge_reparents_worker_suites_under_one_root(tmp_path):
+    out = str(tmp_path / "merged.json")
+    stats = merge_files(_workers(tmp_path), out, reparent=True, root_name="Pabot Run")
+
+    spans = [s for _, s in _read_spans(out)]
+    root = spans[0]
+    assert root["name"] == "Pabot Run"
+    assert root["kind"] == "SPAN_KIND_INTERNAL"
+    assert "parent_span_id" not in root
+    assert root["start_time_unix_nano"] == "10"
+    assert root["end_time_unix_nano"] == "100"
+    by_id = {s["span_id"]: s for s in spans}
+    assert by_id["a1"]["parent_span_id"] == root["span_id"]
+    assert by_id["b1"]["parent_span_id"] == root["span_id"]
+    assert by_id["b2"]["parent_span_id"] == "b1"
+    assert {s["trace_id"] for s in spans} == {"t" * 32}
+    assert stats["reparented"] == 2
+
+
+def test_merge_rejects_output_among_inputs(tmp_path):
+    inputs = _workers(tmp_path)
+    with pytest.raises(ValueError, match="different files"):
+        merge_files(inputs, inputs[0])
+
+
+def test_cli_merge(tmp_path, capsys):
+    out = str(tmp_path / "merged.json")
+    assert main(["merge", *_workers(tmp_path), out, "--reparent"]) == 0
+    assert "2 files -> " in capsys.readouterr().out
+    assert len(_read_spans(out)) == 5
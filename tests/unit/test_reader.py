@@ -0,0 +1,142 @@
+"""Tests for the lazy streaming trace reader."""
+
+import gzip
+import json
+
+import pytest
+from otlp_builders import batch, span, write_trace_file
+
+from robotframework_tracer import reader
+from robotframework_tracer.index import append_indexed
+from robotframework_tracer.reader import (
+    SpanRecord,
+    iter_batches,
+    iter_span_records,
+    iter_spans,
+    span_attributes,
+    span_type,
+)
+
+
+def _lines():
+    return [
+        batch(span("k1", "KEYWORD", "Log"), span("k2", "KEYWORD", "Click Ä"), service="svc"),
+        batch(span("t1", "TEST", "Login", rf_test_id="s1-t1"), service="svc"),
+        batch(
+            span(
+                "k3",
+                "KEYWORD",
+                "Take Screenshot",
+                trace_id="u" * 32,
+                events=[{"name": "rf.screenshot", "attributes": []}],
+            ),
+            service="svc",
+        ),
+        batch(span("s1", "SUITE", "Suite", start=100, end=350, rf_elapsed_time=250), service="svc"),
+    ]
+
+
+@pytest.fixture(params=["json", "gz"])
+def trace_file(request, tmp_path):
+    if request.param == "json":
+        return write_trace_file(tmp_path / "traces.json", _lines())
+    path = tmp_path / "traces.json.gz"
+    with open(path, "wb") as f:
+        for d in _lines():  # One member per batch
+            f.write(gzip.compress((json.dumps(d, separators=(",", ":")) + "\n").encode()))
+    return str(path)
+
+
+def test_iter_spans_streams_all_spans(trace_file):
+    assert [s["span_id"] for s in iter_spans(trace_file)] == ["k1", "k2", "t1", "k3", "s1"]
+    assert len(list(iter_batches(trace_file))) == 4
+
+
+def test_type_and_name_filters_with_projection(trace_file):
+    tests = list(iter_spans(trace_file, types=["test"], fields=["name", "span_id"]))
+    assert tests == [{"name": "Login", "span_id": "t1"}]
+    assert [s["span_id"] for s in iter_spans(trace_file, names=["Click Ä"])] == ["k2"]
+    assert [s["span_id"] for s in iter_spans(trace_file, where=lambda s: s["name"] == "Log")] == [
+        "k1"
+    ]
+
+
+def test_prefilter_skips_decoding_non_matching_batches(trace_file, monkeypatch):
+    decoded = []
+    real = reader._DECODER.raw_decode
+
+    def counting(text, pos=0):
+        decoded.append(text)
+        return real(text, pos)
+
+    monkeypatch.setattr(reader._DECODER, "raw_decode", counting)
+    spans = list(iter_spans(trace_file, contains="rf.screenshot"))
+    assert [s["span_id"] for s in spans] == ["k3"]
+    assert len(decoded) == 1
+    decoded.clear()
+    assert [s["span_id"] for s in iter_spans(trace_file, types=["SUITE"])] == ["s1"]
+    assert len(decoded) == 1
+
+
+def test_span_records(trace_file):
+    records = list(iter_span_records(trace_file, types=["SUITE", "TEST"]))
+    assert [r.span_id for r in records] == ["t1", "s1"]
+    suite = records[1]
+    assert isinstance(suite, SpanRecord)
+    assert suite.type == "SUITE"
+    assert suite.service == "svc"
+    assert suite.duration_ns == 250
+    assert suite.attributes["rf.elapsed.time"] == 250
+    assert suite.events is None
+    assert not hasattr(suite, "__dict__")
+    (shot,) = iter_span_records(trace_file, names=["Take Screenshot"], events=True)
+    assert shot.events[0]["name"] == "rf.screenshot"
+    (test,) = iter_span_records(trace_file, types=["TEST"], attributes=["rf.test.id"])
+    assert test.attributes == {"rf.test.id": "s1-t1"}
+
+
+def test_trace_id_filter_uses_index(tmp_path):
+    src = write_trace_file(tmp_path / "worker.tmp", _lines())
+    path = str(tmp_path / "traces.json.gz")
+    append_indexed(src, path, member_bytes=1)
+    spans = list(iter_spans(path, trace_id="u" * 32))
+    assert [s["span_id"] for s in spans] == ["k3"]
+
+
+def test_pretty_printed_and_concatenated_documents(tmp_path):
+    path = tmp_path / "pretty.json"
+    first, second, *_ = _lines()
+    path.write_text(json.dumps(first, indent=2) + "\n" + json.dumps(second) + json.dumps(second))
+    assert [s["span_id"] for s in iter_spans(str(path))] == ["k1", "k2", "t1", "t1"]
+    assert [s["span_id"] for s in iter_spans(str(path), types=["TEST"])] == ["t1", "t1"]
+
+
+def test_truncated_file_raises(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text(json.dumps(_lines()[0])[:-5])
+    with pytest.raises(ValueError, match="incomplete"):
+        list(iter_spans(str(path)))
+
+
+def test_corrupt_line_is_skipped(tmp_path):
+    path = tmp_path / "cut.json"
+    first, second, third, *_ = _lines()
+    # A worker killed mid-write leaves a cut line; later batches are intact
+    path.write_text(
+        json.dumps(first)[:-5] + "\n" + json.dumps(second) + "\n" + json.dumps(third) + "\n"
+    )
+    assert [s["span_id"] for s in iter_spans(str(path))] == ["t1", "k3"]
+
+
+def test_oversized_document_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(reader, "_MAX_DOCUMENT_CHARS", 100)
+    path = tmp_path / "huge.json"
+    path.write_text(json.dumps(_lines()[0], indent=2))
+    with pytest.raises(ValueError, match="exceeds 100 characters"):
+        list(iter_spans(str(path)))
+
+
+def test_span_helpers_accept_camel_case():
+    camel = {"attributes": [{"key": "rf.test.name", "value": {"stringValue": "T"}}]}
+    assert span_type(camel) == "TEST"
+    assert span_attributes(camel) == {"rf.test.name": "T"}
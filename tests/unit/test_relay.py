@@ -0,0 +1,186 @@
+"""Tests for the per-host span relay."""
+
+import os
+import socket
+import stat
+import threading
+import time
+
+import pytest
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+
+from robotframework_tracer.exporters import EndpointQueue, ExportConfig, FanoutSpanExporter
+from robotframework_tracer.relay import (
+    RELAY_AVAILABLE,
+    RelayServer,
+    RelaySpanExporter,
+    default_socket_path,
+)
+
+pytestmark = pytest.mark.skipif(not RELAY_AVAILABLE, reason="requires Unix domain sockets")
+
+
+class FakeSender:
+    def __init__(self):
+        self.payloads = []
+
+    def send(self, payload):
+        self.payloads.append(payload)
+        return True, False
+
+    def close(self):
+        pass
+
+
+class CollectingExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+        return SpanExportResult.SUCCESS
+
+
+def _spans(*names):
+    provider = TracerProvider()
+    collector = CollectingExporter()
+    provider.add_span_processor(SimpleSpanProcessor(collector))
+    tracer = provider.get_tracer("test")
+    for name in names:
+        tracer.start_span(name).end()
+    return collector.spans
+
+
+def _fanout(sender):
+    config = ExportConfig(retry_attempts=1, retry_backoff_max_sec=0, compression="none")
+    return FanoutSpanExporter([EndpointQueue(sender, config)])
+
+
+def _span_names(payload):
+    request = ExportTraceServiceRequest.FromString(payload[1:])  # Strip the encoding prefix
+    return [s.name for rs in request.resource_spans for ss in rs.scope_spans for s in ss.spans]
+
+
+def test_default_socket_path_depends_on_endpoints_protocol_and_options():
+    a = default_socket_path(["http://a:4318/v1/traces"], "http")
+    assert a == default_socket_path(["http://a:4318/v1/traces"], "http")
+    assert a != default_socket_path(["http://a:4318/v1/traces"], "grpc")
+    assert a != default_socket_path(["http://b:4318/v1/traces"], "http")
+    assert a != default_socket_path(["http://a:4318/v1/traces"], "http", ["--spill"])
+    both = ["http://a:4318/v1/traces", "http://b:4318/v1/traces"]
+    assert default_socket_path(both, "http") == default_socket_path(both[::-1], "http")
+
+
+def test_relay_coalesces_worker_batches(tmp_path):
+    sender = FakeSender()
+    socket_path = str(tmp_path / "r.sock")
+    output = tmp_path / "relayed.json"
+    server = RelayServer(
+        socket_path, _fanout(sender), output=str(output), batch_delay_ms=60000
+    ).start()
+    try:
+        worker_a = RelaySpanExporter(socket_path)
+        worker_b = RelaySpanExporter(socket_path)
+        assert worker_a.export(_spans("a1", "a2")) == SpanExportResult.SUCCESS
+        assert worker_b.export(_spans("b1")) == SpanExportResult.SUCCESS
+        deadline = time.monotonic() + 5
+        while server.stats["requests"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Flush acknowledges only after the relay handed everything to the queues
+        assert worker_a.force_flush(5000) is True
+        assert worker_b.force_flush(5000) is True
+        worker_a.shutdown()
+        worker_b.shutdown()
+    finally:
+        server.stop()
+
+    assert len(sender.payloads) == 1
+    assert sorted(_span_names(sender.payloads[0])) == ["a1", "a2", "b1"]
+    assert server.stats["requests"] == 2
+    assert server.stats["connections"] == 2
+    assert '"name":"b1"' in output.read_text()
+
+
+def test_flush_waits_for_the_batch_being_submitted(tmp_path):
+    entered = threading.Event()
+    release = threading.Event()
+    flushed = []
+
+    class SlowFanout(FanoutSpanExporter):
+        def submit(self, body, spans=0):
+            entered.set()
+            release.wait(5)
+            super().submit(body, spans)
+
+        def force_flush(self, timeout_millis=30000):
+            flushed.append(len(sender.payloads))
+            return super().force_flush(timeout_millis)
+
+    sender = FakeSender()
+    config = ExportConfig(retry_attempts=1, retry_backoff_max_sec=0, compression="none")
+    server = RelayServer(
+        str(tmp_path / "r.sock"),
+        SlowFanout([EndpointQueue(sender, config)]),
+        batch_delay_ms=0,
+    ).start()
+    try:
+        server._add(encode_spans(_spans("s1")).SerializeToString())
+        assert entered.wait(5)
+        # The batcher holds the batch: flush must not acknowledge before it is queued
+        result = []
+        flusher = threading.Thread(target=lambda: result.append(server.flush(5)))
+        flusher.start()
+        flusher.join(0.2)
+        assert flusher.is_alive()
+        release.set()
+        flusher.join(5)
+        assert result == [True]
+        assert flushed == [1]
+    finally:
+        release.set()
+        server.stop()
+
+
+def test_worker_falls_back_to_direct_export_without_relay(tmp_path, capsys):
+    direct = CollectingExporter()
+    exporter = RelaySpanExporter(str(tmp_path / "none.sock"), fallback=lambda: direct)
+    assert exporter.export(_spans("s1")) == SpanExportResult.SUCCESS
+    assert exporter.export(_spans("s2")) == SpanExportResult.SUCCESS
+    assert [s.name for s in direct.spans] == ["s1", "s2"]
+    assert "not reachable" in capsys.readouterr().out
+    exporter.shutdown()
+
+
+def test_relay_replaces_stale_socket(tmp_path):
+    socket_path = str(tmp_path / "r.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()  # Socket file left behind, nobody listening
+
+    sender = FakeSender()
+    server = RelayServer(socket_path, _fanout(sender), batch_delay_ms=0).start()
+    try:
+        worker = RelaySpanExporter(socket_path)
+        worker.export(_spans("s1"))
+        assert worker.force_flush(5000) is True
+        worker.shutdown()
+    finally:
+        server.stop()
+    assert _span_names(sender.payloads[0]) == ["s1"]
+
+
+def test_relay_socket_is_owner_only(tmp_path):
+    socket_path = str(tmp_path / "r.sock")
+    umask = os.umask(0)
+    try:
+        server = RelayServer(socket_path, _fanout(FakeSender()), batch_delay_ms=0).start()
+        assert os.umask(0) == 0  # Process umask restored after binding
+    finally:
+        os.umask(umask)
+    try:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    finally:
+        server.stop()
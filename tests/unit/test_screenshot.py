@@ -3,17 +3,28 @@
 import base64
 import hashlib
 import os
+import threading
 from unittest.mock import MagicMock
 
+import pytest
+
 from robotframework_tracer.screenshot import (
+    FailureScreenshots,
+    ScreenshotCache,
     ScreenshotConfig,
+    ScreenshotWorker,
+    base64_decoded_size,
     build_event_attributes,
+    build_inline_attributes,
     compute_sha256,
+    extract_data_uri,
     extract_image_path,
+    file_fingerprint,
     guess_mime_type,
     normalize_path,
     process_log_message,
     read_with_retry,
+    recompress_image,
 )
 
 # ---------------------------------------------------------------------------
@@ -28,6 +39,10 @@ class TestScreenshotConfig:
         assert cfg.max_size_kb == 200
         assert cfg.retry_attempts == 3
         assert cfg.retry_delay_sec == 0.05
+        assert cfg.workers == 2
+        assert cfg.wait_timeout_sec == 5.0
+        assert cfg.dedup is False
+        assert cfg.dedup_cache_size == 1024
 
     def test_custom_values(self):
         cfg = ScreenshotConfig(
@@ -63,6 +78,11 @@ class TestScreenshotConfig:
         assert cfg.retry_attempts == 1
         assert cfg.retry_delay_sec == 0.0
 
+    def test_worker_settings_from_dict(self):
+        cfg = ScreenshotConfig.from_dict({"workers": 0, "wait_timeout_sec": 1.5})
+        assert cfg.workers == 0
+        assert cfg.wait_timeout_sec == 1.5
+
 
 # ---------------------------------------------------------------------------
 # extract_image_path
@@ -109,6 +129,15 @@ class TestExtractImagePath:
         html = '<img src="first.png"><img src="second.png">'
         assert extract_image_path(html) == "first.png"
 
+    def test_mixed_case_tag(self):
+        assert extract_image_path('<iMg SRC="shot.png">') == "shot.png"
+        assert extract_image_path('<i>x</i><Img src="after.png">') == "after.png"
+        assert extract_image_path("<input><I>no image</I>") is None
+        assert extract_data_uri(f'<iMG src="data:image/png;base64,{_PIXELS_B64}">') == (
+            "image/png",
+            _PIXELS_B64,
+        )
+
     def test_absolute_path(self):
         html = '<img src="/home/user/output/screenshot.png">'
         assert extract_image_path(html) == "/home/user/output/screenshot.png"
@@ -257,6 +286,11 @@ class TestBuildEventAttributes:
         assert attrs["rf.screenshot.path"] == "/nonexistent/shot.png"
         assert attrs["rf.screenshot.size"] == 0
 
+    def test_explicit_timestamp_is_used(self):
+        cfg = ScreenshotConfig(mode="path")
+        attrs = build_event_attributes(cfg, "/tmp/shot.png", timestamp_ms=1234)
+        assert attrs["rf.screenshot.timestamp"] == 1234
+
 
 # ---------------------------------------------------------------------------
 # process_log_message (integration)
@@ -317,3 +351,552 @@ class TestProcessLogMessage:
         # Should not raise
         result = process_log_message(cfg, span, '<img src="/tmp/shot.png">')
         assert result is False
+
+
+# ---------------------------------------------------------------------------
+# ScreenshotWorker
+# ---------------------------------------------------------------------------
+
+
+class TestScreenshotWorker:
+    def _config(self, **kwargs):
+        kwargs.setdefault("mode", "embedded")
+        kwargs.setdefault("retry_attempts", 1)
+        kwargs.setdefault("retry_delay_sec", 0)
+        return ScreenshotConfig(**kwargs)
+
+    def test_submit_defers_event_until_attach(self, tmp_path):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"\x89PNG_ASYNC")
+        worker = ScreenshotWorker(self._config())
+        span = MagicMock()
+        try:
+            assert worker.submit(span, f'<img src="{f}">') is True
+            span.add_event.assert_not_called()
+
+            assert worker.attach(span) == 1
+            name, attrs = span.add_event.call_args[0]
+            assert name == "rf.screenshot"
+            assert attrs["rf.screenshot.mode"] == "embedded"
+            assert attrs["rf.screenshot.data"] == base64.b64encode(b"\x89PNG_ASYNC").decode()
+            assert "timestamp" in span.add_event.call_args.kwargs
+        finally:
+            worker.shutdown()
+
+    def test_resolves_relative_path_against_output_dir(self, tmp_path):
+        (tmp_path / "rel.png").write_bytes(b"data")
+        worker = ScreenshotWorker(self._config())
+        span = MagicMock()
+        try:
+            worker.submit(span, '<img src="rel.png">', str(tmp_path))
+            worker.attach(span)
+            attrs = span.add_event.call_args[0][1]
+            assert attrs["rf.screenshot.path"] == str(tmp_path / "rel.png")
+        finally:
+            worker.shutdown()
+
+    def test_non_screenshot_message_not_queued(self):
+        worker = ScreenshotWorker(self._config())
+        span = MagicMock()
+        try:
+            assert worker.submit(span, "plain text") is False
+            assert worker.attach(span) == 0
+        finally:
+            worker.shutdown()
+
+    def test_attach_only_adds_events_for_that_span(self, tmp_path):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"data")
+        worker = ScreenshotWorker(self._config())
+        outer, inner = MagicMock(), MagicMock()
+        try:
+            worker.submit(outer, f'<img src="{f}">')
+            worker.submit(inner, f'<img src="{f}">')
+            assert worker.attach(inner) == 1
+            outer.add_event.assert_not_called()
+            assert worker.attach(outer) == 1
+        finally:
+            worker.shutdown()
+
+    def test_attach_timeout_falls_back_to_path(self, tmp_path, monkeypatch):
+        release = threading.Event()
+
+        def slow_build(*args):
+            release.wait(5)
+            return {"rf.screenshot.mode": "embedded"}
+
+        worker = ScreenshotWorker(self._config(wait_timeout_sec=0.01))
+        monkeypatch.setattr(worker, "_build", slow_build)
+        span = MagicMock()
+        try:
+            worker.submit(span, '<img src="/tmp/slow.png">')
+            assert worker.attach(span) == 1
+            attrs = span.add_event.call_args[0][1]
+            assert attrs["rf.screenshot.mode"] == "path_fallback"
+            assert attrs["rf.screenshot.path"] == os.path.abspath("/tmp/slow.png")
+        finally:
+            release.set()
+            worker.shutdown()
+
+    def test_attach_timeout_releases_dedup_claim(self, tmp_path, monkeypatch):
+        import robotframework_tracer.screenshot as screenshot
+
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"data")
+        release = threading.Event()
+        real_read = screenshot.read_with_retry
+
+        def slow_read(*args):
+            release.wait(5)
+            return real_read(*args)
+
+        monkeypatch.setattr(screenshot, "read_with_retry", slow_read)
+        cache = ScreenshotCache()
+        worker = ScreenshotWorker(self._config(wait_timeout_sec=0.01), cache)
+        span = MagicMock()
+        span.get_span_context.return_value = MagicMock(trace_id=1, span_id=2)
+        try:
+            worker.submit(span, f'<img src="{f}">')
+            assert worker.attach(span) == 1
+            assert span.add_event.call_args[0][1]["rf.screenshot.mode"] == "path_fallback"
+        finally:
+            release.set()
+            worker.shutdown()
+        worker._executor.shutdown(wait=True)
+        # The late result was never attached, so it must not be referenced
+        assert cache.get(hashlib.sha256(b"data").hexdigest()) is None
+
+    def test_shutdown_skips_spans_that_already_ended(self, tmp_path):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"data")
+        worker = ScreenshotWorker(self._config())
+        open_span, ended_span = MagicMock(), MagicMock()
+        open_span.is_recording.return_value = True
+        ended_span.is_recording.return_value = False
+        worker.submit(open_span, f'<img src="{f}">')
+        worker.submit(ended_span, f'<img src="{f}">')
+        worker.submit(ended_span, f'<img src="{f}">')
+
+        assert worker.shutdown() == 2
+        ended_span.add_event.assert_not_called()
+        assert open_span.add_event.call_count == 1
+
+
+# ---------------------------------------------------------------------------
+# ScreenshotCache / deduplication
+# ---------------------------------------------------------------------------
+
+
+class TestScreenshotCache:
+    def test_claim_first_wins(self):
+        cache = ScreenshotCache()
+        assert cache.claim("abc", ("t1", "s1")) is None
+        assert cache.claim("abc", ("t2", "s2")) == ("t1", "s1")
+        assert cache.get("abc") == ("t1", "s1")
+
+    def test_lru_eviction(self):
+        cache = ScreenshotCache(max_entries=2)
+        cache.claim("a", ("t", "1"))
+        cache.claim("b", ("t", "2"))
+        cache.get("a")  # a becomes most recently used
+        cache.claim("c", ("t", "3"))
+        assert cache.get("b") is None
+        assert cache.get("a") == ("t", "1")
+        assert len(cache) == 2
+
+    def test_fingerprint_changes_with_content(self, tmp_path):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"one")
+        first = file_fingerprint(str(f))
+        f.write_bytes(b"two!")
+        assert file_fingerprint(str(f)) != first
+        assert file_fingerprint(str(tmp_path / "missing.png")) is None
+
+
+class TestDeduplication:
+    def _config(self):
+        return ScreenshotConfig(mode="embedded", retry_attempts=1, retry_delay_sec=0, dedup=True)
+
+    def test_identical_images_embedded_once(self, tmp_path):
+        a = tmp_path / "a.png"
+        b = tmp_path / "b.png"
+        a.write_bytes(b"same-bytes")
+        b.write_bytes(b"same-bytes")
+        cache = ScreenshotCache()
+
+        first = build_event_attributes(
+            self._config(), str(a), cache=cache, ref=("t" * 32, "1" * 16)
+        )
+        second = build_event_attributes(
+            self._config(), str(b), cache=cache, ref=("t" * 32, "2" * 16)
+        )
+
+        assert first["rf.screenshot.mode"] == "embedded"
+        assert second["rf.screenshot.mode"] == "deduplicated"
+        assert "rf.screenshot.data" not in second
+        assert second["rf.screenshot.sha256"] == first["rf.screenshot.sha256"]
+        assert second["rf.screenshot.ref_span_id"] == "1" * 16
+        assert second["rf.screenshot.size"] == len(b"same-bytes")
+
+    def test_unchanged_file_hits_fingerprint_without_full_read(self, tmp_path, monkeypatch):
+        f = tmp_path / "a.png"
+        f.write_bytes(b"image")
+        cache = ScreenshotCache()
+        build_event_attributes(self._config(), str(f), cache=cache, ref=("t", "1"))
+
+        def fail_read(*args, **kwargs):
+            raise AssertionError("full read not expected")
+
+        monkeypatch.setattr("robotframework_tracer.screenshot.read_with_retry", fail_read)
+        attrs = build_event_attributes(self._config(), str(f), cache=cache, ref=("t", "2"))
+        assert attrs["rf.screenshot.mode"] == "deduplicated"
+
+    def test_different_images_both_embedded(self, tmp_path):
+        a = tmp_path / "a.png"
+        b = tmp_path / "b.png"
+        a.write_bytes(b"one")
+        b.write_bytes(b"two")
+        cache = ScreenshotCache()
+        assert (
+            build_event_attributes(self._config(), str(a), cache=cache, ref=("t", "1"))[
+                "rf.screenshot.mode"
+            ]
+            == "embedded"
+        )
+        assert (
+            build_event_attributes(self._config(), str(b), cache=cache, ref=("t", "2"))[
+                "rf.screenshot.mode"
+            ]
+            == "embedded"
+        )
+
+    def test_process_log_message_uses_span_context(self, tmp_path):
+        f = tmp_path / "a.png"
+        f.write_bytes(b"image")
+        cache = ScreenshotCache()
+        span1, span2 = MagicMock(), MagicMock()
+        span1.get_span_context.return_value.trace_id = 1
+        span1.get_span_context.return_value.span_id = 2
+        span2.get_span_context.return_value.trace_id = 1
+        span2.get_span_context.return_value.span_id = 3
+
+        process_log_message(self._config(), span1, f'<img src="{f}">', cache=cache)
+        process_log_message(self._config(), span2, f'<img src="{f}">', cache=cache)
+
+        attrs = span2.add_event.call_args[0][1]
+        assert attrs["rf.screenshot.mode"] == "deduplicated"
+        assert attrs["rf.screenshot.ref_span_id"] == format(2, "016x")
+        assert attrs["rf.screenshot.ref_trace_id"] == format(1, "032x")
+
+
+# ---------------------------------------------------------------------------
+# Recompression (optional Pillow)
+# ---------------------------------------------------------------------------
+
+
+class TestRecompression:
+    def _noisy_png(self, path, size=(400, 300)):
+        pil_image = pytest.importorskip("PIL.Image")
+        img = pil_image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+        img.save(path, format="PNG")
+        return path.stat().st_size
+
+    def test_config_defaults_and_normalization(self):
+        cfg = ScreenshotConfig()
+        assert cfg.recompress is False
+        assert cfg.recompress_format == "webp"
+        assert cfg.recompress_quality == 80
+        cfg = ScreenshotConfig(recompress_format="JPG", recompress_quality=500)
+        assert cfg.recompress_format == "jpeg"
+        assert cfg.recompress_quality == 95
+        assert ScreenshotConfig(recompress_format="gif").recompress_format == "webp"
+
+    def test_oversized_png_is_recompressed(self, tmp_path):
+        f = tmp_path / "big.png"
+        original_size = self._noisy_png(f)
+        cfg = ScreenshotConfig(
+            mode="embedded",
+            max_size_kb=40,
+            retry_attempts=1,
+            retry_delay_sec=0,
+            recompress=True,
+            recompress_format="jpeg",
+        )
+        attrs = build_event_attributes(cfg, str(f))
+        assert attrs["rf.screenshot.mode"] == "embedded"
+        assert attrs["rf.screenshot.recompressed"] is True
+        assert attrs["rf.screenshot.mime"] == "image/jpeg"
+        assert attrs["rf.screenshot.name"] == "big.jpg"
+        assert attrs["rf.screenshot.original_size"] == original_size
+        assert attrs["rf.screenshot.size"] <= 40 * 1024
+        assert len(base64.b64decode(attrs["rf.screenshot.data"])) == attrs["rf.screenshot.size"]
+        assert attrs["rf.screenshot.sha256"] == hashlib.sha256(f.read_bytes()).hexdigest()
+
+    def test_undecodable_image_falls_back_and_releases_claim(self, tmp_path):
+        pytest.importorskip("PIL")
+        f = tmp_path / "broken.png"
+        f.write_bytes(b"not an image" * 200)
+        cfg = ScreenshotConfig(
+            mode="embedded", max_size_kb=1, retry_attempts=1, retry_delay_sec=0, recompress=True
+        )
+        cache = ScreenshotCache()
+        attrs = build_event_attributes(cfg, str(f), cache=cache, ref=("t", "1"))
+        assert attrs["rf.screenshot.mode"] == "path_fallback"
+        assert len(cache) == 0
+
+    def test_encode_error_falls_back_and_releases_claim(self, tmp_path, monkeypatch):
+        image = pytest.importorskip("PIL.Image")
+        f = tmp_path / "big.png"
+        self._noisy_png(f)
+
+        def no_encoder(self, fp, *args, **params):
+            raise OSError("encoder webp not available")
+
+        monkeypatch.setattr(image.Image, "save", no_encoder)
+        cfg = ScreenshotConfig(
+            mode="embedded", max_size_kb=1, retry_attempts=1, retry_delay_sec=0, recompress=True
+        )
+        cache = ScreenshotCache()
+        attrs = build_event_attributes(cfg, str(f), cache=cache, ref=("t", "1"))
+        assert attrs["rf.screenshot.mode"] == "path_fallback"
+        assert len(cache) == 0
+
+    def test_recompress_without_pillow_falls_back(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("robotframework_tracer.screenshot.PIL_AVAILABLE", False)
+        f = tmp_path / "big.png"
+        f.write_bytes(b"x" * 2048)
+        cfg = ScreenshotConfig(
+            mode="embedded", max_size_kb=1, retry_attempts=1, retry_delay_sec=0, recompress=True
+        )
+        assert build_event_attributes(cfg, str(f))["rf.screenshot.mode"] == "path_fallback"
+        assert recompress_image(b"x", 1024) is None
+
+
+# ---------------------------------------------------------------------------
+# Blob mode
+# ---------------------------------------------------------------------------
+
+
+class TestBlobMode:
+    def _config(self, **kwargs):
+        return ScreenshotConfig(mode="blob", retry_attempts=1, retry_delay_sec=0, **kwargs)
+
+    def test_blob_written_once_and_event_has_no_data(self, tmp_path):
+        f = tmp_path / "shot.PNG"
+        f.write_bytes(b"pixels")
+        blob_dir = tmp_path / "traces.json.blobs"
+        sha = hashlib.sha256(b"pixels").hexdigest()
+
+        attrs = build_event_attributes(self._config(), str(f), blob_dir=str(blob_dir))
+
+        assert attrs["rf.screenshot.mode"] == "blob"
+        assert attrs["rf.screenshot.sha256"] == sha
+        assert attrs["rf.screenshot.size"] == 6
+        assert attrs["rf.screenshot.mime"] == "image/png"
+        assert "rf.screenshot.data" not in attrs
+        assert "rf.screenshot.path" not in attrs
+        assert (blob_dir / f"{sha}.png").read_bytes() == b"pixels"
+        assert os.listdir(blob_dir) == [f"{sha}.png"]
+
+    def test_copied_by_default(self, tmp_path):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"pixels")
+        blob_dir = tmp_path / "blobs"
+        build_event_attributes(self._config(), str(f), blob_dir=str(blob_dir))
+        blob = blob_dir / f"{hashlib.sha256(b'pixels').hexdigest()}.png"
+        assert os.stat(blob).st_ino != os.stat(f).st_ino
+
+        # Overwriting the screenshot in place leaves the stored blob intact
+        f.write_bytes(b"other")
+        assert blob.read_bytes() == b"pixels"
+
+    def test_hardlink_when_enabled(self, tmp_path):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"pixels")
+        blob_dir = tmp_path / "blobs"
+        build_event_attributes(self._config(blob_hardlink=True), str(f), blob_dir=str(blob_dir))
+        blob = blob_dir / f"{hashlib.sha256(b'pixels').hexdigest()}.png"
+        assert os.stat(blob).st_ino == os.stat(f).st_ino
+
+    def test_known_fingerprint_skips_read(self, tmp_path, monkeypatch):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"pixels")
+        blob_dir = tmp_path / "blobs"
+        cache = ScreenshotCache()
+        build_event_attributes(self._config(), str(f), cache=cache, blob_dir=str(blob_dir))
+
+        def fail_read(*args, **kwargs):
+            raise AssertionError("read not expected")
+
+        monkeypatch.setattr("robotframework_tracer.screenshot.read_with_retry", fail_read)
+        attrs = build_event_attributes(self._config(), str(f), cache=cache, blob_dir=str(blob_dir))
+        assert attrs["rf.screenshot.size"] == 6
+
+    def test_without_blob_dir_falls_back_to_path(self, tmp_path):
+        f = tmp_path / "shot.png"
+        f.write_bytes(b"pixels")
+        attrs = build_event_attributes(self._config(), str(f))
+        assert attrs["rf.screenshot.mode"] == "path_fallback"
+        assert attrs["rf.screenshot.path"] == str(f)
+
+
+# ---------------------------------------------------------------------------
+# on_failure mode
+# ---------------------------------------------------------------------------
+
+
+class TestFailureScreenshots:
+    def _pending(self):
+        cfg = ScreenshotConfig(mode="on_failure", retry_attempts=1, retry_delay_sec=0)
+        return FailureScreenshots(cfg)
+
+    def test_record_does_not_read_file(self, tmp_path, monkeypatch):
+        def fail_read(*args, **kwargs):
+            raise AssertionError("read not expected")
+
+        monkeypatch.setattr("robotframework_tracer.screenshot.read_with_retry", fail_read)
+        pending = self._pending()
+        assert pending.record('<img src="shot.png">', str(tmp_path), depth=3) is True
+        assert pending.record("no image here", str(tmp_path), depth=3) is False
+        assert len(pending) == 1
+
+    def test_failed_span_embeds_inner_screenshots(self, tmp_path):
+        (tmp_path / "shot.png").write_bytes(b"pixels")
+        pending = self._pending()
+        pending.record('<img src="shot.png">', str(tmp_path), depth=3)
+        span = MagicMock()
+
+        assert pending.resolve(span, depth=3, failed=True) == 1
+        attrs = span.add_event.call_args[0][1]
+        assert attrs["rf.screenshot.mode"] == "embedded"
+        assert attrs["rf.screenshot.data"] == base64.b64encode(b"pixels").decode()
+        assert len(pending) == 0
+
+    def test_passing_keyword_keeps_entries_for_test(self, tmp_path):
+        (tmp_path / "shot.png").write_bytes(b"pixels")
+        pending = self._pending()
+        pending.record('<img src="shot.png">', str(tmp_path), depth=3)
+        keyword_span, test_span = MagicMock(), MagicMock()
+
+        assert pending.resolve(keyword_span, depth=3, failed=False, keep=True) == 0
+        assert len(pending) == 1
+        assert pending.resolve(test_span, depth=2, failed=True) == 1
+        keyword_span.add_event.assert_not_called()
+        test_span.add_event.assert_called_once()
+
+    def test_passing_test_discards_entries(self, tmp_path):
+        pending = self._pending()
+        pending.record('<img src="shot.png">', str(tmp_path), depth=3)
+        span = MagicMock()
+        assert pending.resolve(span, depth=2, failed=False) == 0
+        assert len(pending) == 0
+        span.add_event.assert_not_called()
+
+    def test_outer_entries_not_taken_by_inner_failure(self, tmp_path):
+        (tmp_path / "outer.png").write_bytes(b"outer")
+        pending = self._pending()
+        pending.record('<img src="outer.png">', str(tmp_path), depth=3)
+        pending.record('<img src="inner.png">', str(tmp_path), depth=4)
+        span = MagicMock()
+        pending.resolve(span, depth=4, failed=True)
+        assert len(pending) == 1
+
+
+# ---------------------------------------------------------------------------
+# Inline data-URI screenshots
+# ---------------------------------------------------------------------------
+
+_PIXELS_B64 = base64.b64encode(b"pixels!").decode()
+
+
+class TestInlineScreenshots:
+    def _html(self, b64=_PIXELS_B64, mime="image/png"):
+        return f'</td></tr><tr><td colspan="3"><img alt="s" src="data:{mime};base64,{b64}" width="800px">'
+
+    def test_extract_data_uri_slices_payload(self):
+        assert extract_data_uri(self._html()) == ("image/png", _PIXELS_B64)
+
+    def test_extract_data_uri_ignores_plain_paths_and_text(self):
+        assert extract_data_uri('<img src="shot.png">') is None
+        assert extract_data_uri("no images here") is None
+        assert extract_data_uri('<img src="data:image/png;base64,unterminated') is None
+
+    def test_extract_image_path_still_rejects_data_uri(self):
+        assert extract_image_path(self._html()) is None
+
+    def test_decoded_size_from_encoded_length(self):
+        for raw in (b"", b"a", b"ab", b"abc", b"abcd"):
+            assert base64_decoded_size(base64.b64encode(raw).decode()) == len(raw)
+
+    def test_embedded_attaches_payload_without_decoding(self, monkeypatch):
+        import robotframework_tracer.screenshot as mod
+
+        monkeypatch.setattr(mod.base64, "b64decode", MagicMock(side_effect=AssertionError))
+        attrs = build_inline_attributes(
+            ScreenshotConfig(mode="embedded"), "image/png", _PIXELS_B64, timestamp_ms=1
+        )
+        assert attrs["rf.screenshot.mode"] == "inline"
+        assert attrs["rf.screenshot.data"] is _PIXELS_B64
+        assert attrs["rf.screenshot.size"] == 7
+        assert attrs["rf.screenshot.name"] == "inline.png"
+        assert "rf.screenshot.sha256" not in attrs
+
+    def test_hash_computed_only_with_dedup(self):
+        cfg = ScreenshotConfig(mode="embedded", dedup=True)
+        cache = ScreenshotCache()
+        sha = hashlib.sha256(b"pixels!").hexdigest()
+
+        first = build_inline_attributes(
+            cfg, "image/png", _PIXELS_B64, 1, cache, ("a" * 32, "1" * 16)
+        )
+        second = build_inline_attributes(
+            cfg, "image/png", _PIXELS_B64, 2, cache, ("a" * 32, "2" * 16)
+        )
+
+        assert first["rf.screenshot.sha256"] == sha
+        assert second["rf.screenshot.mode"] == "deduplicated"
+        assert second["rf.screenshot.ref_span_id"] == "1" * 16
+        assert "rf.screenshot.path" not in second
+
+    def test_too_large_is_omitted(self):
+        b64 = base64.b64encode(b"x" * 2048).decode()
+        attrs = build_inline_attributes(
+            ScreenshotConfig(mode="embedded", max_size_kb=1), "image/png", b64
+        )
+        assert attrs["rf.screenshot.mode"] == "inline_omitted"
+        assert attrs["rf.screenshot.size"] == 2048
+        assert "rf.screenshot.data" not in attrs
+
+    def test_path_mode_records_metadata_only(self):
+        attrs = build_inline_attributes(ScreenshotConfig(mode="path"), "image/jpeg", _PIXELS_B64)
+        assert attrs["rf.screenshot.mode"] == "inline_omitted"
+        assert attrs["rf.screenshot.name"] == "inline.jpg"
+
+    def test_blob_mode_decodes_into_store(self, tmp_path):
+        blob_dir = tmp_path / "blobs"
+        sha = hashlib.sha256(b"pixels!").hexdigest()
+        attrs = build_inline_attributes(
+            ScreenshotConfig(mode="blob"), "image/png", _PIXELS_B64, blob_dir=str(blob_dir)
+        )
+        assert attrs["rf.screenshot.mode"] == "blob"
+        assert (blob_dir / f"{sha}.png").read_bytes() == b"pixels!"
+
+    def test_process_log_message_and_worker(self):
+        span = MagicMock()
+        cfg = ScreenshotConfig(mode="embedded")
+        assert process_log_message(cfg, span, self._html()) is True
+        assert span.add_event.call_args[0][1]["rf.screenshot.data"] == _PIXELS_B64
+
+        worker = ScreenshotWorker(cfg)
+        span = MagicMock()
+        assert worker.submit(span, self._html()) is True
+        assert worker.attach(span) == 1
+        assert span.add_event.call_args[0][1]["rf.screenshot.mode"] == "inline"
+        worker.shutdown()
+
+    def test_failure_mode_embeds_inline_on_fail(self):
+        pending = FailureScreenshots(ScreenshotConfig(mode="on_failure"))
+        pending.record(self._html(), "", depth=2)
+        span = MagicMock()
+        assert pending.resolve(span, depth=2, failed=True) == 1
+        assert span.add_event.call_args[0][1]["rf.screenshot.data"] == _PIXELS_B64
@@ -0,0 +1,74 @@
+"""Tests for the local OTLP sink."""
+
+import json
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+
+from robotframework_tracer.cli import main
+from robotframework_tracer.exporters import GRPC_AVAILABLE, ExportConfig, create_span_exporter
+from robotframework_tracer.sink import OtlpSink
+
+
+def _spans(n):
+    provider = TracerProvider()
+    collected = []
+
+    class _Collector(SpanExporter):
+        def export(self, batch):
+            collected.extend(batch)
+            return SpanExportResult.SUCCESS
+
+    provider.add_span_processor(SimpleSpanProcessor(_Collector()))
+    tracer = provider.get_tracer("test")
+    for i in range(n):
+        tracer.start_span(f"span{i}").end()
+    return collected
+
+
+def _export(endpoint, protocol, spans, **config):
+    config.setdefault("retry_attempts", 1)
+    exporter = create_span_exporter(endpoint, protocol, ExportConfig(**config))
+    exporter.export(spans)
+    exporter.force_flush(5000)
+    stats = dict(exporter.queue.stats)
+    exporter.shutdown()
+    return stats
+
+
+def test_sink_counts_http_spans_and_writes_output(tmp_path):
+    output = tmp_path / "received.json"
+    with OtlpSink(http_port=0, output=str(output)) as sink:
+        stats = _export(sink.http_endpoint, "http", _spans(3))
+    assert stats["sent"] == 1
+    snapshot = sink.stats.snapshot()
+    assert snapshot["requests"] == 1
+    assert snapshot["spans"] == 3
+    assert snapshot["bytes"] > 0
+    line = json.loads(output.read_text())
+    span = line["resource_spans"][0]["scope_spans"][0]["spans"][0]
+    assert len(span["trace_id"]) == 32  # Hex ids, like the trace output file
+
+
+def test_sink_injects_errors():
+    with OtlpSink(http_port=0, error_rate=1.0, error_status=503) as sink:
+        stats = _export(sink.http_endpoint, "http", _spans(1))
+    assert stats["failed"] == 1
+    assert sink.stats.snapshot()["errors_injected"] == 1
+    assert sink.stats.snapshot()["spans"] == 0
+
+
+@pytest.mark.skipif(not GRPC_AVAILABLE, reason="grpcio not installed")
+def test_sink_accepts_grpc():
+    with OtlpSink(http_port=0, grpc_port=0) as sink:
+        stats = _export(sink.grpc_endpoint, "grpc", _spans(2))
+    assert stats["sent"] == 1
+    assert sink.stats.snapshot()["spans"] == 2
+
+
+def test_cli_sink_runs_for_duration(capsys):
+    assert main(["sink", "--port", "0", "--duration", "0.1", "--report-interval", "0"]) == 0
+    out = capsys.readouterr().out
+    assert "OTLP/HTTP sink listening on http://127.0.0.1:" in out
+    assert "Received 0 requests, 0 spans" in out
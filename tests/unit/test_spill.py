@@ -0,0 +1,115 @@
+"""Tests for the disk-backed spill store."""
+
+import os
+
+from robotframework_tracer import spill
+from robotframework_tracer.spill import SpillStore, read_segment
+
+
+def test_append_then_claim_returns_records_in_order(tmp_path):
+    store = SpillStore(str(tmp_path))
+    store.append(b"one")
+    store.append(b"two")
+
+    # The open segment is only sealed on request
+    assert store.claim() is None
+    path, records = store.claim(seal_open=True)
+    assert records == [b"one", b"two"]
+    assert path.endswith(f".{os.getpid()}.claim")
+    store.done(path)
+    assert store.claim() is None
+    assert store.pending() == 0
+
+
+def test_segments_rotate_and_claim_oldest_first(tmp_path):
+    store = SpillStore(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=20)
+    for i in range(4):
+        store.append(f"payload{i}".encode())
+    store.close()
+
+    seen = []
+    while True:
+        claimed = store.claim()
+        if claimed is None:
+            break
+        seen.extend(claimed[1])
+        store.done(claimed[0])
+    assert seen == [b"payload0", b"payload1", b"payload2", b"payload3"]
+
+
+def test_size_cap_evicts_oldest_segments(tmp_path):
+    store = SpillStore(str(tmp_path), max_bytes=200, segment_bytes=50)
+    for i in range(20):
+        store.append(bytes([i]) * 40)
+    store.close()
+
+    assert store.evicted > 0
+    remaining = []
+    while True:
+        claimed = store.claim()
+        if claimed is None:
+            break
+        remaining.extend(claimed[1])
+        store.done(claimed[0])
+    assert remaining[-1] == bytes([19]) * 40
+    assert len(remaining) + store.evicted == 20
+
+
+def test_eviction_uses_tracked_sizes_without_reading_segments(tmp_path, monkeypatch):
+    # Segments left by an earlier run are counted once at startup
+    for i in range(6):
+        payload = bytes([i]) * 40
+        (tmp_path / f"{i + 1:013d}-1-000001.seg").write_bytes(
+            len(payload).to_bytes(4, "big") + payload
+        )
+
+    def fail(*args):
+        raise AssertionError("segment files touched while appending")
+
+    store = SpillStore(str(tmp_path), max_bytes=200, segment_bytes=50)
+    monkeypatch.setattr(spill, "read_segment", fail)
+    monkeypatch.setattr(spill, "count_records", fail)
+    monkeypatch.setattr(spill.glob, "glob", fail)
+    monkeypatch.setattr(spill.os.path, "getsize", fail)
+    for i in range(6, 12):
+        store.append(bytes([i]) * 40)
+    monkeypatch.undo()
+    store.close()
+
+    assert store.evicted == 8
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in store._sealed)
+
+
+def test_restore_keeps_unsent_records_first_in_line(tmp_path):
+    store = SpillStore(str(tmp_path))
+    store.append(b"a")
+    store.append(b"b")
+
+    path, records = store.claim(seal_open=True)
+    assert records == [b"a", b"b"]
+    store.append(b"c")
+    store.close()
+    store.restore(path, records[1:])
+
+    path, records = store.claim()
+    assert records == [b"b"]
+    store.done(path)
+    assert store.claim()[1] == [b"c"]
+
+
+def test_next_run_replays_segments_of_dead_process(tmp_path):
+    # Unsealed segment left behind by a crashed process
+    name = tmp_path / "0000000000001-999999999-000001.open"
+    name.write_bytes(b"\x00\x00\x00\x03abc\x00\x00\x00\x09trunc")
+
+    store = SpillStore(str(tmp_path))
+    path, records = store.claim()
+    assert records == [b"abc"]  # Truncated tail ignored
+    store.done(path)
+    assert not list(tmp_path.iterdir())
+
+
+def test_read_segment_empty(tmp_path):
+    path = tmp_path / "x.seg"
+    path.write_bytes(b"")
+    assert read_segment(str(path)) == []
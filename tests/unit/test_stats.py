@@ -0,0 +1,132 @@
+"""Tests for keyword, test and library duration statistics."""
+
+import json
+
+import pytest
+from otlp_builders import span, write_spans
+
+from robotframework_tracer.cli import main
+from robotframework_tracer.index import append_indexed
+from robotframework_tracer.stats import (
+    _analyze_unit,
+    _combine,
+    compute_stats,
+    percentiles,
+    plan_units,
+)
+
+MS = 1_000_000
+
+
+def _kw(span_id, parent, start, end, name, library="BuiltIn", status="PASS"):
+    return span(
+        span_id,
+        "KEYWORD",
+        parent=parent,
+        start=start * MS,
+        end=end * MS,
+        rf_status=status,
+        **{"rf.keyword.name": name, "rf.keyword.library": library},
+    )
+
+
+def _test(span_id, start, end, test_id, status="PASS"):
+    return span(
+        span_id,
+        "TEST",
+        parent="s1",
+        start=start * MS,
+        end=end * MS,
+        rf_status=status,
+        **{"rf.test.id": test_id, "rf.test.name": span_id},
+    )
+
+
+def _end_ordered():
+    # t1 [0,100]: Outer [10,60] -> Sleep [20,50]; Sleep [70,90]
+    # t2 [100,200]: Outer [110,190] FAIL -> Sleep [120,130]
+    return [
+        _kw("k2", "k1", 20, 50, "Sleep"),
+        _kw("k1", "t1", 10, 60, "Outer", library="MyLib"),
+        _kw("k3", "t1", 70, 90, "Sleep"),
+        _test("t1", 0, 100, "s1-t1"),
+        _kw("k5", "k4", 120, 130, "Sleep"),
+        _kw("k4", "t2", 110, 190, "Outer", library="MyLib", status="FAIL"),
+        _test("t2", 100, 200, "s1-t2", status="FAIL"),
+        span("s1", "SUITE", end=200 * MS, rf_status="PASS", **{"rf.suite.name": "S"}),
+    ]
+
+
+def _rows(report, group):
+    return {row["name"]: row for row in report[group]}
+
+
+def _check(report):
+    keywords = _rows(report, "keyword")
+    outer = keywords["MyLib.Outer"]
+    assert outer["count"] == 2
+    assert outer["total_ms"] == pytest.approx(130)
+    assert outer["self_ms"] == pytest.approx(130 - 30 - 10)
+    assert outer["failure_rate"] == pytest.approx(0.5)
+    sleep = keywords["BuiltIn.Sleep"]
+    assert sleep["count"] == 3
+    assert sleep["self_ms"] == pytest.approx(60)
+    assert sleep["p50_ms"] == pytest.approx(20)
+    tests = _rows(report, "test")
+    assert tests["t1 [s1-t1]"]["self_ms"] == pytest.approx(100 - 50 - 20)
+    assert tests["t2 [s1-t2]"]["self_ms"] == pytest.approx(20)
+    libraries = _rows(report, "library")
+    assert libraries["BuiltIn"]["self_ms"] == pytest.approx(60)
+    assert libraries["MyLib"]["self_ms"] == pytest.approx(90)
+
+
+def test_stats_end_ordered_file(tmp_path):
+    report = compute_stats([write_spans(tmp_path / "t.json", _end_ordered())], workers=1)
+    assert report["spans"] == 8
+    _check(report)
+
+
+def test_stats_start_ordered_file(tmp_path):
+    spans = sorted(_end_ordered(), key=lambda s: int(s["start_time_unix_nano"]))
+    _check(compute_stats([write_spans(tmp_path / "t.json", spans)], workers=1))
+
+
+def test_stats_split_across_index_members(tmp_path):
+    src = write_spans(tmp_path / "worker.tmp", _end_ordered())
+    path = str(tmp_path / "traces.json.gz")
+    append_indexed(src, path, member_bytes=1)
+    units = plan_units([path], workers=3)
+    assert len(units) == 3
+    # Child time crossing unit boundaries is settled when combining
+    _, spans = _combine([_analyze_unit(unit) for unit in units])
+    assert spans == 8
+    _check(compute_stats([path], workers=3))
+
+
+def test_stats_multiple_files_in_pool(tmp_path):
+    a = write_spans(tmp_path / "a.json", _end_ordered())
+    b = write_spans(tmp_path / "b.json", _end_ordered(), per_line=3)
+    report = compute_stats([a, b], workers=2, sort="count", top=1)
+    assert report["files"] == 2
+    assert [row["name"] for row in report["keyword"]] == ["BuiltIn.Sleep"]
+    assert report["keyword"][0]["count"] == 6
+
+
+def test_percentiles_interpolate_linearly():
+    assert percentiles([]) == [0.0, 0.0, 0.0]
+    assert percentiles([10.0]) == [10.0, 10.0, 10.0]
+    assert percentiles([1.0, 2.0, 3.0, 4.0], (0, 50, 90, 100)) == pytest.approx([1, 2.5, 3.7, 4])
+
+
+def test_cli_stats(tmp_path, capsys):
+    path = write_spans(tmp_path / "t.json", _end_ordered())
+    out = tmp_path / "report.json"
+    assert main(["stats", path, "--by", "keyword", "--json", str(out), "--workers", "1"]) == 0
+    text = capsys.readouterr().out
+    assert "By keyword" in text
+    assert "MyLib.Outer" in text
+    assert "By test" not in text
+    report = json.loads(out.read_text())
+    assert "test" not in report
+    assert report["keyword"][0]["name"] == "MyLib.Outer"
+    assert main(["stats", path, "--by", "suite"]) == 2
@@ -3,12 +3,15 @@
 import io
 import json
 import os
+import threading
+import time
 from unittest.mock import MagicMock, Mock, patch
 
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
 
 from robotframework_tracer.config import TracerConfig
+from robotframework_tracer.index import load_index
 from robotframework_tracer.listener import TracingListener, _OtlpJsonFileExporter
 from robotframework_tracer.output_filter import apply_filter
 
@@ -164,6 +167,37 @@ def test_gz_file_opened_on_init(mock_exporter, tmp_path):
     listener._trace_file.close()
 
 
+@patch("robotframework_tracer.listener.HTTPExporter")
+def test_gz_close_writes_sidecar_index(mock_exporter, tmp_path):
+    """Test that closing a gz trace file records its members in the sidecar index."""
+    filepath = str(tmp_path / "traces.json")
+    listener = TracingListener(
+        f"trace_output_file={filepath}", "trace_output_format=gz", "trace_output_index=true"
+    )
+    tracer = listener._provider.get_tracer("test")
+    tracer.start_span("span").end()
+
+    listener.close()
+
+    index = load_index(filepath + ".gz")
+    assert index is not None
+    assert index["summary"]["spans"] >= 1
+    assert index["members"][0]["offset"] == 0
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+def test_gz_close_without_index_by_default(mock_exporter, tmp_path):
+    """Test that gz output writes no sidecar unless trace_output_index is set."""
+    filepath = str(tmp_path / "traces.json")
+    listener = TracingListener(f"trace_output_file={filepath}", "trace_output_format=gz")
+    listener._provider.get_tracer("test").start_span("span").end()
+
+    listener.close()
+
+    assert os.path.exists(filepath + ".gz")
+    assert not os.path.exists(filepath + ".gz.idx.json")
+
+
 @patch("robotframework_tracer.listener.HTTPExporter")
 def test_open_trace_file_error_handling(mock_exporter, capsys):
     """Test _open_trace_file handles errors gracefully."""
@@ -755,3 +789,132 @@ def test_apply_filter_minimal_preset():
     keys = [a["key"] for a in span["attributes"]]
     assert "rf.elapsed_time" not in keys
     assert "rf.test.name" in keys
+
+
+# --- Log output file tests ---
+
+
+def test_config_log_output_from_output_logs_section():
+    """Test output.logs in the config file maps to log_output_file/format."""
+    from robotframework_tracer.config import _flatten_config_file
+
+    flat = _flatten_config_file(
+        {"version": "1.0.0", "output": {"format": "gz", "logs": {"file": "auto", "format": "json"}}}
+    )
+    assert flat["log_output_file"] == "auto"
+    assert flat["log_output_format"] == "json"
+
+
+def test_config_log_output_format_defaults_to_trace_format():
+    config = TracerConfig(trace_output_format="gz")
+    assert config.log_output_file == ""
+    assert config.log_output_format == "gz"
+
+
+@patch("robotframework_tracer.listener.HTTPExporter")
+def test_log_output_file_correlated_with_span(mock_exporter, tmp_path):
+    """Test captured logs are written as OTLP JSON with hex trace/span ids."""
+    import gzip
+
+    filepath = str(tmp_path / "run_logs.json")
+    listener = TracingListener(
+        "capture_logs=true", f"log_output_file={filepath}", "log_output_format=gz"
+    )
+    assert listener._log_file.name.endswith(".tmp")
+
+    span = listener.tracer.start_span("kw")
+    listener.span_stack = [span]
+    message = Mock()
+    message.level = "INFO"
+    message.message = "hello"
+    listener.log_message(message)
+    listener.close()
+
+    with gzip.open(filepath + ".gz", "rt") as f:
+        lines = [json.loads(line) for line in f]
+    record = lines[0]["resource_logs"][0]["scope_logs"][0]["log_records"][0]
+    assert record["body"]["string_value"] == "hello"
+    assert record["trace_id"] == format(span.get_span_context().trace_id, "032x")
+    assert record["span_id"] == format(span.get_span_context().span_id, "016x")
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def _stuck_listener(*args):
+    """Listener whose only span exporter hangs on its first export."""
+    entered = threading.Event()
+    release = threading.Event()
+
+    class StuckExporter(SpanExporter):
+        def export(self, spans):
+            entered.set()
+            release.wait(10)
+            return SpanExportResult.SUCCESS
+
+    with patch.object(TracingListener, "_create_exporters", return_value=[StuckExporter()]):
+        listener = TracingListener(
+            "shutdown_timeout_sec=0.3",
+            "batch_max_export_size=2",
+            "batch_schedule_delay_ms=10",
+            *args,
+        )
+    for i in range(10):
+        listener.tracer.start_span(f"span{i}").end()
+    assert entered.wait(5)
+    return listener, release
+
+
+def test_close_saves_unsent_spans_at_deadline(tmp_path, capsys):
+    """Test close() gives up on a stuck exporter at the deadline and saves its spans locally."""
+    listener, release = _stuck_listener()
+    listener._rf_output_dir = str(tmp_path)
+    start = time.monotonic()
+    listener.close()
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert elapsed < 3
+    path = str(tmp_path / f"rf-tracer-unsent-{os.getpid()}.json")
+    with open(path) as f:
+        names = [
+            span["name"]
+            for line in f
+            for rs in json.loads(line)["resource_spans"]
+            for ss in rs["scope_spans"]
+            for span in ss["spans"]
+        ]
+    assert sorted(names) == sorted(f"span{i}" for i in range(10))
+    out = capsys.readouterr().out
+    assert "0/10 spans flushed" in out
+    assert "deadline of 0.3s hit (traces-0, shutdown)" in out
+    assert f"10 unsent spans (10 saved to {path})" in out
+
+
+def test_close_shuts_down_logger_provider(tmp_path):
+    """Test the logger provider has no atexit hook and is shut down by close()."""
+    listener, release = _stuck_listener("capture_logs=true")
+    listener._rf_output_dir = str(tmp_path)
+    provider = listener.logger_provider
+    assert provider._at_exit_handler is None
+    with patch.object(provider, "shutdown", wraps=provider.shutdown) as shutdown:
+        listener.close()
+    release.set()
+    shutdown.assert_called_once()
+
+
+def test_close_unsent_spans_kept_in_trace_file(tmp_path, capsys):
+    """Test unsent spans are only reported as kept when the trace file holds them."""
+    filepath = str(tmp_path / "traces.json")
+    listener, release = _stuck_listener(f"trace_output_file={filepath}")
+    listener.close()
+    release.set()
+
+    with open(filepath) as f:
+        names = [
+            span["name"]
+            for line in f
+            for rs in json.loads(line)["resource_spans"]
+            for ss in rs["scope_spans"]
+            for span in ss["spans"]
+        ]
+    assert sorted(names) == sorted(f"span{i}" for i in range(10))
+    assert f"10 unsent spans are kept in {filepath}" in capsys.readouterr().out
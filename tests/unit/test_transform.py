@@ -0,0 +1,124 @@
+"""Tests for the offline trace transform and the rf-tracer CLI."""
+
+import gzip
+import json
+
+import pytest
+from otlp_builders import line, read_spans, span, write_spans
+
+from robotframework_tracer.cli import main
+from robotframework_tracer.transform import transform_file, transform_lines
+
+
+def _rf_span(name, span_type, span_id, parent=""):
+    """A suite, test or keyword span with attributes and events the filters act on."""
+    key = {"suite": "rf.suite.name", "test": "rf.test.name", "keyword": "rf.keyword.type"}[
+        span_type
+    ]
+    value = "KEYWORD" if span_type == "keyword" else name
+    return span(
+        span_id,
+        span_type.upper(),
+        name,
+        parent=parent,
+        trace_id="ab" * 16,
+        events=[{"name": "x"}],
+        **{key: value, "rf.elapsed_time": 0.1},
+    )
+
+
+def _write_input(path, n_lines=10):
+    spans = [
+        (
+            _rf_span(f"kw{i}", "keyword", f"{i:016x}", "1" * 16)
+            if i % 2
+            else _rf_span(f"test{i}", "test", f"{i:016x}", "1" * 16)
+        )
+        for i in range(n_lines)
+    ]
+    write_spans(path, spans, gz=str(path).endswith(".gz"))
+
+
+def test_transform_lines_without_filter_passes_through():
+    payload, stats = transform_lines([line(_rf_span("a", "test", "01"))])
+    assert stats == {"lines_in": 1, "lines_out": 1, "spans_in": 1, "spans_out": 1}
+    assert json.loads(payload)["resource_spans"][0]["scope_spans"][0]["spans"][0]["name"] == "a"
+
+
+def test_transform_lines_drops_batches_emptied_by_filter():
+    cfg = {"version": "1.0.0", "spans": {"include_keywords": False}}
+    payload, stats = transform_lines([line(_rf_span("kw", "keyword", "01")), "\n"], cfg)
+    assert payload == b""
+    assert stats["lines_in"] == 1
+    assert stats["lines_out"] == 0
+    assert stats["spans_out"] == 0
+
+
+def test_transform_lines_compressed_is_gzip_member():
+    payload, _ = transform_lines([line(_rf_span("a", "test", "01"))], compress=True)
+    assert json.loads(gzip.decompress(payload))["resource_spans"]
+
+
+def test_transform_json_to_gz_with_preset(tmp_path):
+    src = tmp_path / "in_traces.json"
+    dst = tmp_path / "out_traces.json.gz"
+    _write_input(src)
+
+    stats = transform_file(str(src), str(dst), output_filter="minimal", workers=1, batch_lines=3)
+
+    assert stats["lines_in"] == 10
+    assert stats["spans_out"] == 10
+    out = read_spans(dst)
+    assert len(out) == 10
+    assert "events" not in out[0]
+    assert all(a["key"] != "rf.elapsed_time" for a in out[0]["attributes"])
+
+
+def test_transform_with_process_pool_preserves_order(tmp_path):
+    src = tmp_path / "in_traces.json.gz"
+    dst = tmp_path / "out_traces.json"
+    _write_input(src, n_lines=25)
+
+    stats = transform_file(str(src), str(dst), workers=2, batch_lines=2)
+
+    assert stats["lines_out"] == 25
+    names = [s["name"] for s in read_spans(dst)]
+    assert names == [f"{'kw' if i % 2 else 'test'}{i}" for i in range(25)]
+
+
+def test_transform_rejects_same_input_and_output(tmp_path):
+    src = tmp_path / "traces.json"
+    _write_input(src)
+    with pytest.raises(ValueError, match="different files"):
+        transform_file(str(src), str(src))
+
+
+def test_transform_unknown_filter_raises(tmp_path):
+    src = tmp_path / "traces.json"
+    _write_input(src)
+    with pytest.raises(ValueError, match="output filter"):
+        transform_file(str(src), str(tmp_path / "out.json"), output_filter="no-such-preset")
+    assert not (tmp_path / "out.json").exists()
+
+
+def test_cli_transform(tmp_path, capsys):
+    src = tmp_path / "in_traces.json"
+    dst = tmp_path / "out_traces.json.gz"
+    _write_input(src, n_lines=4)
+
+    rc = main(["transform", str(src), str(dst), "--workers", "1"])
+
+    assert rc == 0
+    assert "4 -> 4 spans" in capsys.readouterr().out
+    assert len(read_spans(dst)) == 4
+
+
+def test_cli_missing_input_returns_error(tmp_path, capsys):
+    rc = main(["transform", str(tmp_path / "missing.json"), str(tmp_path / "out.json")])
+    assert rc == 2
+    assert "Error" in capsys.readouterr().err
+
+
+def test_cli_without_command_prints_help(capsys):
+    assert main([]) == 2
+    assert "transform" in capsys.readouterr().out